@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+
+from .instrumentation import NULL_METRICS, error_code
+
+
+logger = logging.getLogger(__name__)
+
+
+class BlockHeightTracker:
+    """
+    Background tracker of the latest block height.
+
+    The height is refreshed by polling the node every `poll_interval` seconds and can also be fed directly
+    from a block subscription through `update()` / `apply_block_height_message()`. Reading `height` is
+    plain attribute access; `current()` only goes to the node when the tracked height is older than
+    `max_staleness` seconds (or was never loaded). Functions in `listeners` are called with every new height.
+    """
+
+    def __init__(self, node_client, poll_interval=1.0, max_staleness=3.0, metrics=NULL_METRICS):
+        self.node_client = node_client
+        self.metrics = metrics
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.height = None
+        self.updated_at = None
+        self.fallback_queries = 0
+        self.listeners = []
+        self._task = None
+
+    @property
+    def age(self):
+        """Seconds since the height was last updated (None if it was never loaded)"""
+        if self.updated_at is None:
+            return None
+        return time.monotonic() - self.updated_at
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def update(self, height):
+        """Record a newly observed block height (heights never move backwards)"""
+        height = int(height)
+        if self.height is None or height >= self.height:
+            advanced = height != self.height
+            self.height = height
+            self.updated_at = time.monotonic()
+            if advanced:
+                for listener in self.listeners:
+                    listener(height)
+
+    def apply_block_height_message(self, message: dict):
+        """Apply a message from the indexer `v4_block_height` websocket channel"""
+        if message.get('channel') != 'v4_block_height':
+            return
+
+        contents = message.get('contents') or {}
+        if message.get('type') == 'channel_batch_data':
+            contents = contents[-1] if contents else {}
+        height = contents.get('blockHeight') or contents.get('height')
+        if height is not None:
+            self.update(height)
+
+    async def refresh(self):
+        """Query the node for the latest block height and record it"""
+        started = time.perf_counter()
+        try:
+            height = await self.node_client.latest_block_height()
+        except Exception as e:
+            self.metrics.record_call('grpc', 'GetLatestBlock', time.perf_counter() - started, error_code(e))
+            raise
+        self.metrics.record_call('grpc', 'GetLatestBlock', time.perf_counter() - started)
+        self.update(height)
+        return self.height
+
+    async def current(self, max_staleness: float = None):
+        """
+        Return the latest block height, querying the node only if the tracked value is too old.
+
+        Args:
+            max_staleness (float): Override for the maximum accepted age in seconds
+
+        Returns:
+            int: The latest block height
+        """
+        max_staleness = self.max_staleness if max_staleness is None else max_staleness
+        age = self.age
+        if age is not None and age <= max_staleness:
+            return self.height
+
+        self.fallback_queries += 1
+        return await self.refresh()
+
+    def start(self):
+        """Start the background polling task"""
+        if not self.running:
+            self._task = asyncio.create_task(self._poll())
+        return self._task
+
+    async def stop(self):
+        """Stop the background polling task"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error polling block height", extra={'height': self.height})
+
+            await asyncio.sleep(self.poll_interval)
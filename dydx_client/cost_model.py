@@ -0,0 +1,138 @@
+from bisect import bisect_right
+
+
+# Protocol amounts (volume requirements, net collateral, notional) are in USDC quantums
+QUOTE_QUANTUMS_PER_USD = 1e6
+
+# Fee rates are given in parts per million of the notional
+PPM = 1e6
+
+
+class CostModel:
+    """
+    Fee tier and equity tier lookups precomputed from the chain's parameters, for synchronous use per order.
+
+    Tier thresholds are kept as sorted lists, so the fee tier of a trailing 30 day volume and the open order
+    caps of an equity (total net collateral) are binary searches; the rates and caps of the wallet's own
+    volume / equity are looked up once when those change, leaving `expected_fee` and `max_open_orders` plain
+    arithmetic and attribute access. Fee tiers that require a share of the exchange's total or maker volume are
+    treated as unreachable (the shares are not tracked), so fees are estimated conservatively.
+    """
+
+    def __init__(self, market_cache=None):
+        """
+        Args:
+            market_cache (MarketCache): Optional source of oracle prices for `expected_fee` calls without a price
+        """
+        self.market_cache = market_cache
+        self.fee_tiers = []
+        self.volume_thresholds = []
+        self.equity_tiers = {'short_term': ([], []), 'stateful': ([], [])}
+        self.volume = 0.0
+        self.equity = 0.0
+        self.maker_fee_rate = 0.0
+        self.taker_fee_rate = 0.0
+        self.open_order_limits = {'short_term': None, 'stateful': None}
+        self.loaded = False
+
+    def load(self, fee_params: dict, equity_tier_config: dict):
+        """
+        Load the parameter responses of `get_fee_tiers` and `get_equity_tier` (either may be None to keep the
+        current set).
+        """
+        if fee_params is not None:
+            tiers = fee_params['params']['tiers']
+            thresholds = []
+            threshold = 0.0
+            for tier in tiers:
+                # a tier also needs every lower tier's requirement, keeping the thresholds sorted
+                if int(tier.get('total_volume_share_requirement_ppm') or 0) or \
+                        int(tier.get('maker_volume_share_requirement_ppm') or 0):
+                    threshold = float('inf')
+                threshold = max(threshold, int(tier.get('absolute_volume_requirement') or 0) / QUOTE_QUANTUMS_PER_USD)
+                thresholds.append(threshold)
+            self.fee_tiers = tiers
+            self.volume_thresholds = thresholds
+
+        if equity_tier_config is not None:
+            config = equity_tier_config['equity_tier_limit_config']
+            for kind in ('short_term', 'stateful'):
+                tiers = sorted(config.get(f'{kind}_order_equity_tiers') or (),
+                               key=lambda tier: int(tier['usd_tnc_required']))
+                self.equity_tiers[kind] = (
+                    [int(tier['usd_tnc_required']) / QUOTE_QUANTUMS_PER_USD for tier in tiers],
+                    [int(tier['limit']) for tier in tiers],
+                )
+
+        self.loaded = bool(self.fee_tiers)
+        self.set_volume(self.volume)
+        self.set_equity(self.equity)
+
+    def set_volume(self, volume):
+        """Set the wallet's trailing 30 day volume in USD and look up its fee rates"""
+        self.volume = float(volume)
+        tier = self.fee_tier(self.volume)
+        if tier is None:
+            self.maker_fee_rate = self.taker_fee_rate = 0.0
+            return
+        self.maker_fee_rate = int(tier['maker_fee_ppm']) / PPM
+        self.taker_fee_rate = int(tier['taker_fee_ppm']) / PPM
+
+    def set_equity(self, equity):
+        """Set the subaccount's total net collateral in USD and look up its open order caps"""
+        self.equity = float(equity)
+        for kind in self.open_order_limits:
+            self.open_order_limits[kind] = self.open_order_limit(self.equity, stateful=kind == 'stateful')
+
+    def fee_tier(self, volume):
+        """Return the fee tier of a trailing 30 day volume in USD (None before fee parameters are loaded)"""
+        index = bisect_right(self.volume_thresholds, volume) - 1
+        if index < 0:
+            return self.fee_tiers[0] if self.fee_tiers else None
+        return self.fee_tiers[index]
+
+    def open_order_limit(self, equity, stateful=True):
+        """
+        Return the open order cap of a total net collateral in USD (0 below the lowest equity tier, None when
+        the chain sets no tiers for the kind of order)
+        """
+        thresholds, limits = self.equity_tiers['stateful' if stateful else 'short_term']
+        if not thresholds:
+            return None
+        index = bisect_right(thresholds, equity) - 1
+        return limits[index] if index >= 0 else 0
+
+    def expected_fee(self, market, side, size, price=None, maker=False):
+        """
+        Estimate the fee of a fill at the wallet's fee tier (negative for a maker rebate).
+
+        Args:
+            market (str): The market ticker, used for its cached oracle price when no price is given
+            side (str): 'BUY' or 'SELL' (dYdX charges both sides the same rates)
+            size (float): Size in base units
+            price (float): Fill price (default: the cached oracle price)
+            maker (bool): Whether the order adds liquidity (e.g. post-only limit orders)
+
+        Returns:
+            float: The fee in USD
+        """
+        if price is None:
+            price = float(self.market_cache.get_static(market)['oraclePrice'])
+        return abs(size) * price * (self.maker_fee_rate if maker else self.taker_fee_rate)
+
+    def max_open_orders(self, stateful=True):
+        """Return the subaccount's cap on open stateful (or short-term) orders at its current equity (None: no cap)"""
+        return self.open_order_limits['stateful' if stateful else 'short_term']
+
+    def stats(self):
+        """Return the current tier, rates and caps"""
+        tier = self.fee_tier(self.volume)
+        return {
+            'loaded': self.loaded,
+            'volume': self.volume,
+            'equity': self.equity,
+            'fee_tier': tier.get('name') if tier is not None else None,
+            'maker_fee_rate': self.maker_fee_rate,
+            'taker_fee_rate': self.taker_fee_rate,
+            'max_open_orders': dict(self.open_order_limits),
+        }
@@ -1,20 +1,45 @@
 import asyncio
+from dataclasses import dataclass, field
+from functools import partial
+import importlib
 import random
 import time
 import json
-import pprint
+import logging
 from dydx_v4_client import MAX_CLIENT_ID, OrderFlags
-from v4_proto.dydxprotocol.clob.order_pb2 import Order
+from v4_proto.dydxprotocol.clob.order_pb2 import Order, OrderId
+from v4_proto.dydxprotocol.clob.tx_pb2 import OrderBatch
+from v4_proto.dydxprotocol.subaccounts.subaccount_pb2 import SubaccountId
 from dydx_v4_client.indexer.rest.constants import OrderType
-from dydx_v4_client.indexer.rest.indexer_client import IndexerClient
-from dydx_v4_client.network import make_mainnet
-from dydx_v4_client.node.client import NodeClient
-from dydx_v4_client.node.market import Market
-from dydx_v4_client.wallet import KeyPair, Wallet
-from decimal import Decimal
+from dydx_v4_client.node.message import place_order as place_order_message, cancel_order as cancel_order_message
+from dydx_v4_client.node.message import PY_V2_CLIENT_ID
+from dydx_v4_client.node.message import batch_cancel as batch_cancel_message
 import datetime
-import aiohttp
-from errors import *
+from typing import TYPE_CHECKING, Any
+from .errors import *
+from .block_height import BlockHeightTracker
+from .cost_model import QUOTE_QUANTUMS_PER_USD, CostModel
+from .endpoints import EndpointSet, FailoverClient
+from .fastjson import loads
+from .instrumentation import NULL_METRICS, Metrics, error_code, instrumented
+from .order_book import OrderBook
+from .order_store import FINAL_STATUSES, OrderStore, order_uuid
+from .order_tracker import REJECTED, OrderHandle, OrderTracker
+from .rate_limit import RateLimiter, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from .sequence import WalletSequencer
+from .quantize import price_rounding
+from .signing import OrderTemplate, SignedTx
+from .snapshot import SnapshotStore
+from .streams import IndexerStream
+from .wallet_cache import WalletCache
+
+if TYPE_CHECKING:
+    import aiohttp
+    from dydx_v4_client.indexer.rest.indexer_client import IndexerClient
+    from dydx_v4_client.node.client import NodeClient
+    from .history import HistoryStore
+    from .quantize import Quantizer
+    from .risk import RiskEngine
 
 
 """
@@ -24,16 +49,625 @@ from errors import *
 """
 
 
+logger = logging.getLogger(__name__)
+
+
+# Cursor fields (and their comparison types) each history kind is paged and checkpointed by
+HISTORY_CURSORS = {
+    'fills': {'createdAtHeight': int},
+    'transfers': {'createdAtHeight': int},
+    'orders': {'goodTilBlock': int, 'goodTilBlockTime': None},
+    'historical_pnl': {'createdAt': None},
+}
+
+# First page cursors of the order history (goodTilBlock is a uint32)
+MAX_GOOD_TIL_BLOCK = 2 ** 32 - 1
+MAX_GOOD_TIL_BLOCK_TIME = '9999-12-31T23:59:59.999Z'
+
+# Heavy modules only needed once a client connects (the node client and wallet pull in grpc and the bip32
+# stack, the indexer client httpx); imported on first connect instead of with the package
+CONNECT_MODULES = (
+    'dydx_v4_client.network',
+    'dydx_v4_client.node.client',
+    'dydx_v4_client.indexer.rest.indexer_client',
+)
+
+
+def _import_modules(names):
+    for name in names:
+        importlib.import_module(name)
+
+
+def _urls(value):
+    # One URL or a list of interchangeable ones
+    return [url.rstrip('/') for url in ([value] if isinstance(value, str) else value)]
+
+
+# Indexer time in force -> protobuf (GTT is the protocol's unspecified default)
+_TIME_IN_FORCE = {
+    'GTT': Order.TimeInForce.TIME_IN_FORCE_UNSPECIFIED,
+    'IOC': Order.TimeInForce.TIME_IN_FORCE_IOC,
+    'FOK': Order.TimeInForce.TIME_IN_FORCE_FILL_OR_KILL,
+    'POST_ONLY': Order.TimeInForce.TIME_IN_FORCE_POST_ONLY,
+}
+
+
+async def _optional(query):
+    """Await a query whose failure (already logged where it was mapped) just means no result"""
+    try:
+        return await query
+    except DydxError:
+        return None
+
+
+def _derive_key_pair(mnemonic):
+    from dydx_v4_client.wallet import KeyPair
+
+    return KeyPair.from_mnemonic(mnemonic)
+
+
+@dataclass
+class PreparedOrder:
+    """An order built and signed by `DYDX.prepare_order`, ready for `DYDX.submit_prepared_order`"""
+
+    market_id: str
+    order_id: OrderId
+    order: Order
+    signed: SignedTx
+
+
+@dataclass
+class ReplacedOrder:
+    """An order replaced by `DYDX.replace_order`: the indexer id of the replaced order and its replacement"""
+
+    market_id: str
+    replaced_id: str
+    order_id: OrderId
+    order: Order
+    transaction: Any = None
+    handle: OrderHandle = None
+    # MsgCancelOrder of a replaced stateful order, signed into its own transaction after the replacement's
+    cancel: Any = field(default=None, repr=False)
+    cancel_transaction: Any = None
+
+
+class MarketCache:
+    """
+    Per-market metadata cache for the perpetual markets returned by the indexer.
+
+    Static fields (tickSize, stepSize, atomicResolution, clobPairId, margin fractions, ...) are kept until
+    they are explicitly invalidated. The oracle price is tracked separately and is considered stale once it
+    is older than `oracle_ttl` seconds, unless it is being kept current by the `v4_markets` websocket feed: the
+    markets of the feed's initial snapshot are in `live_markets` until the feed disconnects, and their prices
+    are served whatever their age (the indexer only publishes oracle prices that changed).
+    """
+
+    STATIC_FIELDS = (
+        'clobPairId',
+        'ticker',
+        'status',
+        'atomicResolution',
+        'quantumConversionExponent',
+        'tickSize',
+        'stepSize',
+        'stepBaseQuantums',
+        'subticksPerTick',
+        'initialMarginFraction',
+        'maintenanceMarginFraction',
+        'marketType',
+    )
+
+    def __init__(self, oracle_ttl: float = 2.0):
+        self.oracle_ttl = oracle_ttl
+        self._markets = {}
+        self._oracle_updated_at = {}
+        self.hits = 0
+        self.misses = 0
+        self.oracle_refreshes = 0
+        # markets whose oracle prices the `v4_markets` feed keeps current
+        self.live_markets = set()
+        # callables(market_id, oracle_price) notified of every oracle price update
+        self.oracle_listeners = []
+
+    def __contains__(self, market_id):
+        return market_id in self._markets
+
+    def __iter__(self):
+        return iter(list(self._markets))
+
+    def __len__(self):
+        return len(self._markets)
+
+    def get(self, market_id, max_oracle_age: float = None):
+        """
+        Return the cached market dict, or None if it is missing or its oracle price is stale.
+
+        Args:
+            market_id (str): The market ticker (e.g. 'BTC-USD')
+            max_oracle_age (float): Override for the oracle price TTL in seconds (not applied to live markets)
+
+        Returns:
+            dict: Cached market data or None on a miss
+        """
+        market = self._markets.get(market_id)
+        if market is None:
+            self.misses += 1
+            return None
+
+        ttl = self.oracle_ttl if max_oracle_age is None else max_oracle_age
+        if market_id not in self.live_markets and time.monotonic() - self._oracle_updated_at.get(market_id, 0.0) > ttl:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return market
+
+    def get_static(self, market_id):
+        """Return the cached market dict regardless of oracle price age (None if never loaded)"""
+        return self._markets.get(market_id)
+
+    def oracle_age(self, market_id):
+        """Seconds since the oracle price of a market was last refreshed (None if never loaded)"""
+        updated_at = self._oracle_updated_at.get(market_id)
+        if updated_at is None:
+            return None
+        return time.monotonic() - updated_at
+
+    def update(self, market_id, market: dict):
+        """
+        Store a full market entry as returned by `get_perpetual_markets`.
+
+        Returns:
+            bool: Whether the market is new or any of its static fields changed
+        """
+        cached = self._markets.get(market_id)
+        if cached is None:
+            self._markets[market_id] = dict(market)
+            changed = True
+        else:
+            changed = any(cached.get(key) != market[key] for key in self.STATIC_FIELDS if key in market)
+            cached.update(market)
+        if 'oraclePrice' in market:
+            self._oracle_updated_at[market_id] = time.monotonic()
+        return changed
+
+    def update_many(self, markets: dict):
+        """Store every market of a `get_perpetual_markets` response body (the 'markets' mapping)"""
+        for market_id, market in markets.items():
+            self.update(market_id, market)
+
+    def restore(self, markets: dict, age: float):
+        """
+        Store markets saved `age` seconds ago (e.g. from a snapshot), keeping already cached markets.
+
+        Their oracle prices count as that old, so `get` only serves them while they are within the TTL.
+        """
+        updated_at = time.monotonic() - age
+        for market_id, market in markets.items():
+            if market_id not in self._markets:
+                self._markets[market_id] = dict(market)
+                self._oracle_updated_at[market_id] = updated_at
+
+    def snapshot(self):
+        """Return every cached market, by ticker"""
+        return dict(self._markets)
+
+    def update_oracle_price(self, market_id, oracle_price):
+        """Refresh only the oracle price of an already cached market"""
+        market = self._markets.get(market_id)
+        if market is None:
+            return
+        market['oraclePrice'] = oracle_price
+        self._oracle_updated_at[market_id] = time.monotonic()
+        self.oracle_refreshes += 1
+        for listener in self.oracle_listeners:
+            listener(market_id, oracle_price)
+
+    def invalidate(self, market_id=None):
+        """Drop a single market (or every market if no id is given) so that the next read refetches it"""
+        if market_id is None:
+            self._markets.clear()
+            self._oracle_updated_at.clear()
+            self.live_markets.clear()
+            return
+        self._markets.pop(market_id, None)
+        self._oracle_updated_at.pop(market_id, None)
+        self.live_markets.discard(market_id)
+
+    def apply_markets_message(self, message: dict):
+        """
+        Apply a message from the indexer `v4_markets` websocket channel.
+
+        The initial 'subscribed' message carries a full snapshot under contents['markets']. Subsequent
+        'channel_data' / 'channel_batch_data' messages carry 'trading' updates (static field changes) and
+        'oraclePrices' updates.
+        """
+        if message.get('channel') != 'v4_markets':
+            return
+
+        msg_type = message.get('type')
+        contents = message.get('contents')
+        if msg_type == 'subscribed':
+            markets = contents.get('markets', {})
+            self.update_many(markets)
+            self.live_markets.update(market_id for market_id, market in markets.items() if 'oraclePrice' in market)
+            return
+
+        if msg_type == 'channel_batch_data':
+            updates = contents
+        elif msg_type == 'channel_data':
+            updates = [contents]
+        else:
+            return
+
+        for update in updates:
+            for market_id, fields in (update.get('trading') or {}).items():
+                market = self._markets.get(market_id)
+                if market is None:
+                    continue
+                # only static fields are merged, 24h stats and funding are not needed for order construction
+                market.update({key: value for key, value in fields.items() if key in self.STATIC_FIELDS})
+            for market_id, fields in (update.get('oraclePrices') or {}).items():
+                self.update_oracle_price(market_id, fields['oraclePrice'])
+
+    def stats(self):
+        """Return the hit/miss counters of the cache"""
+        total = self.hits + self.misses
+        return {
+            'markets': len(self._markets),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'oracle_refreshes': self.oracle_refreshes,
+        }
+
+
+class ProtocolSession:
+    """
+    Connection-pooled HTTP session for REST queries against the node's protocol endpoints.
+
+    A single aiohttp session is shared by every query so TCP/TLS connections are kept alive and reused
+    instead of being re-established per request. The session is created lazily on first use (it has to be
+    bound to the running event loop) and released with `aclose()` or by using the object as an async
+    context manager. Given several base URLs, queries go to the fastest healthy one and are retried (and
+    optionally hedged) on the others.
+    """
+
+    def __init__(self, base_url, limit_per_host=10, dns_cache_ttl=300, keepalive_timeout=30.0, timeout=10.0,
+                 metrics: Metrics = NULL_METRICS, retries=2, hedge_after=None):
+        self.endpoints = EndpointSet(_urls(base_url), name='protocol', metrics=metrics)
+        self.base_url = self.endpoints.primary.url
+        self.retries = retries
+        self.hedge_after = hedge_after
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.metrics = metrics
+        self._session = None
+
+    @property
+    def closed(self):
+        return self._session is None or self._session.closed
+
+    def session(self) -> 'aiohttp.ClientSession':
+        """Return the shared session, creating it (and its connection pool) on first use"""
+        if self.closed:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def url(self, endpoint: str, base_url=None):
+        # Ensure the endpoint starts with a slash
+        if not endpoint.startswith('/'):
+            endpoint = '/' + endpoint
+        return f"{base_url or self.base_url}{endpoint}"
+
+    async def query_protocol(self, endpoint: str):
+        """
+        Query a dYdX protocol REST endpoint over the pooled session.
+
+        Args:
+            endpoint (str): The endpoint path, e.g. '/dydxprotocol/clob/block_rate'
+
+        Returns:
+            dict: The JSON response from the endpoint
+
+        Raises:
+            DydxError: The mapped failure (e.g. `NotFound`, `ServerError`, `NetworkError`)
+        """
+        async def fetch(server):
+            url = self.url(endpoint, server.url)
+            async with self.session().get(url) as response:
+                if response.status >= 400:
+                    raise http_error(response.status, url=url, retry_after=response.headers.get('Retry-After'))
+                return loads(await response.read())
+
+        started = time.perf_counter()
+        try:
+            with mapped_errors():
+                result = await self.endpoints.call(fetch, retries=self.retries, hedge_after=self.hedge_after)
+        except Exception as e:
+            code = error_code(e)
+            self.metrics.record_call('rest', endpoint, time.perf_counter() - started, code)
+            # Mapped request failures are logged without a traceback
+            logger.error("Error querying %s: %s", endpoint, code, exc_info=not isinstance(e, DydxError),
+                         extra={'endpoint': endpoint, 'status': code})
+            raise
+
+        self.metrics.record_call('rest', endpoint, time.perf_counter() - started, 200)
+        return result
+
+    async def aclose(self):
+        """Close the session and every pooled connection"""
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def __aenter__(self):
+        self.session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+class ClientTransport:
+    """
+    Connections and market state shared by one or more `DYDX` clients.
+
+    Holds the node gRPC channel, the indexer REST client, the pooled protocol HTTP session, the multiplexed
+    indexer websocket, the block height tracker, the market cache, the tracked order books and the indexer
+    rate limit (the indexer limits per IP, not per wallet). Everything that is per wallet (sequence, order
+    store, order rate limits) stays on the `DYDX` client, so any number of wallets and subaccounts can share
+    one transport and connection count grows with the number of endpoints only.
+
+    Every endpoint argument takes one URL or a list of interchangeable ones (the first is the primary).
+    Requests are routed by per endpoint latency EWMA and health (see `EndpointSet`): indexer and protocol
+    reads are retried with jittered backoff on the next best endpoint and, with `hedge_after`, hedged to a
+    second endpoint when the first is slow; node reads fail over between nodes; broadcasts stick to one node
+    and are only ever re-sent as the identical signed transaction (see `Broadcaster`).
+    """
+
+    def __init__(self, rest_indexer='https://indexer.dydx.trade', websocket_indexer='wss://indexer.dydx.trade/v4/ws',
+                 node_url='dydx-grpc.publicnode.com:443', grpc_url='https://dydx-ops-rest.kingnodes.com',
+                 oracle_price_ttl=2.0, http_limit_per_host=10, track_block_height=True, block_poll_interval=1.0,
+                 block_height_max_staleness=3.0, indexer_rate_limit=(100, 10.0), metrics: Metrics = None,
+                 read_retries=2, hedge_after=None):
+        self.rest_indexers = _urls(rest_indexer)
+        self.websocket_indexers = _urls(websocket_indexer)
+        self.node_urls = _urls(node_url)
+        self.grpc_urls = _urls(grpc_url)
+        self.rest_indexer = self.rest_indexers[0]
+        self.websocket_indexer = self.websocket_indexers[0]
+        self.node_url = self.node_urls[0]
+        self.grpc_url = self.grpc_urls[0]
+        self.http_limit_per_host = http_limit_per_host
+        self.read_retries = read_retries
+        self.hedge_after = hedge_after
+        self.track_block_height = track_block_height
+        self.block_poll_interval = block_poll_interval
+        self.block_height_max_staleness = block_height_max_staleness
+
+        # Call counters and latency histograms of every client on this transport (Metrics(enabled=False) to disable)
+        self.metrics = metrics if metrics is not None else Metrics()
+
+        self.node_client: 'NodeClient' = None
+        self.indexer_client: 'IndexerClient' = None
+        self.block_height: BlockHeightTracker = None
+        self.block_rate_limit = None
+        self._connect_lock = None
+
+        self.market_cache = MarketCache(oracle_ttl=oracle_price_ttl)
+        self.order_templates = {}
+        # clob pair id -> MarketScale of typed results
+        self.market_scales = {}
+        self.order_books = {}
+        self.book_resyncs = {}
+        # market id -> in-flight market data request shared by concurrent cache misses
+        self.market_fetches = {}
+        self.indexer_limiter = RateLimiter(indexer_limit=indexer_rate_limit)
+
+        # Indexer REST endpoints, queried over one pooled HTTP client
+        self.indexer_endpoints = EndpointSet(self.rest_indexers, name='indexer', metrics=self.metrics)
+        self._http = None
+
+        # Shared HTTP connection pool for protocol parameter queries (and the indexer websocket)
+        self.protocol = ProtocolSession(self.grpc_urls, limit_per_host=http_limit_per_host, metrics=self.metrics,
+                                        retries=read_retries, hedge_after=hedge_after)
+
+        # Multiplexed indexer websocket (orderbook, trades, markets, subaccounts, block height)
+        self.stream = IndexerStream(self.websocket_indexers, session_factory=self.protocol.session,
+                                    metrics=self.metrics)
+
+    @property
+    def connected(self):
+        return self.node_client is not None and self.indexer_client is not None
+
+    async def connect(self):
+        """Connect the node and indexer clients once, however many clients call this concurrently"""
+        if self.connected:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self.connected:
+                return
+
+            # Load the rate limits (once for every wallet's order buckets) while the client modules are imported
+            # in a worker thread, so the request is not held up by the imports
+            self.block_rate_limit, _ = await asyncio.gather(
+                _optional(self.protocol.query_protocol("/dydxprotocol/clob/block_rate")),
+                asyncio.to_thread(_import_modules, CONNECT_MODULES)
+            )
+            from dydx_v4_client.network import make_mainnet
+            from dydx_v4_client.node.client import NodeClient
+
+            # Connect to the mainnet nodes (channels connect lazily on their first request)
+            node_clients = []
+            for node_url in self.node_urls:
+                network = make_mainnet(
+                    rest_indexer=self.rest_indexer,
+                    websocket_indexer=self.websocket_indexer,
+                    node_url=node_url  # Note: no http/https prefix
+                )
+                node_clients.append(await NodeClient.connect(network.node))
+            node_client = self.failover_node_client(node_clients)
+            # Sequences are handed out locally by each wallet's sequencer, so disable the per-send account query
+            node_client.sequence_manager = None
+            indexer_client = self.pooled_indexer_client()
+
+            # Publish the clients together, so a failed connect leaves nothing half set up for the next attempt
+            self.block_height = BlockHeightTracker(
+                node_client,
+                poll_interval=self.block_poll_interval,
+                max_staleness=self.block_height_max_staleness,
+                metrics=self.metrics
+            )
+            self.indexer_client = indexer_client
+            self.node_client = node_client
+
+            # Keep the latest block height current in the background so orders don't have to query it
+            if self.track_block_height:
+                self.block_height.start()
+
+    def failover_node_client(self, node_clients):
+        """
+        Combine one NodeClient per node URL into a `FailoverClient`: queries go to the fastest healthy node,
+        transactions are sent through the primary's client (the sequencers' broadcasters fail over themselves).
+        """
+        endpoints = EndpointSet(self.node_urls, node_clients, name='node', metrics=self.metrics)
+        return FailoverClient(endpoints, retries=self.read_retries)
+
+    def pooled_indexer_client(self):
+        """
+        An IndexerClient whose requests go through `indexer_get`: one pooled HTTP client for every request
+        (the stock client opens a new connection per request) with routing, retries and hedging across the
+        indexer endpoints.
+        """
+        from dydx_v4_client.indexer.rest.indexer_client import IndexerClient
+
+        indexer_client = IndexerClient(self.rest_indexer)
+        for module in (indexer_client.markets, indexer_client.account, indexer_client.utility):
+            module.get = partial(self.indexer_get, timeout=module.api_timeout)
+        return indexer_client
+
+    def _http_client(self):
+        if self._http is None or self._http.is_closed:
+            import httpx
+
+            connections = self.http_limit_per_host * len(self.rest_indexers)
+            self._http = httpx.AsyncClient(limits=httpx.Limits(max_connections=connections,
+                                                               max_keepalive_connections=connections))
+        return self._http
+
+    async def indexer_get(self, request_path, params={}, timeout=None):
+        """
+        GET an indexer path from the best indexer endpoint (the request of the indexer client's modules).
+
+        Returns:
+            The decoded JSON response
+
+        Raises:
+            DydxError: The mapped failure (e.g. `NotFound`, `TooManyRequests`, `NetworkError`)
+        """
+        from dydx_v4_client.indexer.rest.utils.request_helpers import generate_query_path
+
+        path = generate_query_path(request_path, params)
+        client = self._http_client()
+
+        async def fetch(endpoint):
+            url = endpoint.url + path
+            response = await client.get(url, timeout=timeout)
+            if response.status_code >= 400:
+                raise http_error(response.status_code, url=url, retry_after=response.headers.get('Retry-After'))
+            return loads(response.content)
+
+        with mapped_errors():
+            return await self.indexer_endpoints.call(fetch, retries=self.read_retries, hedge_after=self.hedge_after)
+
+    def endpoint_stats(self):
+        """Return the latency / health of every endpoint by kind"""
+        stats = {
+            'indexer': self.indexer_endpoints.stats(),
+            'protocol': self.protocol.endpoints.stats(),
+        }
+        if isinstance(self.node_client, FailoverClient):
+            stats['node'] = self.node_client.endpoints.stats()
+        return stats
+
+    async def aclose(self):
+        """Stop background feeds and release every shared connection"""
+        await self.stream.aclose()
+        if self.block_height is not None:
+            await self.block_height.stop()
+        await self.protocol.aclose()
+        http, self._http = self._http, None
+        if http is not None:
+            await http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
 class DYDX:
 
-    def __init__(self, wallet_address, mnemonic):
+    def __init__(self, wallet_address, mnemonic, oracle_price_ttl=2.0, http_limit_per_host=10, max_in_flight=32,
+                 track_block_height=True, block_poll_interval=1.0, block_height_max_staleness=3.0,
+                 rate_limit_wait=True, indexer_rate_limit=(100, 10.0), transport: ClientTransport = None,
+                 wallet_cache: WalletCache = None, init_retries=3, init_retry_delay=0.5, snapshot: SnapshotStore = None,
+                 snapshot_max_age=300.0, snapshot_flush_delay=1.0):
         self.wallet_address = wallet_address
         self.mnemonic = mnemonic
         self.key_pair = None
-        self.indexer_client: IndexerClient = None
+        self.indexer_client: 'IndexerClient' = None
         self.node_client = None
         self.wallet = None
         self.sequence = 0
+        self.sequencer: WalletSequencer = None
+        self.max_in_flight = max_in_flight
+        self.block_height: BlockHeightTracker = None
+        self.order_store = OrderStore(wallet_address)
+        # Handles of orders awaited through the subaccount feed instead of polled
+        self.order_tracker = OrderTracker(self.order_store)
+        self._reconciles = set()
+        # Optional persisted account number / sequence, skips the account query on restarts
+        self.wallet_cache = wallet_cache
+        # Optional persisted markets, protocol parameters, open orders and positions, restored below so reads
+        # are served before the first request; protocol parameters younger than `snapshot_max_age` seconds are
+        # served from it, everything is reconciled against live data in the background once initialized
+        self.snapshot = snapshot
+        self.snapshot_max_age = snapshot_max_age
+        self.snapshot_flush_delay = snapshot_flush_delay
+        self._snapshot_flush = None
+        self._snapshot_task = None
+
+        # Single-flight initialization shared by concurrent first callers, retried with backoff on failure
+        self.init_retries = init_retries
+        self.init_retry_delay = init_retry_delay
+        self._initialized = False
+        self._init_task = None
+
+        # Client-side rate limiting (order buckets are configured from the chain's block rate limits)
+        self.rate_limiter = RateLimiter()
+        self.rate_limit_wait = rate_limit_wait
+        self.risk_engine: 'RiskEngine' = None
+        self.cost_model: CostModel = None
+        self._cost_model_task = None
 
         if not self.wallet_address:
             raise InvalidWallet()
@@ -41,363 +675,1061 @@ class DYDX:
         if not self.mnemonic:
             raise InvalidMnemonic()
 
-        self.rest_indexer = 'https://indexer.dydx.trade'
-        self.websocket_indexer = 'wss://indexer.dydx.trade/v4/ws'
-        self.node_url = 'dydx-grpc.publicnode.com:443'
-        self.grpc_url = 'https://dydx-ops-rest.kingnodes.com'
+        # Connections and market state, either private to this client or shared with other wallets
+        # (the transport's own settings then apply instead of the connection arguments above)
+        self._owns_transport = transport is None
+        if transport is None:
+            transport = ClientTransport(
+                oracle_price_ttl=oracle_price_ttl,
+                http_limit_per_host=http_limit_per_host,
+                track_block_height=track_block_height,
+                block_poll_interval=block_poll_interval,
+                block_height_max_staleness=block_height_max_staleness,
+                indexer_rate_limit=indexer_rate_limit
+            )
+        self.transport = transport
+
+        self.rest_indexer = transport.rest_indexer
+        self.websocket_indexer = transport.websocket_indexer
+        self.node_url = transport.node_url
+        self.grpc_url = transport.grpc_url
+        self.metrics = transport.metrics
+        self.protocol = transport.protocol
+        self.stream = transport.stream
+        self.market_cache = transport.market_cache
+        self.order_templates = transport.order_templates
+        self.market_scales = transport.market_scales
+        self._market_fetches = transport.market_fetches
+        self.order_books = transport.order_books
+        self._book_resyncs = transport.book_resyncs
+
+        if snapshot is not None:
+            self.restore_snapshot()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Stop background feeds and release pooled connections (only this wallet's feeds on a shared transport)"""
+        task, self._init_task = self._init_task, None
+        if task is not None and not task.done():
+            task.cancel()
+
+        self.order_tracker.close()
+        task, self._cost_model_task = self._cost_model_task, None
+        if task is not None:
+            task.cancel()
+        task, self._snapshot_task = self._snapshot_task, None
+        if task is not None:
+            task.cancel()
+        if self.block_height is not None and self.order_tracker.apply_block_height in self.block_height.listeners:
+            self.block_height.listeners.remove(self.order_tracker.apply_block_height)
+
+        self.save_wallet_cache()
+        self.save_open_orders()
+        self.flush_snapshot()
+        if self.snapshot is not None:
+            # a store shared with other clients reopens its file on their next flush
+            try:
+                self.snapshot.close()
+            except Exception:
+                logger.exception("Error closing snapshot", extra={'path': self.snapshot.path})
+        if self._owns_transport:
+            await self.transport.aclose()
+            return
+
+        for subscription in self.stream.subscriptions:
+            if subscription.channel == 'v4_subaccounts' and subscription.id.startswith(f'{self.wallet_address}/'):
+                await subscription.unsubscribe()
+        self.order_store.live_subaccounts.clear()
 
     async def ensure_initialized_clients(self):
-        if not self.indexer_client or not self.node_client:
-            await self.initialize_clients()
+        """
+        Initialize the clients and wallet once.
 
+        Once initialized this is a plain attribute check. Until then every concurrent caller awaits the same
+        initialization task (cancelling one caller does not cancel it for the others). A failed attempt is
+        retried with exponential backoff; when every retry failed the error is raised to all waiting callers
+        and the next call starts over.
+        """
+        if self._initialized:
+            return
+
+        task = self._init_task
+        if task is None or task.done():
+            task = self._init_task = asyncio.create_task(self._initialize_with_retries())
+        await asyncio.shield(task)
+
+    async def _initialize_with_retries(self):
+        delay = self.init_retry_delay
+        for attempt in range(self.init_retries + 1):
+            try:
+                await self.initialize_clients()
+                return
+            except Exception as e:
+                # Mapped failures that cannot go away by themselves (e.g. a geoblocked indexer) fail fast
+                error = map_exception(e)
+                if attempt == self.init_retries or (error is not None and not error.retryable):
+                    raise
+                wait = delay * (1 + random.random())
+                if error is not None and error.backoff_hint is not None:
+                    wait = max(wait, error.backoff_hint)
+                self.metrics.count('init_retries_total', error=type(e).__name__)
+                logger.warning("Client initialization failed, retrying", exc_info=True,
+                               extra={'attempt': attempt + 1, 'retry_in': wait})
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, 10.0)
+
+    @instrumented
     async def initialize_clients(self):
-        """Initialize clients and wallet"""
-        # Connect to mainnet node
-        network = make_mainnet(
-            rest_indexer=self.rest_indexer,
-            websocket_indexer=self.websocket_indexer,
-            node_url=self.node_url  # Note: no http/https prefix
+        """
+        Initialize clients and wallet (unconditionally, use `ensure_initialized_clients` to initialize once).
+
+        Everything is built before any of it is assigned, so a failure leaves the client as it was.
+        """
+        # Connect (or reuse) the node and indexer clients while the key pair is derived in a worker thread
+        _, key_pair = await asyncio.gather(
+            self.transport.connect(),
+            asyncio.to_thread(_derive_key_pair, self.mnemonic)
         )
-        self.node_client = await NodeClient.connect(network.node)
+        node_client = self.transport.node_client
+
+        # Initialize wallet (reusing the key pair instead of deriving it from the mnemonic again), from the
+        # wallet cache when available
+        from dydx_v4_client.wallet import Wallet
+
+        chain_id = node_client.builder.chain_id
+        cached = self.wallet_cache.get(chain_id, self.wallet_address) if self.wallet_cache is not None else None
+        if cached is not None:
+            account_number, sequence = cached
+        else:
+            account = await node_client.get_account(self.wallet_address)
+            account_number, sequence = account.account_number, account.sequence
+            if self.wallet_cache is not None:
+                self.wallet_cache.put(chain_id, self.wallet_address, account_number, sequence)
+        wallet = Wallet(key_pair, account_number, sequence)
+        sequencer = WalletSequencer(node_client, wallet, max_in_flight=self.max_in_flight, metrics=self.metrics)
+
+        self.key_pair = key_pair
+        self.node_client = node_client
+        self.indexer_client = self.transport.indexer_client
+        self.block_height = self.transport.block_height
+        self.wallet = wallet
+        self.sequencer = sequencer
+
+        await self.configure_rate_limits()
+        self._initialized = True
+
+        if self.snapshot is not None and self._snapshot_task is None:
+            self._snapshot_task = asyncio.create_task(self.refresh_snapshot())
+
+    def save_wallet_cache(self):
+        """Persist the wallet's account number and next sequence to the wallet cache (if one is configured)"""
+        if self.wallet_cache is None or self.sequencer is None:
+            return
+        self.wallet_cache.put(self.node_client.builder.chain_id, self.wallet_address, self.wallet.account_number,
+                              self.sequencer.next_sequence)
+
+    @property
+    def _markets_key(self):
+        return f'markets/{self.rest_indexer}'
+
+    def _protocol_key(self, endpoint):
+        return f'protocol/{self.grpc_url}{endpoint}'
+
+    def _account_key(self, kind, subaccount_number):
+        return f'{kind}/{self.wallet_address}/{subaccount_number}'
+
+    def _snapshot_subaccounts(self, kind):
+        return sorted(int(key.rsplit('/', 1)[1]) for key, _ in self.snapshot.items(f'{kind}/{self.wallet_address}/'))
+
+    def restore_snapshot(self):
+        """
+        Load the snapshot store's markets, block rate limits and open orders (done on construction).
 
-        # Initialize indexer client
-        self.indexer_client = IndexerClient(self.rest_indexer)
+        Markets go into the market cache with their oracle prices aged by the time since they were saved, so
+        static market info (and order templates) is served at once while `get_market_data` still refetches a
+        stale oracle price. Open orders are merged into the order store.
 
-        # # Initialize key pair
-        self.key_pair = KeyPair.from_mnemonic(self.mnemonic)
+        Returns:
+            int: Number of restored entries
+        """
+        restored = 0
+        entry = self.snapshot.get(self._markets_key)
+        if entry is not None:
+            self.market_cache.restore(entry.value, entry.age)
+            restored += 1
+
+        entry = self.snapshot.get(self._protocol_key("/dydxprotocol/clob/block_rate"))
+        if entry is not None:
+            self.rate_limiter.configure_from_block_rate(entry.value)
+            restored += 1
+
+        for subaccount_number in self._snapshot_subaccounts('orders'):
+            self.order_store.upsert_many(self.snapshot.get(self._account_key('orders', subaccount_number)).value,
+                                         subaccount_number)
+            restored += 1
+        return restored
+
+    async def refresh_snapshot(self):
+        """
+        Reconcile restored state against live data and save it back to the snapshot store.
 
-        # Initialize wallet
-        self.wallet = await Wallet.from_mnemonic(
-            node=self.node_client,
-            mnemonic=self.mnemonic,
-            address=self.wallet_address
-        )
+        Started in the background once the clients are initialized: reloads every market, the protocol
+        parameters in the snapshot (bypassing `snapshot_max_age`, reconfiguring the order rate limits) and the
+        order history and positions of every subaccount in the snapshot (merging the orders into the order
+        store). A failed refresh keeps the restored state and is logged.
+        """
+        prefix = self._protocol_key('')
+        endpoints = [key[len(prefix):] for key, _ in self.snapshot.items(prefix)]
+        if self.transport.block_rate_limit:
+            # already loaded live by the transport on connect
+            endpoints = [endpoint for endpoint in endpoints if endpoint != "/dydxprotocol/clob/block_rate"]
+
+        async def refresh_protocol(endpoint):
+            response = await self.query_protocol(endpoint, max_age=0)
+            if endpoint == "/dydxprotocol/clob/block_rate":
+                self.rate_limiter.configure_from_block_rate(response)
+
+        async def refresh_orders(subaccount_number):
+            self.order_store.upsert_many(await self.get_order_history(subaccount_number), subaccount_number)
+
+        refreshes = [self.warm_market_cache()]
+        refreshes += [refresh_protocol(endpoint) for endpoint in endpoints]
+        refreshes += [refresh_orders(number) for number in self._snapshot_subaccounts('orders')]
+        refreshes += [self.get_positions(number) for number in self._snapshot_subaccounts('positions')]
+        for result in await asyncio.gather(*refreshes, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning("Error refreshing snapshot", exc_info=result)
+        self.flush_snapshot()
+
+    def _save_snapshot(self, key, value):
+        """Save an entry to the snapshot store, flushed after `snapshot_flush_delay` seconds"""
+        if self.snapshot is None:
+            return
+        self.snapshot.put(key, value)
+        if self._snapshot_flush is None:
+            self._snapshot_flush = asyncio.get_running_loop().call_later(self.snapshot_flush_delay,
+                                                                         self.flush_snapshot)
+
+    def flush_snapshot(self):
+        """Write pending snapshot saves to disk now (a failed write is logged, the next flush writes its entries)"""
+        handle, self._snapshot_flush = self._snapshot_flush, None
+        if handle is not None:
+            handle.cancel()
+        if self.snapshot is None:
+            return
+        try:
+            self.snapshot.flush()
+        except Exception:
+            logger.exception("Error writing snapshot", extra={'path': self.snapshot.path})
+
+    def save_open_orders(self):
+        """Save the order store's open orders of every subaccount in the snapshot (done on close)"""
+        if self.snapshot is None:
+            return
+        subaccounts = {number: [] for number in self._snapshot_subaccounts('orders')}
+        for order in self.order_store.open_orders():
+            subaccounts.setdefault(order['subaccountNumber'], []).append(order)
+        for subaccount_number, orders in subaccounts.items():
+            self.snapshot.put(self._account_key('orders', subaccount_number), orders)
+
+    @instrumented
+    async def warmup(self, market_ids=None):
+        """
+        Open every connection and prime the caches ahead of the first order.
+
+        Initializes the clients, then concurrently loads every market into the market cache and queries the
+        block height (opening the node gRPC channel, which a wallet loaded from the wallet cache has not used
+        yet), and finally builds the order templates of the markets.
 
-    async def get_market_data(self, market_id):
+        Args:
+            market_ids (iterable): Markets to build order templates for (every market if None)
+
+        Returns:
+            int: Number of cached markets
+        """
         await self.ensure_initialized_clients()
+        count, _ = await asyncio.gather(self.warm_market_cache(), self.block_height.refresh())
+        for market_id in market_ids or self.market_cache:
+            self.order_template(self.market_cache.get_static(market_id))
+        return count
 
-        """Get market data"""
-        markets_data = await self.indexer_client.markets.get_perpetual_markets(market_id)
-        return markets_data["markets"][market_id]
+    async def configure_rate_limits(self):
+        """
+        Configure the order rate limit buckets from the chain's `/dydxprotocol/clob/block_rate` limits.
+
+        Returns:
+            bool: Whether the limits could be loaded
+        """
+        response = self.transport.block_rate_limit
+        if response:
+            self._save_snapshot(self._protocol_key("/dydxprotocol/clob/block_rate"), response)
+        else:
+            response = await _optional(self.get_block_rate_limit())
+        if not response:
+            return False
+        self.rate_limiter.configure_from_block_rate(response)
+        return True
+
+    async def _indexer_request(self, request, *args, **kwargs):
+        """Run an indexer REST call once the (transport wide) indexer rate limit bucket has capacity"""
+        with self.metrics.span('indexer_rate_limit'):
+            await self.transport.indexer_limiter.acquire('indexer', priority=PRIORITY_LOW, wait=self.rate_limit_wait)
+
+        started = time.perf_counter()
+        try:
+            with mapped_errors():
+                response = await request(*args, **kwargs)
+        except Exception as e:
+            self.metrics.record_call('rest', request.__name__, time.perf_counter() - started, error_code(e))
+            raise
+        self.metrics.record_call('rest', request.__name__, time.perf_counter() - started, 200)
+        return response
+
+    @instrumented
+    async def get_market_data(self, market_id, max_oracle_age: float = None):
+        """
+        Get market data, served from the market cache when the cached oracle price is fresh enough.
+
+        Args:
+            market_id (str): The market ticker (e.g. 'BTC-USD')
+            max_oracle_age (float): Override for the oracle price TTL in seconds
+
+        Returns:
+            dict: The indexer perpetual market data
+        """
+        market = self.market_cache.get(market_id, max_oracle_age)
+        if market is not None:
+            return market
+
+        # Concurrent misses of a market (e.g. a burst of orders) share one request
+        task = self._market_fetches.get(market_id)
+        if task is None:
+            task = self._market_fetches[market_id] = asyncio.ensure_future(self._fetch_market_data(market_id))
+            task.add_done_callback(partial(self._market_fetched, market_id))
+        return await asyncio.shield(task)
+
+    def _market_fetched(self, market_id, task):
+        self._market_fetches.pop(market_id, None)
+        if not task.cancelled():
+            # retrieved here in case every waiter was cancelled
+            task.exception()
+
+    async def _fetch_market_data(self, market_id):
+        await self.ensure_initialized_clients()
+
+        markets_data = await self._indexer_request(self.indexer_client.markets.get_perpetual_markets, market_id)
+        # oracle price refreshes alone are not persisted, they are only served while fresh anyway
+        if self.market_cache.update(market_id, markets_data["markets"][market_id]):
+            self._save_snapshot(self._markets_key, self.market_cache.snapshot())
+        return self.market_cache.get_static(market_id)
 
     async def get_market_info(self, market_id):
+        """Get market information (static fields only, the oracle price may be stale)"""
+        market_info = self.market_cache.get_static(market_id)
+        if market_info is None:
+            market_info = await self.get_market_data(market_id)
+        return market_info
+
+    @instrumented
+    async def warm_market_cache(self):
+        """
+        Load every perpetual market into the market cache with a single indexer request.
+
+        Returns:
+            int: Number of cached markets
+        """
         await self.ensure_initialized_clients()
 
-        """Get market information"""
-        market_data = self.get_market_data(market_id)
-        return market_data["markets"][market_id]['market_info']
+        markets_data = await self._indexer_request(self.indexer_client.markets.get_perpetual_markets)
+        self.market_cache.update_many(markets_data["markets"])
+        self._save_snapshot(self._markets_key, self.market_cache.snapshot())
+        return len(self.market_cache)
 
-    async def get_market_status(self, market_id):
+    async def start_market_feed(self):
+        """
+        Keep cached oracle prices current from the indexer `v4_markets` websocket channel.
+
+        Returns:
+            Subscription: The underlying stream subscription
+        """
+        return await self.stream.markets(callback=self.market_cache.apply_markets_message,
+                                         on_disconnect=self.market_cache.live_markets.clear)
+
+    async def stop_market_feed(self):
+        """Stop updating the market cache from the `v4_markets` channel"""
+        await self._stop_feed('v4_markets')
+        self.market_cache.live_markets.clear()
+
+    async def start_subaccount_feed(self, subaccount_number=0):
+        """
+        Keep the order store current from the indexer `v4_subaccounts` websocket channel.
+
+        While the feed is connected, `get_order_by_components`, `fetch_order` and `cancel_order` resolve the
+        subaccount's orders locally instead of querying the indexer.
+
+        Returns:
+            Subscription: The underlying stream subscription
+        """
+        return await self.stream.subaccount(
+            self.wallet_address,
+            subaccount_number,
+            callback=self._on_subaccount_message,
+            on_disconnect=lambda: self.order_store.live_subaccounts.discard(subaccount_number)
+        )
+
+    async def ensure_subaccount_feed(self, subaccount_number=0, timeout=5.0):
+        """
+        Start the `v4_subaccounts` feed of a subaccount if needed and wait (at most `timeout` seconds) until the
+        indexer confirmed it, so updates of orders placed afterwards are not missed.
+        """
+        if self.order_store.is_live(subaccount_number):
+            return
+        subscription = await self.start_subaccount_feed(subaccount_number)
+        try:
+            await subscription.wait_subscribed(timeout)
+        except asyncio.TimeoutError:
+            # pending handles are reconciled once the subscription is confirmed, and expire meanwhile
+            logger.warning("Subaccount feed not confirmed in time", extra={'subaccount_number': subaccount_number})
+
+    def _on_subaccount_message(self, message):
+        self.order_store.apply_subaccounts_message(message)
+        stale = self.order_tracker.apply_subaccounts_message(message)
+        if stale:
+            task = asyncio.create_task(self._reconcile_orders(stale))
+            self._reconciles.add(task)
+            task.add_done_callback(self._reconciles.discard)
+
+    async def _reconcile_orders(self, handles):
+        """Fetch tracked orders that may have changed while the subaccount feed was down"""
+        async def reconcile(handle):
+            try:
+                order = await self._indexer_request(self.indexer_client.account.get_order, handle.id)
+            except NotFound:
+                # not indexed yet: the feed reports it later, or it expires
+                return
+            except Exception:
+                logger.exception("Error reconciling order", extra={'order_id': handle.id})
+                return
+            self.order_store.upsert(order)
+            self.order_tracker.refresh(handle)
+
+        await asyncio.gather(*(reconcile(handle) for handle in handles))
+
+    async def stop_subaccount_feed(self, subaccount_number=0):
+        """Stop updating the order store from the `v4_subaccounts` channel of a subaccount"""
+        self.order_store.live_subaccounts.discard(subaccount_number)
+        await self._stop_feed('v4_subaccounts', f'{self.wallet_address}/{subaccount_number}')
+
+    async def start_block_height_feed(self):
+        """
+        Feed the block height tracker from the indexer `v4_block_height` websocket channel.
+
+        Returns:
+            Subscription: The underlying stream subscription
+        """
         await self.ensure_initialized_clients()
+        return await self.stream.block_height(callback=self.block_height.apply_block_height_message)
+
+    async def track_orderbook(self, market_id, resync_on_crossed=False):
+        """
+        Maintain a local L2 order book of a market from the `v4_orderbook` websocket channel.
+
+        While a market's book is tracked and in sync, `create_order` prices market orders from its depth.
 
-        market_info = self.get_market_info(market_id)
+        Returns:
+            OrderBook: The live order book (also available in `self.order_books[market_id]`)
+        """
+        book = self.order_books.get(market_id)
+        if book is not None:
+            return book
+
+        market_info = await self.get_market_info(market_id)
+        book = self.order_books[market_id] = OrderBook(
+            market_id,
+            market_info['tickSize'],
+            market_info['atomicResolution'],
+            resync_on_crossed=resync_on_crossed
+        )
+
+        def resync():
+            if book.needs_resync and market_id not in self._book_resyncs:
+                self._book_resyncs[market_id] = asyncio.create_task(self._resync_orderbook(book))
+
+        def on_message(message):
+            book.apply_message(message)
+            resync()
+
+        def on_gap():
+            book.mark_gap()
+            resync()
+
+        await self.stream.orderbook(market_id, callback=on_message, on_disconnect=book.mark_gap, on_gap=on_gap)
+        return book
+
+    async def untrack_orderbook(self, market_id):
+        """Stop maintaining the local order book of a market"""
+        self.order_books.pop(market_id, None)
+        await self._stop_feed('v4_orderbook', market_id)
+
+    async def _resync_orderbook(self, book):
+        try:
+            await self.ensure_initialized_clients()
+            snapshot = await self._indexer_request(self.indexer_client.markets.get_perpetual_market_orderbook,
+                                                   book.market_id)
+            book.load_snapshot(snapshot)
+            book.resyncs += 1
+        except Exception:
+            logger.exception("Error resyncing order book", extra={'market_id': book.market_id})
+        finally:
+            self._book_resyncs.pop(book.market_id, None)
+
+    def _depth_price(self, market_id, side, size):
+        """Worst level price needed to fill `size` from the tracked order book (None if unavailable)"""
+        book = self.order_books.get(market_id)
+        if book is None or not book.synced or book.crossed:
+            return None
+        fill = book.vwap(side, size)
+        return None if fill is None else fill[1]
+
+    async def _stop_feed(self, channel, id=None):
+        for subscription in self.stream.subscriptions:
+            if subscription.key == (channel, id):
+                await subscription.unsubscribe()
+
+    async def get_market_status(self, market_id):
+        market_info = await self.get_market_info(market_id)
         status = market_info['status']
         return status
 
     async def get_market_imf(self, market_id):
-        await self.ensure_initialized_clients()
-
-        market_info = self.get_market_info(market_id)
+        market_info = await self.get_market_info(market_id)
         imf = market_info['initialMarginFraction']
         return imf
 
     async def get_market_mmf(self, market_id):
-        await self.ensure_initialized_clients()
-
-        market_info = self.get_market_info(market_id)
+        market_info = await self.get_market_info(market_id)
         mmf = market_info['maintenanceMarginFraction']
         return mmf
 
     async def get_market_tick_size(self, market_id):
-        await self.ensure_initialized_clients()
-
-        market_info = self.get_market_info(market_id)
+        market_info = await self.get_market_info(market_id)
         tick_size = market_info['tickSize']
         return tick_size
 
     async def get_market_step_size(self, market_id):
-        await self.ensure_initialized_clients()
-
-        market_info = self.get_market_info(market_id)
+        market_info = await self.get_market_info(market_id)
         step_size = market_info['stepSize']
         return step_size
 
-    async def get_block_rate_limit(self, endpoint: str = "/dydxprotocol/clob/block_rate"):
+    @instrumented
+    async def query_protocol(self, endpoint: str, max_age: float = None):
         """
-        Query dYdX protocol parameters using a direct HTTP request.
+        Query dYdX protocol parameters over the shared, connection-pooled HTTP session.
+
+        With a snapshot store, a saved response is served instead while it is younger than `max_age` seconds
+        and every live response is saved.
 
         Args:
-            endpoint (str): The specific endpoint to query, defaults to CLOB params
+            endpoint (str): The specific endpoint to query, e.g. '/dydxprotocol/clob/block_rate'
+            max_age (float): Oldest saved response to serve in seconds (default `snapshot_max_age`, 0: query)
 
         Returns:
-            dict: The JSON response from the endpoint or None if there was an error
-        """
-        await self.ensure_initialized_clients()
-
-        try:
-            # Extract the base URL from the node client's channel
-            # This assumes the node client has a channel with a base_url attribute
-            # If not, you'll need to construct the URL differently
-            base_url = self.grpc_url
-
-            # Ensure the base_url doesn't end with a slash
-            if base_url.endswith('/'):
-                base_url = base_url[:-1]
+            dict: The JSON response from the endpoint
 
-            # Ensure the endpoint starts with a slash
-            if not endpoint.startswith('/'):
-                endpoint = '/' + endpoint
+        Raises:
+            DydxError: The mapped failure (e.g. `NotFound`, `ServerError`, `NetworkError`)
+        """
+        if self.snapshot is not None:
+            entry = self.snapshot.get(self._protocol_key(endpoint), self.snapshot_max_age if max_age is None
+                                      else max_age)
+            if entry is not None:
+                return entry.value
 
-            url = f"{base_url}{endpoint}"
+        response = await self.protocol.query_protocol(endpoint)
+        self._save_snapshot(self._protocol_key(endpoint), response)
+        return response
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        print(f"Error querying {url}: HTTP {response.status}")
-                        return None
+    async def get_block_rate_limit(self, endpoint: str = "/dydxprotocol/clob/block_rate"):
+        """
+        Query the CLOB per-block order/cancel rate limit configuration.
 
-                    return await response.json()
+        Args:
+            endpoint (str): The specific endpoint to query, defaults to the CLOB block rate limit config
 
-        except Exception as e:
-            print(f"Error fetching protocol parameters: {e}")
-            return None
+        Returns:
+            dict: The JSON response from the endpoint
+        """
+        return await self.query_protocol(endpoint)
 
     async def get_equity_tier(self, endpoint: str = "/dydxprotocol/clob/equity_tier"):
         """
-        Query dYdX protocol parameters using a direct HTTP request.
+        Query the CLOB equity tier limit configuration (open order caps per equity tier).
 
         Args:
-            endpoint (str): The specific endpoint to query, defaults to CLOB params
+            endpoint (str): The specific endpoint to query, defaults to the CLOB equity tier config
 
         Returns:
-            dict: The JSON response from the endpoint or None if there was an error
+            dict: The JSON response from the endpoint
         """
-        await self.ensure_initialized_clients()
-
-        try:
-            # Extract the base URL from the node client's channel
-            # This assumes the node client has a channel with a base_url attribute
-            # If not, you'll need to construct the URL differently
-            base_url = self.grpc_url
+        return await self.query_protocol(endpoint)
 
-            # Ensure the base_url doesn't end with a slash
-            if base_url.endswith('/'):
-                base_url = base_url[:-1]
-
-            # Ensure the endpoint starts with a slash
-            if not endpoint.startswith('/'):
-                endpoint = '/' + endpoint
-
-            url = f"{base_url}{endpoint}"
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        print(f"Error querying {url}: HTTP {response.status}")
-                        return None
+    async def get_user_stats(self, endpoint: str = "/dydxprotocol/v4/stats/user_stats"):
+        """
+        Query the wallet's trailing 30 day taker / maker notional (the volume its fee tier is based on).
 
-                    return await response.json()
+        Args:
+            endpoint (str): The specific endpoint to query, defaults to the user stats query
 
-        except Exception as e:
-            print(f"Error fetching protocol parameters: {e}")
-            return None
+        Returns:
+            dict: The JSON response from the endpoint
+        """
+        return await self.query_protocol(f"{endpoint}?user={self.wallet_address}")
 
     async def get_fee_tiers(self, endpoint: str = "/dydxprotocol/v4/feetiers/perpetual_fee_params"):
         """
-        Query dYdX protocol parameters using a direct HTTP request.
+        Query the perpetual fee tier parameters.
 
         Args:
-            endpoint (str): The specific endpoint to query, defaults to CLOB params
+            endpoint (str): The specific endpoint to query, defaults to the perpetual fee params
 
         Returns:
-            dict: The JSON response from the endpoint or None if there was an error
+            dict: The JSON response from the endpoint
+        """
+        return await self.query_protocol(endpoint)
+
+    @instrumented
+    async def create_order(self, market_id, side, size, price=0, slippage=0.01, reduce_only=False, subaccount_number=0,
+                           track=False):
+        """
+        Place a market or limit order on dYdX.
+
+        With `track=True` an `OrderHandle` is returned instead of (order_id, transaction): its fills and final
+        status are resolved from the subaccount feed (started if needed) rather than by polling `fetch_order`.
+
+        Raises:
+            DydxError: The mapped failure, e.g. a `TransactionError` subclass for a rejected transaction (check
+                       `retryable` / `backoff_hint` before placing the order again)
+            ValueError: The size is below the market's step size (or the price below its tick size)
         """
         await self.ensure_initialized_clients()
+        metrics = self.metrics
 
         try:
-            # Extract the base URL from the node client's channel
-            # This assumes the node client has a channel with a base_url attribute
-            # If not, you'll need to construct the URL differently
-            base_url = self.grpc_url
+            # Get market information
+            with metrics.span('market_data'):
+                market_info = await self.get_market_data(market_id)
 
-            # Ensure the base_url doesn't end with a slash
-            if base_url.endswith('/'):
-                base_url = base_url[:-1]
+            # Get current block height (tracked in the background, only queried if stale)
+            with metrics.span('block_height'):
+                current_block = await self.block_height.current()
 
-            # Ensure the endpoint starts with a slash
-            if not endpoint.startswith('/'):
-                endpoint = '/' + endpoint
+            with metrics.span('build'):
+                order_id, new_order = self._build_order(market_info, current_block, market_id, side, size, price,
+                                                        slippage, reduce_only, subaccount_number)
 
-            url = f"{base_url}{endpoint}"
+            logger.debug("Placing order %s", order_id, extra={'market_id': market_id, 'side': side, 'size': size})
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        print(f"Error querying {url}: HTTP {response.status}")
-                        return None
+            if not track:
+                transaction = await self._submit_order(new_order, market_id)
+                return order_id, transaction
 
-                    return await response.json()
+            # Registered before the broadcast, the feed can report the order before the response arrives
+            await self.ensure_subaccount_feed(subaccount_number)
+            handle = self._track(order_id, market_id)
+            try:
+                handle.transaction = await self._submit_order(new_order, market_id)
+            except Exception:
+                self.order_tracker.resolve(handle, REJECTED)
+                raise
+            return handle
 
         except Exception as e:
-            print(f"Error fetching protocol parameters: {e}")
-            return None
+            # Mapped failures are logged without a traceback
+            logger.error("Error placing order: %s", e, exc_info=not isinstance(e, DydxError),
+                         extra={'market_id': market_id, 'side': side, 'size': size, 'price': price})
+            raise
 
-    async def create_order(self, market_id, side, size, price=0, slippage=0.01, reduce_only=False, subaccount_number=0):
-        """Place a market or limit order on dYdX"""
-        await self.ensure_initialized_clients()
+    async def track_order(self, order_id, market_id=None, transaction=None) -> OrderHandle:
+        """
+        Return an `OrderHandle` of an already placed order (e.g. placed by `create_order` without tracking).
 
-        try:
-            # Get market information
-            market_info = await self.get_market_data(market_id)
-            market = Market(market_info)
+        When the subaccount feed was not live yet, the order is fetched once to pick up the updates it missed.
 
-            # Determine order type and price
-            order_type = OrderType.LIMIT if price else OrderType.MARKET
+        Args:
+            order_id (OrderId): The protobuf order id
+            market_id (str): The market ticker
+            transaction: The order's broadcast response, kept on the handle
 
-            # Normalize side case to upper
-            side = side.upper()
+        Returns:
+            OrderHandle: The order's handle
+        """
+        await self.ensure_initialized_clients()
+        subaccount_number = order_id.subaccount_id.number
+        live = self.order_store.is_live(subaccount_number)
+        await self.ensure_subaccount_feed(subaccount_number)
+
+        handle = self._track(order_id, market_id)
+        if transaction is not None:
+            handle.transaction = transaction
+        if not live and not handle.is_done:
+            await self._reconcile_orders([handle])
+        return handle
+
+    def _track(self, order_id, market_id):
+        # Short-term orders are expired by block height
+        if self.order_tracker.apply_block_height not in self.block_height.listeners:
+            self.block_height.listeners.append(self.order_tracker.apply_block_height)
+        return self.order_tracker.track(order_id, market_id)
+
+    @instrumented
+    async def create_orders(self, orders, concurrency=10):
+        """
+        Place a batch of market and/or limit orders.
 
-            # Flag for order term length (Long or Short: limit or market)
-            order_term = None
+        Market data is fetched once per distinct market and the block height once for the whole batch, every
+        order is built and signed up front and the broadcasts run concurrently (at most `concurrency` at once).
+        A failing order does not abort the rest of the batch.
 
-            # Get latest oracle price
-            oracle_price = Decimal(market.market.get('oraclePrice'))
+        Args:
+            orders (list): One dict per order with the `create_order` keyword arguments
+                           (market_id, side, size and optionally price, slippage, reduce_only, subaccount_number)
+            concurrency (int): Maximum number of concurrent broadcasts
 
-            # Create target price
-            target_price = None
+        Returns:
+            list: Per order (in input order), either (order_id, transaction) or the exception raised for it
+        """
+        await self.ensure_initialized_clients()
 
-            if order_type == OrderType.MARKET:
-                order_term = OrderFlags.SHORT_TERM
-                # calculate the nearest target price based on the trade side (for market orders only)
-                target_price = Decimal(1.00 + slippage) * oracle_price if side == 'BUY' else Decimal(1 - slippage) * oracle_price
+        market_ids = list(dict.fromkeys(order['market_id'] for order in orders))
+        with self.metrics.span('market_data'):
+            market_data = await asyncio.gather(*[self.get_market_data(market_id) for market_id in market_ids],
+                                               return_exceptions=True)
+        markets = dict(zip(market_ids, market_data))
+        with self.metrics.span('block_height'):
+            current_block = await self.block_height.current()
+
+        results = [None] * len(orders)
+        prepared = []
+        for index, order in enumerate(orders):
+            try:
+                market_info = markets[order['market_id']]
+                if isinstance(market_info, Exception):
+                    raise market_info
+                prepared.append((index, order['market_id'], *self._build_order(market_info, current_block, **order)))
+            except Exception as e:
+                results[index] = e
+
+        await self._submit_orders(prepared, results, concurrency)
+        return results
+
+    async def _submit_orders(self, prepared, results, concurrency):
+        """Broadcast built orders concurrently, storing (order_id, transaction) or the exception in `results`"""
+        slots = asyncio.Semaphore(concurrency)
+
+        async def submit(index, market_id, order_id, new_order):
+            async with slots:
+                try:
+                    results[index] = (order_id, await self._submit_order(new_order, market_id))
+                except Exception as e:
+                    results[index] = e
+
+        await asyncio.gather(*[submit(*entry) for entry in prepared])
+
+    @instrumented
+    async def create_ladder(self, market_id, side, prices, sizes, reduce_only=False, subaccount_number=0,
+                            concurrency=10):
+        """
+        Place a ladder of limit orders on one market, e.g. one side of a grid.
 
-            if order_type == OrderType.LIMIT:
-                order_term = OrderFlags.LONG_TERM
-                target_price = Decimal(str(price))
+        Every level is a post-only long-term order like the limit orders of `create_order`. The sizes and prices
+        of all levels are quantized in one vectorized pass (sizes down to the step size, prices to the tick that
+        is not worse for the side) and the broadcasts run concurrently (at most `concurrency` at once). Levels
+        priced through the oracle price fail with `InvalidPrice`; a failing level does not abort the rest.
 
-                if side == 'BUY' and target_price > oracle_price:
-                    raise InvalidPrice(
-                        "Buy price too high compared to oracle price",
-                        market=market_id,
-                        side=side,
-                        price=target_price,
-                        oracle_price=oracle_price
-                    )
+        Args:
+            market_id (str): The market ticker
+            side (str): 'BUY' or 'SELL'
+            prices: Prices in USD (array-like, one per level)
+            sizes: Sizes in base units (array-like, one per level, or a single size for every level)
 
-                if side == 'SELL' and target_price < oracle_price:
-                    raise InvalidPrice(
-                        "Sell price too low compared to oracle price",
-                        market=market_id,
-                        side=side,
-                        price=target_price,
-                        oracle_price=oracle_price
-                    )
+        Returns:
+            list: Per level (in input order), either (order_id, transaction) or the exception raised for it
+        """
+        await self.ensure_initialized_clients()
 
-            # generate order id
-            order_id = market.order_id(self.wallet_address, subaccount_number, random.randint(0, MAX_CLIENT_ID), order_term)
+        with self.metrics.span('market_data'):
+            market_info = await self.get_market_data(market_id)
+        with self.metrics.span('build'):
+            results, prepared = self._build_ladder(market_info, market_id, side, prices, sizes, reduce_only,
+                                                   subaccount_number)
+        await self._submit_orders(prepared, results, concurrency)
+        return results
 
-            pprint.pprint(order_id)
+    def _build_ladder(self, market_info, market_id, side, prices, sizes, reduce_only=False, subaccount_number=0):
+        """
+        Build the orders of `create_ladder` (no I/O).
 
-            # Determine side
-            order_side = Order.Side.SIDE_BUY if side.upper() == 'BUY' else Order.Side.SIDE_SELL
+        Returns:
+            tuple: (results with an `InvalidPrice` for every crossing level, [(index, market_id, order_id, order)])
+        """
+        import numpy as np
+
+        template = self.order_template(market_info)
+        side = side.upper()
+        prices = np.asarray(prices, dtype=np.float64)
+        sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float64), prices.shape)
+
+        oracle_price = float(market_info['oraclePrice'])
+        crossing = prices > oracle_price if side == 'BUY' else prices < oracle_price
+        results = [None] * len(prices)
+        for index in np.flatnonzero(crossing).tolist():
+            results[index] = InvalidPrice(
+                "Buy price too high compared to oracle price" if side == 'BUY'
+                else "Sell price too low compared to oracle price",
+                market=market_id,
+                side=side,
+                price=float(prices[index]),
+                oracle_price=oracle_price
+            )
 
-            # Get current block height
-            current_block = await self.node_client.latest_block_height()
+        levels = np.flatnonzero(~crossing)
+        order_ids = [template.order_id(self.wallet_address, subaccount_number, random.randint(0, MAX_CLIENT_ID),
+                                       OrderFlags.LONG_TERM)
+                     for _ in range(len(levels))]
+        new_orders = template.orders(order_ids, Order.Side.SIDE_BUY if side == 'BUY' else Order.Side.SIDE_SELL,
+                                     sizes[levels], prices[levels],
+                                     time_in_force=Order.TimeInForce.TIME_IN_FORCE_POST_ONLY,
+                                     reduce_only=reduce_only,
+                                     good_til_block_time=int(time.time()) + (24 * 60 * 60 * 30))
+        prepared = [(index, market_id, order_id, new_order)
+                    for index, order_id, new_order in zip(levels.tolist(), order_ids, new_orders)]
+        return results, prepared
+
+    @instrumented
+    async def prepare_order(self, market_id, side, size, price=0, slippage=0.01, reduce_only=False,
+                            subaccount_number=0):
+        """
+        Build and sign an order without broadcasting it, e.g. to pre-sign orders ahead of a trigger.
 
-            # Create order object
-            new_order = market.order(
-                order_id=order_id,
-                order_type=order_type,
-                side=order_side,
-                size=Decimal(str(size)),
-                price=target_price,
-                reduce_only=reduce_only,
-                time_in_force=Order.TimeInForce.TIME_IN_FORCE_UNSPECIFIED
-            )
+        Short-term (market) orders expire at the tracked block height + 10, so they must be submitted with
+        `submit_prepared_order` within a few blocks.
 
-            if order_type == OrderType.MARKET:
-                new_order.good_til_block = current_block + 10
-                new_order.time_in_force = Order.TimeInForce.TIME_IN_FORCE_IOC
-            if order_type == OrderType.LIMIT:
-                # Get current time in seconds since epoch
-                current_time = int(time.time())
-                # Set goodTilBlockTime (e.g., 24 hours from now)
-                good_til_block_time = current_time + (24 * 60 * 60 * 30)  # 30 days from now (max val v4)
-                new_order.good_til_block_time = good_til_block_time
-                new_order.time_in_force = Order.TimeInForce.TIME_IN_FORCE_POST_ONLY
-
-            # Place the order
-            transaction = await self.node_client.place_order(
-                wallet=self.wallet,
-                order=new_order,
-            )
+        Returns:
+            PreparedOrder: The order id, protobuf order and signed transaction
+        """
+        await self.ensure_initialized_clients()
 
-            # Increment wallet sequence for next transaction
-            self.wallet.sequence += 1
+        with self.metrics.span('market_data'):
+            market_info = await self.get_market_data(market_id)
+        with self.metrics.span('block_height'):
+            current_block = await self.block_height.current()
+        with self.metrics.span('build'):
+            order_id, new_order = self._build_order(market_info, current_block, market_id, side, size, price,
+                                                    slippage, reduce_only, subaccount_number)
+        signed = self.sequencer.presign(
+            place_order_message(new_order),
+            stateful=new_order.order_id.order_flags != OrderFlags.SHORT_TERM
+        )
+        return PreparedOrder(market_id, order_id, new_order, signed)
 
-            if transaction.tx_response.code == 2001:
-                raise ReduceOnlyOrderError(tx_hash=transaction.tx_response.txhash,
-                                           code=transaction.tx_response.code,
-                                           raw_log=transaction.tx_response.raw_log)
+    @instrumented
+    async def submit_prepared_order(self, prepared):
+        """
+        Broadcast an order signed by `prepare_order`.
 
-            if transaction.tx_response.code == 9003:
-                raise ReduceOnlyOrderError(tx_hash=transaction.tx_response.txhash,
-                                           code=transaction.tx_response.code,
-                                           raw_log=transaction.tx_response.raw_log)
+        Returns:
+            tuple: (order_id, transaction)
+        """
+        transaction = await self._submit_order(prepared.order, prepared.market_id, signed=prepared.signed)
+        return prepared.order_id, transaction
 
-            return order_id, transaction
+    async def get_quantizer(self, market_id) -> 'Quantizer':
+        """
+        Return the price / size quantizer of a market (its order template), from the cached market parameters.
 
-        except Exception as e:
-            print(f"Error placing order: {e}")
-            import traceback
-            traceback.print_exc()
+        Use it to round prices and sizes to the market's tick and step size (`round_price`, `round_size`), or to
+        convert whole ladders to subticks / quantums at once (`subticks_array`, `quantums_array`).
+        """
+        return self.order_template(await self.get_market_data(market_id))
+
+    def order_template(self, market_info):
+        """Return the precompiled order template of a market, rebuilt when its static parameters change"""
+        key = (
+            market_info['clobPairId'],
+            market_info['atomicResolution'],
+            market_info['quantumConversionExponent'],
+            market_info['stepBaseQuantums'],
+            market_info['subticksPerTick'],
+        )
+        cached = self.order_templates.get(market_info['ticker'])
+        if cached is None or cached[0] != key:
+            cached = self.order_templates[market_info['ticker']] = (key, OrderTemplate.from_market(market_info))
+        return cached[1]
+
+    def _build_order(self, market_info, current_block, market_id, side, size, price=0, slippage=0.01,
+                     reduce_only=False, subaccount_number=0):
+        """Build the order id and protobuf order for `create_order` (no I/O)"""
+        template = self.order_template(market_info)
+
+        # Determine order type and price
+        order_type = OrderType.LIMIT if price else OrderType.MARKET
+
+        # Normalize side case to upper
+        side = side.upper()
+
+        # Flag for order term length (Long or Short: limit or market)
+        order_term = None
+
+        # Get latest oracle price
+        oracle_price = float(market_info['oraclePrice'])
+
+        # Create target price
+        target_price = None
+
+        if order_type == OrderType.MARKET:
+            order_term = OrderFlags.SHORT_TERM
+            # price from real depth when the market's order book is tracked, otherwise from the oracle price
+            reference_price = float(self._depth_price(market_id, side, size) or oracle_price)
+            # calculate the nearest target price based on the trade side (for market orders only)
+            target_price = (1.00 + slippage) * reference_price if side == 'BUY' else (1 - slippage) * reference_price
+
+        if order_type == OrderType.LIMIT:
+            order_term = OrderFlags.LONG_TERM
+            target_price = float(price)
+
+            if side == 'BUY' and target_price > oracle_price:
+                raise InvalidPrice(
+                    "Buy price too high compared to oracle price",
+                    market=market_id,
+                    side=side,
+                    price=target_price,
+                    oracle_price=oracle_price
+                )
+
+            if side == 'SELL' and target_price < oracle_price:
+                raise InvalidPrice(
+                    "Sell price too low compared to oracle price",
+                    market=market_id,
+                    side=side,
+                    price=target_price,
+                    oracle_price=oracle_price
+                )
+
+        # generate order id
+        order_id = template.order_id(self.wallet_address, subaccount_number, random.randint(0, MAX_CLIENT_ID), order_term)
+
+        # Determine side
+        order_side = Order.Side.SIDE_BUY if side == 'BUY' else Order.Side.SIDE_SELL
+
+        # Create order object
+        if order_type == OrderType.MARKET:
+            new_order = template.order(order_id, order_side, size, target_price,
+                                       time_in_force=Order.TimeInForce.TIME_IN_FORCE_IOC,
+                                       reduce_only=reduce_only,
+                                       good_til_block=current_block + 10)
+        else:
+            # Get current time in seconds since epoch
+            current_time = int(time.time())
+            # Set goodTilBlockTime (e.g., 24 hours from now)
+            good_til_block_time = current_time + (24 * 60 * 60 * 30)  # 30 days from now (max val v4)
+            new_order = template.order(order_id, order_side, size, target_price,
+                                       time_in_force=Order.TimeInForce.TIME_IN_FORCE_POST_ONLY,
+                                       reduce_only=reduce_only,
+                                       good_til_block_time=good_til_block_time)
+
+        return order_id, new_order
+
+    async def _submit_order(self, new_order, market_id=None, signed=None):
+        """Broadcast a built (or pre-signed) order, raise the mapped error of a rejection, record accepted orders"""
+        stateful = new_order.order_id.order_flags != OrderFlags.SHORT_TERM
+
+        # Wait for (or fail fast without) a token of the chain's per-block order limits
+        with self.metrics.span('rate_limit'):
+            await self.rate_limiter.acquire('stateful_order' if stateful else 'short_term_order',
+                                            priority=PRIORITY_NORMAL, wait=self.rate_limit_wait)
+
+        # Place the order (only stateful orders consume an account sequence)
+        if signed is None:
+            transaction = await self.sequencer.broadcast(place_order_message(new_order), stateful=stateful)
+        else:
+            transaction = await self.sequencer.broadcast_signed(signed)
+
+        # A re-sent transaction answered with "already in mempool" was accepted by an earlier attempt
+        error = tx_error(transaction.tx_response)
+        if error is not None:
+            raise error
+
+        self.order_store.add_placed(new_order.order_id, new_order, market_id)
+        return transaction
+
+    async def _market_scales(self, clob_pair_ids):
+        """clob pair id -> `MarketScale` covering the given markets (loading the market cache if one is missing)"""
+        from .records import MarketScale
+
+        wanted = {int(clob_pair_id) for clob_pair_id in clob_pair_ids}
+        if wanted.issubset(self.market_scales):
+            return self.market_scales
+
+        cached = {int(self.market_cache.get_static(market_id)['clobPairId']) for market_id in self.market_cache}
+        if not wanted.issubset(cached):
+            await self.warm_market_cache()
+        for market_id in self.market_cache:
+            market = self.market_cache.get_static(market_id)
+            self.market_scales[int(market['clobPairId'])] = MarketScale.from_market(market)
+        return self.market_scales
+
+    async def _typed_order(self, order):
+        from .records import OrderRecord
+
+        if order is None:
             return None
+        scales = await self._market_scales([order['clobPairId']])
+        return OrderRecord.from_indexer(order, scales[int(order['clobPairId'])])
 
-    async def get_order_by_components(self, client_id, order_flags, clob_pair_id, subaccount_number=0):
+    @instrumented
+    async def get_order_by_components(self, client_id, order_flags, clob_pair_id, subaccount_number=0, typed=False):
         """
         Fetches the most recent data for an order by matching its components.
 
+        Orders placed through this client (or seen on the `v4_subaccounts` feed or in earlier indexer results)
+        are resolved from the local order store without a request; the indexer is only queried for unknown orders.
+
         Args:
             client_id (int): The client ID of the order
             order_flags (int): The order flags (e.g., 64 for LONG_TERM)
             clob_pair_id (int): The CLOB pair ID (market ID)
             subaccount_number (int): The subaccount number (default: 0)
+            typed (bool): Return an `OrderRecord` (integer quantums / subticks) instead of the indexer dict
 
         Returns:
             dict: Order data if found, None otherwise
+
+        Raises:
+            DydxError: The mapped failure of the indexer request (other than `NotFound`)
         """
+        order = self.order_store.get(client_id, order_flags, clob_pair_id, subaccount_number)
+        if order is not None:
+            return await self._typed_order(order) if typed else order
+
         await self.ensure_initialized_clients()
 
+        # The indexer id is derived from the order id components, so any order is a single request away
+        order_id = order_uuid(self.wallet_address, subaccount_number, client_id, clob_pair_id, order_flags)
         try:
-            # Ensure indexer client is initialized
-            if not self.indexer_client:
-                await self.initialize_clients()
-
-            # Get recent orders for the subaccount
-            response = await self.indexer_client.account.get_subaccount_orders(
-                address=self.wallet_address,
-                subaccount_number=subaccount_number,
-                limit=100  # Increase if needed to find older orders
-            )
-
-            # Find the matching order
-            for order in response:
-                if (str(order['clientId']) == str(client_id) and
-                        str(order['orderFlags']) == str(order_flags) and
-                        str(order['clobPairId']) == str(clob_pair_id)):
-                    # Since order is already a dictionary, just return it
-                    return order
-
-            # No matching order found
-            return None
-
-        except Exception as e:
-            print(f"Error retrieving order: {e}")
-            import traceback
-            traceback.print_exc()
+            order = await self._indexer_request(self.indexer_client.account.get_order, order_id)
+        except NotFound:
+            # No matching order found -> None
             return None
+        order = self.order_store.upsert(order, subaccount_number)
+        return await self._typed_order(order) if typed else order
 
-    async def fetch_order(self, order_id: str):
+    @instrumented
+    async def fetch_order(self, order_id: str, typed=False):
         """
         {'clientId': '1778978642',
           'clientMetadata': '1',
@@ -421,96 +1753,626 @@ class DYDX:
           'updatedAt': '2025-04-24T23:53:43.952Z',
           'updatedAtHeight': '43200717'}
         :param order_id:
+        :param typed: Return an `OrderRecord` (integer quantums / subticks) instead of the indexer dict
         :return:
         """
+        # Orders of a subaccount streamed over v4_subaccounts are already current in the order store
+        order = self.order_store.get_by_id(order_id)
+        if order is not None and self.order_store.is_live(order['subaccountNumber']):
+            return await self._typed_order(order) if typed else order
 
         await self.ensure_initialized_clients()
 
-        order = await self.indexer_client.account.get_order(order_id)
-        return order
+        order = await self._indexer_request(self.indexer_client.account.get_order, order_id)
+        self.order_store.upsert(order)
+        return await self._typed_order(order) if typed else order
 
+    @instrumented
     async def cancel_order(self, order_data):
         """
         Cancels an order on dYdX.
 
         Args:
-            order_data (dict): Dictionary containing order ID components
-                              (client_id, order_flags, clob_pair_id)
+            order_data (dict | str): Dictionary containing order ID components
+                              (client_id, order_flags, clob_pair_id), or the indexer order id
 
         Returns:
             dict: Transaction response
+
+        Raises:
+            DydxError: The mapped failure, e.g. a `TransactionError` subclass for a rejected cancel
         """
         await self.ensure_initialized_clients()
 
         try:
-            # Extract required fields from order_data
-            client_id = order_data.get('clientId') or order_data.get('client_id')
-            order_flags = order_data.get('orderFlags') or order_data.get('order_flags')
-            clob_pair_id = order_data.get('clobPairId') or order_data.get('clob_pair_id')
-            good_til_block = order_data.get('goodTilBlock') or order_data.get('good_til_block')
-            good_til_block_time = order_data.get('goodTilBlockTime') or order_data.get('good_til_block_time')
-
-            # Create order_id dictionary
-            order_id = {
-                'subaccount_id': {
-                    'owner': self.wallet_address
-                },
-                'client_id': int(client_id),
-                'order_flags': int(order_flags),
-                'clob_pair_id': int(clob_pair_id),
-            }
+            if isinstance(order_data, str) and self.order_store.get_by_id(order_data) is None:
+                with self.metrics.span('fetch_order'):
+                    await self.fetch_order(order_data)
 
-            # For stateful orders (order_flags = 64 for LONG_TERM)
-            if int(order_flags) == 64:
-                # If goodTilBlockTime is a string (ISO format), convert to timestamp
-                if good_til_block_time and isinstance(good_til_block_time, str):
-                    datetime_obj = datetime.datetime.fromisoformat(good_til_block_time.replace('Z', '+00:00'))
-                    good_til_block_time = int(datetime_obj.timestamp())
-
-                # Get current time if goodTilBlockTime is not provided
-                if not good_til_block_time:
-                    good_til_block_time = int(time.time()) + (24 * 60 * 60 * 30)  # 90 days from now (max val v4)
+            order_id, good_til_block, good_til_block_time = self._parse_cancel(order_data)
 
+            # For stateful orders (order_flags = 64 for LONG_TERM)
+            if order_id['order_flags'] == 64:
                 # Cancel the order with goodTilBlockTime
-                tx = await self.node_client.cancel_order(
-                    wallet=self.wallet,
-                    order_id=order_id,
-                    good_til_block_time=good_til_block_time
+                with self.metrics.span('rate_limit'):
+                    await self.rate_limiter.acquire('stateful_cancel', priority=PRIORITY_HIGH,
+                                                    wait=self.rate_limit_wait)
+                tx = await self.sequencer.broadcast(
+                    cancel_order_message(order_id, good_til_block_time=good_til_block_time),
+                    stateful=True
                 )
             else:
-                # For short-term orders
-                tx = await self.node_client.cancel_order(
-                    wallet=self.wallet,
-                    order_id=order_id,
-                    good_til_block=good_til_block
+                # For short-term orders, fall back to the tracked block height if the order's goodTilBlock is unknown
+                if not good_til_block:
+                    with self.metrics.span('block_height'):
+                        good_til_block = await self.block_height.current() + 10
+
+                # Cancels go ahead of queued placements sharing the short-term bucket
+                with self.metrics.span('rate_limit'):
+                    await self.rate_limiter.acquire('short_term_cancel', priority=PRIORITY_HIGH,
+                                                    wait=self.rate_limit_wait)
+                tx = await self.sequencer.broadcast(
+                    cancel_order_message(order_id, good_til_block=good_til_block),
+                    stateful=False
                 )
 
-            # Increment wallet sequence for next transaction
-            self.wallet.sequence += 1
-
+            error = tx_error(tx.tx_response)
+            if error is not None:
+                raise error
             return tx
 
         except Exception as e:
-            print(f"Error canceling order: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+            logger.error("Error canceling order: %s", e, exc_info=not isinstance(e, DydxError),
+                         extra={'order': order_data})
+            raise
+
+    @instrumented
+    async def cancel_orders(self, orders, concurrency=10):
+        """
+        Cancel a batch of orders.
+
+        Short-term orders are grouped per subaccount and cancelled with a single MsgBatchCancel transaction.
+        Stateful (long-term) orders cannot be batch cancelled by the protocol, so their cancels are broadcast
+        concurrently (at most `concurrency` at once). A failing cancel does not abort the rest of the batch.
+
+        Args:
+            orders (list): Order dicts or indexer order ids as accepted by `cancel_order` (ids must be known to the
+                           order store)
+            concurrency (int): Maximum number of concurrent broadcasts
+
+        Returns:
+            list: Per order (in input order), either the transaction response or the exception raised for it
+        """
+        await self.ensure_initialized_clients()
+
+        results = [None] * len(orders)
+        short_term = {}
+        stateful = []
+        for index, order_data in enumerate(orders):
+            try:
+                order_id, good_til_block, good_til_block_time = self._parse_cancel(order_data)
+            except Exception as e:
+                results[index] = e
+                continue
+
+            if order_id['order_flags'] == 64:
+                stateful.append((index, order_id, good_til_block_time))
+            else:
+                subaccount_number = order_id['subaccount_id']['number']
+                short_term.setdefault(subaccount_number, []).append((index, order_id, good_til_block))
+
+        current_block = await self.block_height.current() if short_term else None
+        slots = asyncio.Semaphore(concurrency)
+
+        async def cancel_batch(subaccount_number, entries):
+            # The batch cancel covers orders expiring up to its goodTilBlock, which must stay within the
+            # short-term window (current block + 20)
+            good_til_block = max([current_block + 10] + [gtb for _, _, gtb in entries if gtb])
+            good_til_block = min(good_til_block, current_block + 20)
+
+            client_ids = {}
+            for _, order_id, _ in entries:
+                client_ids.setdefault(order_id['clob_pair_id'], []).append(order_id['client_id'])
+
+            message = batch_cancel_message(
+                subaccount_id=SubaccountId(owner=self.wallet_address, number=subaccount_number),
+                short_term_cancels=[OrderBatch(clob_pair_id=clob_pair_id, client_ids=ids)
+                                    for clob_pair_id, ids in client_ids.items()],
+                good_til_block=good_til_block
+            )
+            async with slots:
+                try:
+                    await self.rate_limiter.acquire('short_term_cancel', priority=PRIORITY_HIGH,
+                                                    wait=self.rate_limit_wait)
+                    tx = await self.sequencer.broadcast(message, stateful=False)
+                    tx = tx_error(tx.tx_response) or tx
+                except Exception as e:
+                    tx = e
+            for index, _, _ in entries:
+                results[index] = tx
+
+        async def cancel_stateful(index, order_id, good_til_block_time):
+            async with slots:
+                try:
+                    await self.rate_limiter.acquire('stateful_cancel', priority=PRIORITY_HIGH,
+                                                    wait=self.rate_limit_wait)
+                    tx = await self.sequencer.broadcast(
+                        cancel_order_message(order_id, good_til_block_time=good_til_block_time),
+                        stateful=True
+                    )
+                    results[index] = tx_error(tx.tx_response) or tx
+                except Exception as e:
+                    results[index] = e
+
+        await asyncio.gather(
+            *[cancel_batch(subaccount_number, entries) for subaccount_number, entries in short_term.items()],
+            *[cancel_stateful(*entry) for entry in stateful]
+        )
+        return results
+
+    def _parse_cancel(self, order_data):
+        """
+        Extract the order id and expiry of an order to cancel (no I/O).
+
+        Missing fields (or the whole order, when given by indexer id) are resolved from the order store.
+
+        Returns:
+            tuple: (order_id dict, good_til_block or None, good_til_block_time or None)
+        """
+        if isinstance(order_data, str):
+            stored = self.order_store.get_by_id(order_data)
+            if stored is None:
+                raise KeyError(f"Unknown order id {order_data}")
+            order_data = stored
+        elif order_data.get('id') in self.order_store:
+            order_data = {**self.order_store.get_by_id(order_data['id']), **order_data}
+
+        def field(camel, snake, default=None):
+            # Accept both indexer (camelCase) and protobuf (snake_case) names, 0 is a valid value
+            value = order_data.get(camel)
+            if value is None:
+                value = order_data.get(snake, default)
+            return value
+
+        # Extract required fields from order_data
+        client_id = field('clientId', 'client_id')
+        order_flags = field('orderFlags', 'order_flags')
+        clob_pair_id = field('clobPairId', 'clob_pair_id')
+        subaccount_number = field('subaccountNumber', 'subaccount_number', 0)
+        good_til_block = field('goodTilBlock', 'good_til_block')
+        good_til_block_time = field('goodTilBlockTime', 'good_til_block_time')
+
+        # Create order_id dictionary
+        order_id = {
+            'subaccount_id': {
+                'owner': self.wallet_address,
+                'number': int(subaccount_number),
+            },
+            'client_id': int(client_id),
+            'order_flags': int(order_flags),
+            'clob_pair_id': int(clob_pair_id),
+        }
+
+        # For stateful orders (order_flags = 64 for LONG_TERM)
+        if order_id['order_flags'] == 64:
+            # If goodTilBlockTime is a string (ISO format), convert to timestamp
+            if good_til_block_time and isinstance(good_til_block_time, str):
+                datetime_obj = datetime.datetime.fromisoformat(good_til_block_time.replace('Z', '+00:00'))
+                good_til_block_time = int(datetime_obj.timestamp())
+
+            # Get current time if goodTilBlockTime is not provided
+            if not good_til_block_time:
+                good_til_block_time = int(time.time()) + (24 * 60 * 60 * 30)  # 90 days from now (max val v4)
+
+            return order_id, None, good_til_block_time
+
+        return order_id, int(good_til_block) if good_til_block else None, None
+
+    @instrumented
+    async def replace_order(self, old, new_price=None, new_size=None, track=False) -> ReplacedOrder:
+        """
+        Replace a resting order with one at a new price and/or size, without a moment where neither rests.
+
+        Stateful (long-term) orders are replaced by a place of the new order (with a new client id) and a cancel
+        of the replaced one. The chain only accepts a clob message alone in its transaction, so the two are signed
+        into separate transactions on consecutive sequences and broadcast back to back, the place first. When the
+        place is rejected the cancel fails its sequence check and is not re-signed, so an order is always resting.
+        Short-term orders are replaced natively by placing the same order id with a later good-til block.
+
+        The replaced order's fields come from the order store (an unknown indexer id is fetched first), so no
+        market or block height query is needed while their caches are fresh.
+
+        Args:
+            old (dict | str): The order to replace (an indexer / order store dict) or its indexer order id
+            new_price (float | Decimal): The new price (default: unchanged), rounded to a tick that is not worse
+                                         for the side
+            new_size (float | Decimal): The new size in base units (default: the unfilled remainder)
+            track (bool): Also return an `OrderHandle` of the replacement (as `ReplacedOrder.handle`)
+
+        Returns:
+            ReplacedOrder: The replacement with the transaction that placed it
+
+        Raises:
+            DydxError: The mapped failure, e.g. a `TransactionError` subclass when the chain rejected the
+                       replacement (the replaced order is then still resting) or the cancel (the replacement was
+                       placed and is in the order store, the replaced order is then also still resting)
+        """
+        await self.ensure_initialized_clients()
+
+        if isinstance(old, str) and self.order_store.get_by_id(old) is None:
+            with self.metrics.span('fetch_order'):
+                await self.fetch_order(old)
+        record = self._replace_source(old)
+
+        with self.metrics.span('market_data'):
+            market_id, = await self._tickers([record])
+            market_info = await self.get_market_data(market_id)
+        current_block = None
+        if int(record['orderFlags']) == OrderFlags.SHORT_TERM:
+            with self.metrics.span('block_height'):
+                current_block = await self.block_height.current()
+        with self.metrics.span('build'):
+            replaced = self._build_replace(record, market_info, current_block, new_price, new_size)
+        if track:
+            await self.ensure_subaccount_feed(replaced.order_id.subaccount_id.number)
+            replaced.handle = self._track(replaced.order_id, replaced.market_id)
+        return await self._submit_replace(replaced)
+
+    @instrumented
+    async def replace_orders(self, replacements, concurrency=10):
+        """
+        Replace a batch of resting orders (e.g. requoting a grid).
+
+        Market data is fetched once per distinct market and the block height once for the whole batch, every
+        replacement is built up front and the transactions (see `replace_order`) are
+        broadcast concurrently (at most `concurrency` at once). A failing replacement does not abort the rest.
+
+        Args:
+            replacements (list): One dict per order with the `replace_order` keyword arguments (old and optionally
+                                 new_price, new_size); the orders must be known to the order store
+            concurrency (int): Maximum number of concurrent broadcasts
+
+        Returns:
+            list: Per replacement (in input order), either a `ReplacedOrder` or the exception raised for it
+        """
+        await self.ensure_initialized_clients()
+
+        results = [None] * len(replacements)
+        records = []
+        for index, replacement in enumerate(replacements):
+            try:
+                records.append((index, self._replace_source(replacement['old']), replacement))
+            except Exception as e:
+                results[index] = e
+
+        with self.metrics.span('market_data'):
+            tickers = await self._tickers([record for _, record, _ in records])
+            market_ids = list(dict.fromkeys(tickers))
+            market_data = dict(zip(market_ids, await asyncio.gather(
+                *[self.get_market_data(market_id) for market_id in market_ids], return_exceptions=True)))
+        current_block = None
+        if any(int(record['orderFlags']) == OrderFlags.SHORT_TERM for _, record, _ in records):
+            with self.metrics.span('block_height'):
+                current_block = await self.block_height.current()
+
+        prepared = []
+        for (index, record, replacement), market_id in zip(records, tickers):
+            try:
+                market_info = market_data[market_id]
+                if isinstance(market_info, Exception):
+                    raise market_info
+                prepared.append((index, self._build_replace(record, market_info, current_block,
+                                                            replacement.get('new_price'),
+                                                            replacement.get('new_size'))))
+            except Exception as e:
+                results[index] = e
+
+        slots = asyncio.Semaphore(concurrency)
+
+        async def submit(index, replaced):
+            async with slots:
+                try:
+                    results[index] = await self._submit_replace(replaced)
+                except Exception as e:
+                    results[index] = e
+
+        await asyncio.gather(*[submit(*entry) for entry in prepared])
+        return results
+
+    async def _tickers(self, records):
+        """Market ticker of each order record (looked up by clob pair id for records without one)"""
+        if all(record.get('ticker') for record in records):
+            return [record['ticker'] for record in records]
+        scales = await self._market_scales({record['clobPairId'] for record in records})
+        return [record.get('ticker') or scales[int(record['clobPairId'])].ticker for record in records]
+
+    def _replace_source(self, old):
+        """The full record of an order to replace: the order store record merged with the given fields"""
+        if isinstance(old, str):
+            record = self.order_store.get_by_id(old)
+            if record is None:
+                raise KeyError(f"Unknown order id {old}")
+            return record
+        if old.get('id') in self.order_store:
+            return {**self.order_store.get_by_id(old['id']), **old}
+        return old
+
+    def _build_replace(self, record, market_info, current_block, new_price=None, new_size=None) -> ReplacedOrder:
+        """Build the replacement of an order and, for a stateful order, the cancel to sign with it (no I/O)"""
+        template = self.order_template(market_info)
+        market_id = market_info['ticker']
+        side = record['side']
+        order_side = Order.Side.SIDE_BUY if side == 'BUY' else Order.Side.SIDE_SELL
+
+        if new_price is None:
+            subticks = int(record['subticks']) if record.get('subticks') is not None \
+                else template.subticks(record['price'], price_rounding(side))
+        else:
+            oracle_price = float(market_info['oraclePrice'])
+            if (side == 'BUY' and float(new_price) > oracle_price) or \
+                    (side == 'SELL' and float(new_price) < oracle_price):
+                raise InvalidPrice(
+                    "Buy price too high compared to oracle price" if side == 'BUY'
+                    else "Sell price too low compared to oracle price",
+                    market=market_id,
+                    side=side,
+                    price=float(new_price),
+                    oracle_price=oracle_price
+                )
+            subticks = template.subticks(new_price, price_rounding(side))
+
+        if new_size is None:
+            quantums = int(record['quantums']) if record.get('quantums') is not None \
+                else template.quantums(record['size'])
+            filled = record.get('totalFilled')
+            if filled is not None and float(filled):
+                quantums -= template.quantums(filled)
+            if quantums <= 0:
+                raise ValueError(f"Order {record.get('id')} has no unfilled size to replace")
+        else:
+            quantums = template.quantums(new_size)
+
+        order_id, good_til_block, good_til_block_time = self._parse_cancel(record)
+        time_in_force = _TIME_IN_FORCE.get(record.get('timeInForce'), Order.TimeInForce.TIME_IN_FORCE_POST_ONLY)
+        cancel = None
+        if order_id['order_flags'] == OrderFlags.SHORT_TERM:
+            # The protocol replaces a short-term order placed again with the same id and a later good-til block
+            new_order_id = template.order_id(self.wallet_address, order_id['subaccount_id']['number'],
+                                             order_id['client_id'], OrderFlags.SHORT_TERM)
+            good_til_block = min(max(current_block + 10, (good_til_block or 0) + 1), current_block + 20)
+            good_til_block_time = None
+        else:
+            cancel = cancel_order_message(order_id, good_til_block_time=good_til_block_time)
+            new_order_id = template.order_id(self.wallet_address, order_id['subaccount_id']['number'],
+                                             random.randint(0, MAX_CLIENT_ID), order_id['order_flags'])
+            good_til_block = None
+            good_til_block_time = int(time.time()) + (24 * 60 * 60 * 30)  # 30 days from now (max val v4)
+
+        new_order = Order(
+            order_id=new_order_id,
+            side=order_side,
+            quantums=quantums,
+            subticks=subticks,
+            good_til_block=good_til_block,
+            good_til_block_time=good_til_block_time,
+            time_in_force=time_in_force,
+            reduce_only=bool(record.get('reduceOnly')),
+            client_metadata=PY_V2_CLIENT_ID,
+        )
+        return ReplacedOrder(market_id, record['id'], new_order_id, new_order, cancel=cancel)
+
+    async def _submit_replace(self, replaced: ReplacedOrder) -> ReplacedOrder:
+        """Broadcast a replacement built by `_build_replace` (followed by its cancel for a stateful order)"""
+        new_order = replaced.order
+        stateful = replaced.cancel is not None
+        try:
+            with self.metrics.span('rate_limit'):
+                if stateful:
+                    await self.rate_limiter.acquire('stateful_cancel', priority=PRIORITY_HIGH,
+                                                    wait=self.rate_limit_wait)
+                await self.rate_limiter.acquire('stateful_order' if stateful else 'short_term_order',
+                                                priority=PRIORITY_HIGH, wait=self.rate_limit_wait)
+
+            # Both signed before either is sent, so no other transaction of this wallet takes a sequence between
+            # them, and sent in that order (the cancel is only valid on top of the place)
+            signed = self.sequencer.presign(place_order_message(new_order), stateful=stateful)
+            if stateful:
+                signed_cancel = self.sequencer.presign(replaced.cancel)
+                replaced.transaction, replaced.cancel_transaction = await asyncio.gather(
+                    self.sequencer.broadcast_signed(signed),
+                    self.sequencer.broadcast_signed(signed_cancel, resign=False)
+                )
+            else:
+                replaced.transaction = await self.sequencer.broadcast_signed(signed)
+            error = tx_error(replaced.transaction.tx_response)
+            if error is not None:
+                raise error
+        except Exception:
+            if replaced.handle is not None:
+                self.order_tracker.resolve(replaced.handle, REJECTED)
+            raise
 
-    async def get_order_history(self, subaccount_number=0):
-        """Get the order history for this wallet's address"""
+        if stateful:
+            self.order_store.add_placed(new_order.order_id, new_order, replaced.market_id)
+            error = tx_error(replaced.cancel_transaction.tx_response)
+            if isinstance(error, SequenceMismatch):
+                # the place was re-signed on a resync, the cancel can follow it now that it was accepted
+                replaced.cancel_transaction = await self.sequencer.broadcast(replaced.cancel)
+                error = tx_error(replaced.cancel_transaction.tx_response)
+            if error is not None:
+                logger.error("Replaced order could not be cancelled",
+                             extra={'order_id': replaced.replaced_id, 'error': str(error)})
+                raise error
+        else:
+            # Same order id: the new price, size and expiry overwrite the replaced order's
+            record = self.order_store.add_placed(new_order.order_id, new_order, replaced.market_id)
+            template = self.order_templates[replaced.market_id][1]
+            self.order_store.upsert({
+                'id': record['id'],
+                'quantums': new_order.quantums,
+                'subticks': new_order.subticks,
+                'size': str(template.size(new_order.quantums)),
+                'price': str(template.price(new_order.subticks)),
+                'goodTilBlock': str(new_order.good_til_block),
+            })
+        return replaced
+
+    @instrumented
+    async def get_order_history(self, subaccount_number=0, typed=False):
+        """
+        Get the order history for this wallet's address
+
+        With `typed=True` the orders are parsed in bulk into an `OrderRecordBatch` (NumPy columns of integer
+        quantums / subticks and status codes) instead of a list of indexer dicts.
+        """
         await self.ensure_initialized_clients()
 
         try:
-            orders = await self.indexer_client.account.get_subaccount_orders(
+            orders = await self._indexer_request(
+                self.indexer_client.account.get_subaccount_orders,
                 address=self.wallet_address,
                 subaccount_number=subaccount_number
             )
+            self._save_snapshot(self._account_key('orders', subaccount_number),
+                                [order for order in orders if order.get('status') not in FINAL_STATUSES])
+            if typed:
+                from .records import OrderRecordBatch
+
+                scales = await self._market_scales({order['clobPairId'] for order in orders})
+                return OrderRecordBatch.from_indexer(orders, scales)
             return orders
-        except Exception as e:
-            print(f"Error getting order history: {e}")
+        except Exception:
+            logger.exception("Error getting order history", extra={'subaccount_number': subaccount_number})
             raise
 
-    async def get_positions(self, subaccount_number=0):
+    async def iter_fills(self, subaccount_number=0, ticker=None, since=None, limit=100):
+        """
+        Stream every fill of a subaccount, newest first, paging by block height.
+
+        Args:
+            subaccount_number (int): The subaccount number
+            ticker (str): Only fills of this market
+            since (dict): Checkpoint ({'cursor', 'ids'}) of an earlier run, only newer fills are returned
+            limit (int): Page size
+
+        Yields:
+            dict: Indexer fill records
+        """
+        from .history import paginate
+
+        await self.ensure_initialized_clients()
+        fetch = partial(self._indexer_request, self.indexer_client.account.get_subaccount_fills,
+                        self.wallet_address, subaccount_number, ticker=ticker)
+        async for fill in paginate(fetch, 'fills', 'createdAtHeight', 'created_before_or_at_height', limit,
+                                   since, parse=int):
+            yield fill
+
+    async def iter_transfers(self, subaccount_number=0, since=None, limit=100):
+        """Stream every transfer of a subaccount, newest first, paging by block height (see `iter_fills`)"""
+        from .history import paginate
+
+        await self.ensure_initialized_clients()
+        fetch = partial(self._indexer_request, self.indexer_client.account.get_subaccount_transfers,
+                        self.wallet_address, subaccount_number)
+        async for transfer in paginate(fetch, 'transfers', 'createdAtHeight', 'created_before_or_at_height', limit,
+                                       since, parse=int):
+            yield transfer
+
+    async def iter_historical_pnl(self, subaccount_number=0, since=None):
+        """Stream the historical PnL ticks of a subaccount, newest first, paging by time (see `iter_fills`)"""
+        from .history import paginate
+
+        await self.ensure_initialized_clients()
+        fetch = partial(self._indexer_request, self.indexer_client.account.get_subaccount_historical_pnls,
+                        self.wallet_address, subaccount_number,
+                        effective_at_or_after=since['cursor'] if since else None)
+        async for tick in paginate(fetch, 'historicalPnl', 'createdAt', 'effective_before_or_at', None, since):
+            yield tick
+
+    async def iter_orders(self, subaccount_number=0, ticker=None, since=None, limit=100):
+        """
+        Stream every order of a subaccount.
+
+        The orders endpoint has no creation cursor, so short-term orders are paged by goodTilBlock and stateful
+        orders by goodTilBlockTime (each newest first). Status changes of orders older than the checkpoint are
+        not picked up by an incremental run.
+
+        Args:
+            subaccount_number (int): The subaccount number
+            ticker (str): Only orders of this market
+            since (dict): Checkpoints of an earlier run by cursor field ({'goodTilBlock': ..., 'goodTilBlockTime': ...})
+            limit (int): Page size
+
+        Yields:
+            dict: Indexer order records
+        """
+        from .history import paginate
+
+        await self.ensure_initialized_clients()
+        since = since or {}
+        fetch = partial(self._indexer_request, self.indexer_client.account.get_subaccount_orders,
+                        self.wallet_address, subaccount_number, ticker=ticker)
+        async for order in paginate(fetch, None, 'goodTilBlock', 'good_til_block_before_or_at', limit,
+                                    since.get('goodTilBlock'), parse=int, start=MAX_GOOD_TIL_BLOCK):
+            yield order
+        async for order in paginate(fetch, None, 'goodTilBlockTime', 'good_til_block_time_before_or_at', limit,
+                                    since.get('goodTilBlockTime'), start=MAX_GOOD_TIL_BLOCK_TIME):
+            yield order
+
+    @instrumented
+    async def sync_history(self, store: 'HistoryStore', kinds=HISTORY_CURSORS, subaccount_numbers=(0,)):
+        """
+        Incrementally copy account history into a local columnar store.
+
+        Every (subaccount, kind) table resumes from the checkpoint of its last successful sync, so only new
+        records are fetched. Records are streamed into the table in chunks and committed with the new checkpoint
+        once the kind is complete.
+
+        Args:
+            store (HistoryStore): The local store
+            kinds (iterable): Any of 'fills', 'transfers', 'orders', 'historical_pnl'
+            subaccount_numbers (iterable): The subaccounts to sync
+
+        Returns:
+            dict: (subaccount_number, kind) -> number of new records
+        """
+        from .history import Checkpoint
+
+        iterators = {
+            'fills': self.iter_fills,
+            'transfers': self.iter_transfers,
+            'orders': self.iter_orders,
+            'historical_pnl': self.iter_historical_pnl,
+        }
+        counts = {}
+        for subaccount_number in subaccount_numbers:
+            for kind in kinds:
+                table = store.table(self.wallet_address, subaccount_number, kind)
+                previous = table.checkpoint or {}
+                checkpoints = {
+                    field: Checkpoint(field, parse) for field, parse in HISTORY_CURSORS[kind].items()
+                }
+
+                # single cursor kinds take the checkpoint itself, orders one per cursor field
+                since = previous if kind == 'orders' else next(iter(previous.values()), None)
+                count = 0
+                try:
+                    async for record in iterators[kind](subaccount_number, since=since):
+                        for checkpoint in checkpoints.values():
+                            checkpoint.observe(record)
+                        table.append(record)
+                        count += 1
+                    table.commit({field: checkpoint.to_dict() or previous.get(field)
+                                  for field, checkpoint in checkpoints.items()})
+                except BaseException:
+                    # the rows of the failed run are fetched again by the next one
+                    table.rollback()
+                    raise
+                counts[(subaccount_number, kind)] = count
+        return counts
+
+    @instrumented
+    async def get_positions(self, subaccount_number=0, typed=False, max_age: float = None):
         """
         {'closedAt': None,
                 'createdAt': '2025-05-09T19:17:39.436Z',
@@ -529,18 +2391,136 @@ class DYDX:
                 'sumOpen': '0.001',
                 'unrealizedPnl': '-0.0004'}
         :param subaccount_number:
+        :param typed: Return a list of `PositionRecord`s (integer quantum sizes) instead of the indexer response
+        :param max_age: Serve the positions saved in the snapshot store if younger than this many seconds
         :return:
         """
 
         """Get the current positions for this wallet"""
-        await self.ensure_initialized_clients()
+        entry = None
+        if self.snapshot is not None and max_age is not None:
+            entry = self.snapshot.get(self._account_key('positions', subaccount_number), max_age)
 
         try:
-            positions = await self.indexer_client.account.get_subaccount_perpetual_positions(
-                address=self.wallet_address,
-                subaccount_number=subaccount_number
-            )
+            if entry is not None:
+                positions = entry.value
+            else:
+                await self.ensure_initialized_clients()
+                positions = await self._indexer_request(
+                    self.indexer_client.account.get_subaccount_perpetual_positions,
+                    address=self.wallet_address,
+                    subaccount_number=subaccount_number
+                )
+                self._save_snapshot(self._account_key('positions', subaccount_number), positions)
+            if typed:
+                return await self._typed_positions(positions['positions'])
             return positions
-        except Exception as e:
-            print(f"Error getting positions: {e}")
-            raise
\ No newline at end of file
+        except Exception:
+            logger.exception("Error getting positions", extra={'subaccount_number': subaccount_number})
+            raise
+
+    async def _typed_positions(self, positions):
+        from .records import PositionRecord
+
+        if any(position['market'] not in self.market_cache for position in positions):
+            await self.warm_market_cache()
+        clob_pair_ids = {position['market']: int(self.market_cache.get_static(position['market'])['clobPairId'])
+                         for position in positions}
+        scales = await self._market_scales(clob_pair_ids.values())
+        return [PositionRecord.from_indexer(position, scales[clob_pair_ids[position['market']]])
+                for position in positions]
+
+    @instrumented
+    async def load_risk_engine(self, subaccount_numbers=(0,)):
+        """
+        Load the open positions and quote balances of subaccounts into a vectorized `RiskEngine`.
+
+        The engine's oracle prices are updated incrementally from the market cache (e.g. while the `v4_markets`
+        feed is running); fills can be applied with `risk_engine.update_position(..., fill_price=..., fee=...)`.
+
+        Args:
+            subaccount_numbers (iterable): Subaccounts to include
+
+        Returns:
+            RiskEngine: The loaded engine (also available as `self.risk_engine`)
+        """
+        from .risk import RiskEngine
+
+        await self.ensure_initialized_clients()
+
+        responses = await asyncio.gather(*[
+            self._indexer_request(self.indexer_client.account.get_subaccount, self.wallet_address, number)
+            for number in subaccount_numbers
+        ])
+        subaccounts = [response['subaccount'] for response in responses]
+
+        market_ids = {market_id for subaccount in subaccounts
+                      for market_id in (subaccount.get('openPerpetualPositions') or {})}
+        if any(market_id not in self.market_cache for market_id in market_ids):
+            await self.warm_market_cache()
+
+        engine = RiskEngine.from_subaccounts(
+            subaccounts,
+            {market_id: self.market_cache.get_static(market_id) for market_id in market_ids}
+        )
+
+        if self.risk_engine is not None:
+            self.market_cache.oracle_listeners.remove(self.risk_engine.update_price)
+        self.market_cache.oracle_listeners.append(engine.update_price)
+        self.risk_engine = engine
+        return engine
+
+    @instrumented
+    async def load_cost_model(self, subaccount_number=0, refresh_interval=300.0):
+        """
+        Load a `CostModel` for synchronous fee and open order cap estimates.
+
+        The fee and equity tier parameters, the wallet's trailing volume and the subaccount's equity are fetched
+        concurrently, then refreshed every `refresh_interval` seconds in the background.
+
+        Args:
+            subaccount_number (int): The subaccount whose equity sets the open order caps
+            refresh_interval (float): Seconds between background refreshes (None: load once)
+
+        Returns:
+            CostModel: The loaded model (also available as `self.cost_model`)
+        """
+        await self.ensure_initialized_clients()
+
+        cost_model = CostModel(self.market_cache)
+        await self._refresh_cost_model(cost_model, subaccount_number)
+        self.cost_model = cost_model
+
+        task, self._cost_model_task = self._cost_model_task, None
+        if task is not None:
+            task.cancel()
+        if refresh_interval is not None:
+            self._cost_model_task = asyncio.create_task(
+                self._poll_cost_model(cost_model, subaccount_number, refresh_interval)
+            )
+        return cost_model
+
+    async def _refresh_cost_model(self, cost_model, subaccount_number):
+        fee_params, equity_tiers, user_stats, subaccount = await asyncio.gather(
+            _optional(self.get_fee_tiers()),
+            _optional(self.get_equity_tier()),
+            _optional(self.get_user_stats()),
+            self._indexer_request(self.indexer_client.account.get_subaccount, self.wallet_address, subaccount_number)
+        )
+        # a failed parameter query keeps the previous set
+        cost_model.load(fee_params, equity_tiers)
+        if user_stats is not None:
+            stats = user_stats.get('stats') or {}
+            cost_model.set_volume((int(stats.get('taker_notional') or 0) + int(stats.get('maker_notional') or 0))
+                                  / QUOTE_QUANTUMS_PER_USD)
+        cost_model.set_equity(float(subaccount['subaccount']['equity']))
+
+    async def _poll_cost_model(self, cost_model, subaccount_number, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._refresh_cost_model(cost_model, subaccount_number)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error refreshing cost model", extra={'subaccount_number': subaccount_number})
@@ -0,0 +1,276 @@
+import asyncio
+import inspect
+import random
+import time
+
+from .errors import map_exception, mapped_errors
+from .instrumentation import NULL_METRICS
+
+
+def is_retryable(error):
+    """Whether a failed request may succeed when repeated (the `retryable` flag of its mapped `DydxError`)"""
+    error = map_exception(error)
+    return error is not None and error.retryable
+
+
+def retry_delay(error, delay, max_delay=None):
+    """
+    Seconds to wait before repeating a failed request: the jittered `delay`, or the error's `backoff_hint` when
+    that is longer.
+
+    Returns:
+        float: The delay, or None when the request should not be repeated (not retryable, or the hint exceeds
+               `max_delay`)
+    """
+    error = map_exception(error)
+    if error is None or not error.retryable:
+        return None
+    wait = delay * random.uniform(0.5, 1.5)
+    if error.backoff_hint is not None:
+        if max_delay is not None and error.backoff_hint > max_delay:
+            return None
+        wait = max(wait, error.backoff_hint)
+    return wait
+
+
+class Endpoint:
+    """
+    One server of an `EndpointSet` with its observed latency and health.
+
+    `latency` is an exponentially weighted moving average of successful request durations, `health` an EWMA of
+    the success rate (1.0 = every recent request succeeded). After `max_failures` consecutive failures the
+    endpoint is taken out of rotation for a cooldown and is then probed again.
+    """
+
+    def __init__(self, url, client=None):
+        self.url = url
+        self.client = client
+        self.latency = None
+        self.health = 1.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def score(self):
+        """Expected cost of a request, lower is better (unmeasured endpoints go first so they get measured)"""
+        if self.latency is None:
+            # Never answered: only tried again once every measured endpoint failed too
+            return float('inf') if self.failures else 0.0
+        return self.latency / max(self.health, 0.05)
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'latency_ms': None if self.latency is None else self.latency * 1000,
+            'health': self.health,
+            'available': self.available,
+            'requests': self.requests,
+            'failures': self.failures,
+        }
+
+
+class EndpointSet:
+    """
+    Interchangeable endpoints of one kind (indexers, nodes or protocol REST servers) with latency based routing.
+
+    `call` sends a request to the fastest available endpoint, retries retryable failures on the next best
+    endpoint with jittered exponential backoff and, when `hedge_after` is given, sends a second copy of the
+    request to the next best endpoint if the first has not answered within that many seconds; the first answer
+    wins and the other request is cancelled. Only idempotent requests may be retried or hedged.
+    """
+
+    def __init__(self, urls, clients=None, name='endpoint', alpha=0.2, max_failures=3, cooldown=5.0,
+                 metrics=NULL_METRICS):
+        """
+        Args:
+            urls (list): Endpoint URLs (the first one is the primary)
+            clients (list): Optional client object per URL (e.g. a NodeClient), available as `endpoint.client`
+            name (str): Endpoint kind, used as the metrics label
+            alpha (float): EWMA weight of the newest observation
+            max_failures (int): Consecutive failures after which an endpoint is put in cooldown
+            cooldown (float): Seconds an endpoint stays out of rotation
+            metrics (Metrics): Metrics registry
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls:
+            raise ValueError("At least one endpoint is required")
+        clients = clients or [None] * len(urls)
+        self.endpoints = [Endpoint(url, client) for url, client in zip(urls, clients)]
+        self.name = name
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.metrics = metrics
+
+        # Metrics
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    @property
+    def primary(self) -> Endpoint:
+        return self.endpoints[0]
+
+    def ranked(self, exclude=()):
+        """Available endpoints by score, followed by the ones in cooldown (as a last resort)"""
+        candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude] or self.endpoints
+        available = sorted((endpoint for endpoint in candidates if endpoint.available), key=Endpoint.score)
+        return available + [endpoint for endpoint in candidates if not endpoint.available]
+
+    def best(self, exclude=()) -> Endpoint:
+        return self.ranked(exclude)[0]
+
+    def record(self, endpoint, duration, ok=True):
+        """
+        Record the outcome of a request (failures are connection level / server errors only).
+
+        `ok=None` records a request cancelled before it answered (a hedge that lost): its duration still feeds
+        the latency average, but it is neither a success nor a failure for the endpoint's health.
+        """
+        endpoint.requests += 1
+        self.metrics.count('endpoint_requests_total', kind=self.name, endpoint=endpoint.url,
+                           ok='cancelled' if ok is None else str(ok))
+        if ok or ok is None:
+            endpoint.latency = duration if endpoint.latency is None else \
+                endpoint.latency + self.alpha * (duration - endpoint.latency)
+            if ok is None:
+                return
+            endpoint.health += self.alpha * (1.0 - endpoint.health)
+            endpoint.consecutive_failures = 0
+            return
+
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        endpoint.health -= self.alpha * endpoint.health
+        if endpoint.consecutive_failures >= self.max_failures:
+            endpoint.down_until = time.monotonic() + self.cooldown
+
+    async def _attempt(self, fn, endpoint):
+        started = time.perf_counter()
+        try:
+            result = await fn(endpoint)
+        except asyncio.CancelledError:
+            # A cancelled hedge took at least this long, which keeps a slow endpoint's latency from looking good;
+            # it did not answer, so it does not count towards the endpoint's health
+            self.record(endpoint, time.perf_counter() - started, ok=None)
+            raise
+        except Exception as e:
+            # Error responses (e.g. 404) still show the endpoint is up
+            self.record(endpoint, time.perf_counter() - started, ok=not is_retryable(e))
+            raise
+        self.record(endpoint, time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, fn, primary, secondary, hedge_after):
+        first = asyncio.ensure_future(self._attempt(fn, primary))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return first.result()
+
+            self.hedges += 1
+            self.metrics.count('endpoint_hedges_total', kind=self.name)
+            second = asyncio.ensure_future(self._attempt(fn, secondary))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, fn, retries=2, backoff=0.05, max_backoff=1.0, hedge_after=None):
+        """
+        Run an idempotent request against the best endpoint, retrying and hedging on other endpoints.
+
+        Args:
+            fn (callable): Coroutine function taking the `Endpoint` to send the request to
+            retries (int): Retries of retryable failures (each on the next best endpoint not tried yet)
+            backoff (float): Initial retry delay in seconds, doubled per retry (with jitter), or the failure's
+                             `backoff_hint` when longer
+            max_backoff (float): Maximum retry delay in seconds (a longer backoff hint raises the failure instead)
+            hedge_after (float): Seconds after which a hedged copy is sent to the next best endpoint (None: off)
+
+        Returns:
+            The result of `fn`
+        """
+        tried = []
+        delay = backoff
+        for attempt in range(retries + 1):
+            ranked = self.ranked(exclude=tried)
+            try:
+                if hedge_after is not None and len(ranked) > 1:
+                    tried.extend(ranked[:2])
+                    return await self._hedged(fn, ranked[0], ranked[1], hedge_after)
+                tried.append(ranked[0])
+                return await self._attempt(fn, ranked[0])
+            except Exception as e:
+                wait = retry_delay(e, delay, max_backoff) if attempt < retries else None
+                if wait is None:
+                    raise
+            self.retries += 1
+            self.metrics.count('endpoint_retries_total', kind=self.name)
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, max_backoff)
+
+    def stats(self):
+        """Return the routing metrics and per endpoint latency / health"""
+        return {
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'endpoints': [endpoint.stats() for endpoint in self.endpoints],
+        }
+
+
+class FailoverClient:
+    """
+    Proxy over the per endpoint clients of an `EndpointSet` (e.g. one NodeClient per node).
+
+    Read methods (coroutine methods whose name starts with one of `read_prefixes`) are routed through
+    `EndpointSet.call` and fail over to other endpoints; every other attribute, including methods that send
+    transactions, is taken from the primary endpoint's client.
+    """
+
+    def __init__(self, endpoints: EndpointSet, retries=2, read_prefixes=('get_', 'latest_')):
+        self.endpoints = endpoints
+        self.retries = retries
+        self.read_prefixes = read_prefixes
+
+    def __getattr__(self, name):
+        attribute = getattr(self.endpoints.primary.client, name)
+        if not name.startswith(self.read_prefixes) or not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        async def read(*args, **kwargs):
+            with mapped_errors():
+                return await self.endpoints.call(lambda endpoint: getattr(endpoint.client, name)(*args, **kwargs),
+                                                 retries=self.retries)
+
+        read.__name__ = name
+        return read
+
+    def __setattr__(self, name, value):
+        if name in ('endpoints', 'retries', 'read_prefixes'):
+            object.__setattr__(self, name, value)
+            return
+        # e.g. disabling the sequence manager applies to every endpoint's client
+        for endpoint in self.endpoints.endpoints:
+            setattr(endpoint.client, name, value)
@@ -1,7 +1,24 @@
+import asyncio
+from contextlib import contextmanager
+
+
+# gRPC status codes worth retrying (the request may not have reached the server, or the server was overloaded)
+RETRYABLE_GRPC_CODES = {'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'RESOURCE_EXHAUSTED', 'ABORTED', 'INTERNAL', 'UNKNOWN'}
+
+# Connection level exceptions of the HTTP clients, matched by class name so neither library has to be imported
+_NETWORK_ERROR_TYPES = {'TransportError', 'ClientConnectionError', 'ClientPayloadError', 'ServerTimeoutError'}
+
+
 # Define custom exceptions
 class DydxError(Exception):
-    """Base exception for all dYdX-related errors"""
-    pass
+    """
+    Base exception for all dYdX-related errors.
+
+    `retryable` tells whether repeating the failed request may succeed, `backoff_hint` how many seconds to wait
+    before repeating it (None: no hint, the caller's own backoff applies).
+    """
+    retryable = False
+    backoff_hint = None
 
 
 class InvalidWallet(DydxError):
@@ -35,11 +52,12 @@ class InvalidPrice(DydxError):
         super().__init__(self.message)
 
 
-class ReduceOnlyOrderError(DydxError):
-    """Exception raised when a reduce-only order fails due to specific restrictions"""
+class TransactionError(DydxError):
+    """Exception raised when the chain rejects a broadcast transaction (a non-zero ABCI code)"""
 
-    def __init__(self, message="Reduce-only order failed", code=None, raw_log=None, tx_hash=None):
+    def __init__(self, message="Transaction rejected", code=None, raw_log=None, tx_hash=None, codespace=None):
         self.code = code
+        self.codespace = codespace
         self.raw_log = raw_log
         self.tx_hash = tx_hash
         self.message = message
@@ -48,13 +66,103 @@ class ReduceOnlyOrderError(DydxError):
         if raw_log:
             self.message = f"{message}: {raw_log}"
         if code:
-            self.message = f"{self.message} (Error code: {code})"
+            self.message = f"{self.message} (Error code: {f'{codespace}/' if codespace else ''}{code})"
         if tx_hash:
             self.message = f"{self.message} [TX: {tx_hash}]"
 
         super().__init__(self.message)
 
 
+class SequenceMismatch(TransactionError):
+    """Exception raised when a transaction was signed with a stale account sequence (resync and re-sign)"""
+    retryable = True
+    backoff_hint = 0.0
+
+    def __init__(self, message="Account sequence mismatch", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class MempoolFull(TransactionError):
+    """Exception raised when the node's mempool has no room for the transaction (resend after about a block)"""
+    retryable = True
+    backoff_hint = 1.0
+
+    def __init__(self, message="Mempool is full", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class OrderRateLimited(TransactionError):
+    """Exception raised when the chain's per-block order / cancel rate limit rejected the transaction"""
+    retryable = True
+    backoff_hint = 1.0
+
+    def __init__(self, message="Block rate limit exceeded", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class InsufficientFee(TransactionError):
+    """Exception raised when the transaction's fee is below the node's minimum gas price"""
+
+    def __init__(self, message="Insufficient fee", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class OutOfGas(TransactionError):
+    """Exception raised when the transaction ran out of gas"""
+
+    def __init__(self, message="Out of gas", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class InsufficientFunds(TransactionError):
+    """Exception raised when the account cannot pay the fee or transfer"""
+
+    def __init__(self, message="Insufficient funds", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class Unauthorized(TransactionError):
+    """Exception raised when the transaction's signature or signer was rejected"""
+
+    def __init__(self, message="Unauthorized", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class OrderExpired(TransactionError):
+    """Exception raised when an order's good-til block / time is outside the accepted window (rebuild it)"""
+
+    def __init__(self, message="Order expired", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class InvalidOrder(TransactionError):
+    """Exception raised when the CLOB module rejected an order or cancel"""
+
+    def __init__(self, message="Order rejected by the chain", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class EquityTierLimitExceeded(InvalidOrder):
+    """Exception raised when the subaccount's equity tier allows no more open orders"""
+
+    def __init__(self, message="Equity tier open order limit exceeded", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class Undercollateralized(InvalidOrder):
+    """Exception raised when an order failed the collateralization check"""
+
+    def __init__(self, message="Collateralization check failed", **kwargs):
+        super().__init__(message, **kwargs)
+
+
+class ReduceOnlyOrderError(InvalidOrder):
+    """Exception raised when a reduce-only order fails due to specific restrictions"""
+
+    def __init__(self, message="Reduce-only order failed", code=None, raw_log=None, tx_hash=None, codespace=None):
+        super().__init__(message, code=code, raw_log=raw_log, tx_hash=tx_hash, codespace=codespace)
+
+
 class OrderRejected(DydxError):
     """Exception raised when an order is rejected by the API"""
 
@@ -66,11 +174,249 @@ class OrderRejected(DydxError):
         super().__init__(self.message)
 
 
+class OrderNotFilled(DydxError):
+    """Exception raised when a tracked order reached a final status without being completely filled"""
+
+    def __init__(self, message="Order was not filled", order_id=None, status=None, filled_size=None):
+        self.order_id = order_id
+        self.status = status
+        self.filled_size = filled_size
+        self.message = message
+        if order_id:
+            self.message = f"{message}: order {order_id} ended {status} (filled {filled_size})"
+        super().__init__(self.message)
+
+
+class HistoryPageOverflow(DydxError):
+    """Exception raised when more records share one cursor value than the largest page of an endpoint holds"""
+
+    def __init__(self, message="History page overflow", cursor=None, limit=None):
+        self.cursor = cursor
+        self.limit = limit
+        self.message = message
+        if cursor is not None:
+            self.message = f"{message}: more than {limit} records at cursor {cursor}"
+        super().__init__(self.message)
+
+
 class NetworkError(DydxError):
-    """Exception raised for network-related issues"""
-    pass
+    """Exception raised for network-related issues (connection errors, timeouts, unavailable gRPC servers)"""
+    retryable = True
+
+    def __init__(self, message="Network error", code=None):
+        self.code = code
+        self.message = message
+        if code:
+            self.message = f"{message} ({code})"
+        super().__init__(self.message)
 
 
 class AuthenticationError(DydxError):
     """Exception raised for authentication issues"""
-    pass
\ No newline at end of file
+    pass
+
+
+class HTTPError(DydxError):
+    """Exception raised for an error status of an indexer or protocol REST request"""
+
+    def __init__(self, message="Request failed", status=None, url=None, retry_after=None):
+        self.status = status
+        self.url = url
+        if retry_after is not None:
+            self.backoff_hint = retry_after
+        self.message = message
+        if status:
+            self.message = f"{message}: HTTP {status}"
+        if url:
+            self.message = f"{self.message} ({url})"
+        super().__init__(self.message)
+
+
+class BadRequest(HTTPError):
+    """Exception raised when the server rejected the request's parameters (400, 422)"""
+    pass
+
+
+class NotFound(HTTPError):
+    """Exception raised when the requested order, account or path does not exist (404)"""
+    pass
+
+
+class Forbidden(HTTPError, AuthenticationError):
+    """Exception raised when the request was refused (401, 403, e.g. the indexer's geoblocking)"""
+    pass
+
+
+class TooManyRequests(HTTPError):
+    """Exception raised when the server rate limited the request (429, waiting for its Retry-After)"""
+    retryable = True
+    backoff_hint = 1.0
+
+
+class ServerError(HTTPError):
+    """Exception raised for a server side failure or timeout (408, 5xx)"""
+    retryable = True
+
+
+class RateLimitExceeded(DydxError):
+    """Exception raised when a client-side rate limit has no capacity left and the caller chose not to wait"""
+
+    retryable = True
+
+    def __init__(self, message="Rate limit exceeded", operation=None, retry_after=None):
+        self.operation = operation
+        self.retry_after = retry_after
+        self.backoff_hint = retry_after
+        self.message = message
+        if operation:
+            self.message = f"{message}: {operation}"
+        if retry_after is not None:
+            self.message = f"{self.message} (retry after {retry_after:.3f}s)"
+        super().__init__(self.message)
+
+
+# Cosmos SDK ABCI codes (codespace 'sdk'); the other codes of the codespace map to `TransactionError`
+SDK_ERRORS = {
+    3: SequenceMismatch,    # ErrInvalidSequence
+    4: Unauthorized,        # ErrUnauthorized
+    5: InsufficientFunds,   # ErrInsufficientFunds
+    8: Unauthorized,        # ErrInvalidPubKey
+    11: OutOfGas,           # ErrOutOfGas
+    13: InsufficientFee,    # ErrInsufficientFee
+    15: Unauthorized,       # ErrNoSignatures
+    20: MempoolFull,        # ErrMempoolIsFull
+    30: OrderExpired,       # ErrTxTimeoutHeight
+    32: SequenceMismatch,   # ErrWrongSequence
+}
+
+# Codes the client has always treated as reduce-only rejections
+REDUCE_ONLY_CODES = {2001, 9003}
+
+# dYdX module errors (codespaces 'clob', 'subaccounts', ...) by a fragment of their registered message, which
+# stays stable across releases where the numbering of a module's codes does not
+MODULE_ERRORS = (
+    ('reduce-only', ReduceOnlyOrderError),
+    ('reduce only', ReduceOnlyOrderError),
+    ('rate limit', OrderRateLimited),
+    ('equity tier', EquityTierLimitExceeded),
+    ('collateralization', Undercollateralized),
+    ('undercollateralized', Undercollateralized),
+    ('goodtilblock', OrderExpired),
+    ('good til block', OrderExpired),
+)
+
+# Cosmos SDK ErrTxInMempoolCache: the node already holds this exact transaction, an earlier attempt got through
+# (only in the 'sdk' codespace, other modules number their own errors from 1)
+TX_IN_MEMPOOL_CODE = 19
+
+
+def tx_error(tx_response):
+    """
+    Map a broadcast's TxResponse onto the error hierarchy.
+
+    Returns:
+        TransactionError: The error to raise, or None when the transaction was accepted
+    """
+    code = tx_response.code
+    codespace = getattr(tx_response, 'codespace', '') or ''
+    if code == 0 or (code == TX_IN_MEMPOOL_CODE and codespace in ('', 'sdk')):
+        return None
+
+    details = {'code': code, 'raw_log': tx_response.raw_log, 'tx_hash': tx_response.txhash, 'codespace': codespace}
+    if code in REDUCE_ONLY_CODES:
+        return ReduceOnlyOrderError(**details)
+    if codespace in ('', 'sdk'):
+        return SDK_ERRORS.get(code, TransactionError)(**details)
+
+    raw_log = (tx_response.raw_log or '').lower()
+    for fragment, error in MODULE_ERRORS:
+        if fragment in raw_log:
+            return error(**details)
+    return (InvalidOrder if codespace == 'clob' else TransactionError)(**details)
+
+
+def _retry_after(value):
+    """Seconds of a Retry-After header (None if missing or given as a date)"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def http_error(status, url=None, retry_after=None):
+    """
+    Map an HTTP error status onto the error hierarchy.
+
+    Args:
+        status (int): The response status
+        url (str): The requested URL
+        retry_after: The response's Retry-After header
+
+    Returns:
+        HTTPError: The error to raise
+    """
+    if status == 404:
+        error = NotFound
+    elif status == 429:
+        error = TooManyRequests
+    elif status in (401, 403):
+        error = Forbidden
+    elif status in (400, 422):
+        error = BadRequest
+    elif status == 408 or status >= 500:
+        error = ServerError
+    else:
+        error = HTTPError
+    return error(status=status, url=url, retry_after=_retry_after(retry_after))
+
+
+def map_exception(error):
+    """
+    Map an exception of the HTTP, gRPC or node clients onto the error hierarchy.
+
+    Returns:
+        DydxError: The mapped error (`DydxError`s as they are), or None for exceptions that are not request
+                   failures (e.g. programming errors), which should propagate unchanged
+    """
+    if isinstance(error, DydxError):
+        return error
+
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status, int):
+        headers = getattr(response, 'headers', None) or getattr(error, 'headers', None) or {}
+        return http_error(status, retry_after=headers.get('Retry-After'))
+
+    code = getattr(error, 'code', None)
+    if callable(code):
+        try:
+            code = getattr(code(), 'name', None)
+        except Exception:
+            code = None
+        if code in RETRYABLE_GRPC_CODES:
+            return NetworkError(str(error), code=code)
+        if code == 'NOT_FOUND':
+            return NotFound(str(error))
+        if code == 'INVALID_ARGUMENT':
+            return BadRequest(str(error))
+        if code in ('UNAUTHENTICATED', 'PERMISSION_DENIED'):
+            return Forbidden(str(error))
+
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or \
+            any(cls.__name__ in _NETWORK_ERROR_TYPES for cls in type(error).__mro__):
+        return NetworkError(str(error) or "Network error", code=type(error).__name__)
+    return None
+
+
+@contextmanager
+def mapped_errors():
+    """Re-raise request failures of the client libraries inside the block as their `DydxError`"""
+    try:
+        yield
+    except DydxError:
+        raise
+    except Exception as e:
+        error = map_exception(e)
+        if error is None:
+            raise
+        raise error from e
@@ -0,0 +1,293 @@
+import json
+import os
+
+import numpy as np
+
+from .errors import HistoryPageOverflow
+
+
+# Column dtypes of the stored record kinds (indexer field name -> NumPy dtype)
+SCHEMAS = {
+    'fills': {
+        'id': 'S36',
+        'market': 'S24',
+        'side': 'S4',
+        'liquidity': 'S5',
+        'type': 'S16',
+        'price': 'f8',
+        'size': 'f8',
+        'fee': 'f8',
+        'orderId': 'S36',
+        'createdAtHeight': 'i8',
+        'createdAt': 'datetime64[ms]',
+    },
+    'transfers': {
+        'id': 'S36',
+        'type': 'S20',
+        'symbol': 'S8',
+        'size': 'f8',
+        'transactionHash': 'S64',
+        'createdAtHeight': 'i8',
+        'createdAt': 'datetime64[ms]',
+    },
+    'orders': {
+        'id': 'S36',
+        'clientId': 'i8',
+        'clobPairId': 'i4',
+        'orderFlags': 'i4',
+        'ticker': 'S24',
+        'side': 'S4',
+        'type': 'S24',
+        'status': 'S20',
+        'timeInForce': 'S12',
+        'price': 'f8',
+        'size': 'f8',
+        'totalFilled': 'f8',
+        'reduceOnly': '?',
+        'goodTilBlock': 'i8',
+        'goodTilBlockTime': 'datetime64[ms]',
+        'updatedAtHeight': 'i8',
+    },
+    'historical_pnl': {
+        'equity': 'f8',
+        'totalPnl': 'f8',
+        'netTransfers': 'f8',
+        'createdAtHeight': 'i8',
+        'createdAt': 'datetime64[ms]',
+    },
+}
+
+
+def _record_id(record):
+    # historical pnl ticks have no id, one tick per (height, time)
+    return record.get('id') or f"{record.get('createdAtHeight')}-{record.get('createdAt')}"
+
+
+async def paginate(fetch, key, cursor_field, cursor_param, limit=100, since=None, parse=None, start=None,
+                   max_limit=1000):
+    """
+    Page through a newest-first indexer endpoint with an inclusive "before or at" cursor.
+
+    The cursor of the next page is the `cursor_field` value of the oldest record of the current page, records
+    already yielded at that boundary value are skipped. Paging stops at the checkpoint `since`, on a short
+    page or when a page brings nothing new. A full page that brings nothing new means more records share the
+    boundary value than a page holds: the page is fetched again with twice the page size, up to `max_limit`.
+
+    Args:
+        fetch (callable): Coroutine function taking the page size as `limit` (unless `limit` is None) and
+                          the cursor as `cursor_param`
+        key (str): Key of the record list in the response (None if the response is the list)
+        cursor_field (str): Record field holding the cursor value (e.g. 'createdAtHeight')
+        cursor_param (str): Keyword argument of `fetch` for the cursor (e.g. 'created_before_or_at_height')
+        limit (int): Page size (None for endpoints without a page size)
+        since (dict): Checkpoint {'cursor', 'ids'}: only newer records are yielded
+        parse (callable): Converts cursor values for comparisons (e.g. int for heights)
+        start: Cursor of the first page (e.g. to make the endpoint apply its cursor filter from the start)
+        max_limit (int): Largest page size the endpoint accepts
+
+    Yields:
+        dict: Records, newest first
+
+    Raises:
+        HistoryPageOverflow: More records share one cursor value than a page of `max_limit` records holds
+    """
+    parse = parse or (lambda value: value)
+    since_cursor = None if not since else parse(since['cursor'])
+    since_ids = set(since['ids']) if since else set()
+
+    cursor = start
+    boundary_ids = set()
+    page_limit = limit
+    while True:
+        kwargs = {} if cursor is None else {cursor_param: cursor}
+        if page_limit is not None:
+            kwargs['limit'] = page_limit
+        response = await fetch(**kwargs)
+        records = response.get(key, []) if key else response
+
+        new = 0
+        for record in records:
+            record_id = _record_id(record)
+            if record_id in boundary_ids or record.get(cursor_field) is None:
+                continue
+            value = parse(record[cursor_field])
+            if since_cursor is not None and (value < since_cursor or (value == since_cursor and record_id in since_ids)):
+                return
+
+            if cursor is None or value != parse(cursor):
+                cursor = record[cursor_field]
+                boundary_ids = set()
+            boundary_ids.add(record_id)
+            new += 1
+            yield record
+
+        if page_limit is None:
+            if not new:
+                return
+            continue
+        if len(records) < page_limit:
+            return
+        if new:
+            page_limit = limit
+            continue
+
+        # a full page of records already yielded at the boundary value, fetch it again with a larger page
+        if page_limit >= max_limit:
+            raise HistoryPageOverflow(cursor=cursor, limit=page_limit)
+        page_limit = min(page_limit * 2, max_limit)
+
+
+class Checkpoint:
+    """Tracks the newest cursor value of a sync run and the ids of the records at that value"""
+
+    def __init__(self, cursor_field, parse=None):
+        self.cursor_field = cursor_field
+        self.parse = parse or (lambda value: value)
+        self.cursor = None
+        self.ids = []
+
+    def observe(self, record):
+        value = record.get(self.cursor_field)
+        if value is None:
+            return
+        if self.cursor is None or self.parse(value) > self.parse(self.cursor):
+            self.cursor = value
+            self.ids = [_record_id(record)]
+        elif self.parse(value) == self.parse(self.cursor):
+            self.ids.append(_record_id(record))
+
+    def to_dict(self):
+        return None if self.cursor is None else {'cursor': self.cursor, 'ids': self.ids}
+
+
+class ColumnTable:
+    """
+    Append-only columnar table of one record kind in a directory.
+
+    Each column is a raw binary file of a fixed NumPy dtype, appended in chunks and read back as read-only
+    memory maps. The committed row count is kept in `meta.json` along with the sync checkpoint; rows appended
+    after the last commit (an interrupted sync) are truncated when the table is opened or rolled back.
+    """
+
+    def __init__(self, path, schema, chunk_size=10000):
+        self.path = path
+        self.schema = {name: np.dtype(dtype) for name, dtype in schema.items()}
+        self.chunk_size = chunk_size
+        self._buffer = []
+        os.makedirs(path, exist_ok=True)
+
+        self.meta = self._read_meta()
+        self.rollback()
+
+    def __len__(self):
+        return self.rows + len(self._buffer)
+
+    def _column_path(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @property
+    def checkpoint(self):
+        return self.meta.get('checkpoint')
+
+    def append(self, record: dict):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows to the column files (not committed until `commit`)"""
+        if not self._buffer:
+            return
+        for name, dtype in self.schema.items():
+            values = [self._convert(record.get(name), dtype) for record in self._buffer]
+            with open(self._column_path(name), 'ab') as f:
+                f.write(np.array(values, dtype=dtype).tobytes())
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    @staticmethod
+    def _convert(value, dtype):
+        if dtype.kind == 'S':
+            return b'' if value is None else str(value).encode()
+        if dtype.kind == 'M':
+            return np.datetime64('NaT') if not value else np.datetime64(str(value).rstrip('Z'), 'ms')
+        if dtype.kind == 'b':
+            return bool(value)
+        if value is None or value == '':
+            return np.nan if dtype.kind == 'f' else 0
+        return value
+
+    def rollback(self):
+        """Drop buffered and flushed rows that were not committed (after a failed sync)"""
+        self._buffer = []
+        self.rows = self.meta.get('rows', 0)
+        for name, dtype in self.schema.items():
+            column = self._column_path(name)
+            if os.path.exists(column) and os.path.getsize(column) != self.rows * dtype.itemsize:
+                with open(column, 'r+b') as f:
+                    f.truncate(self.rows * dtype.itemsize)
+
+    def commit(self, checkpoint=None):
+        """Flush and atomically record the row count (and the new sync checkpoint)"""
+        self.flush()
+        self.meta['rows'] = self.rows
+        if checkpoint is not None:
+            self.meta['checkpoint'] = checkpoint
+        temp = os.path.join(self.path, 'meta.json.tmp')
+        with open(temp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(temp, os.path.join(self.path, 'meta.json'))
+
+    def load(self, columns=None):
+        """
+        Memory map the committed rows.
+
+        Returns:
+            dict: Column name -> read-only NumPy array
+        """
+        result = {}
+        for name in columns or self.schema:
+            dtype = self.schema[name]
+            if not self.rows:
+                result[name] = np.zeros(0, dtype=dtype)
+                continue
+            result[name] = np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(self.rows,))
+        return result
+
+    def latest(self, columns=None):
+        """Like `load`, keeping only the last stored row of every id (records that were re-synced)"""
+        data = self.load(columns if columns is None or 'id' in columns else list(columns) + ['id'])
+        ids = data['id'][::-1]
+        _, first = np.unique(ids, return_index=True)
+        keep = np.sort(len(ids) - 1 - first)
+        return {name: np.asarray(column)[keep] for name, column in data.items()}
+
+
+class HistoryStore:
+    """
+    Local columnar copy of account history: one `ColumnTable` per (address, subaccount, record kind) under
+    `root`, e.g. root/dydx1.../0/fills/price.bin.
+    """
+
+    def __init__(self, root, chunk_size=10000):
+        self.root = root
+        self.chunk_size = chunk_size
+        self._tables = {}
+
+    def table(self, address, subaccount_number, kind) -> ColumnTable:
+        key = (address, int(subaccount_number), kind)
+        table = self._tables.get(key)
+        if table is None:
+            path = os.path.join(self.root, address, str(int(subaccount_number)), kind)
+            table = self._tables[key] = ColumnTable(path, SCHEMAS[kind], self.chunk_size)
+        return table
+
+    def load(self, address, subaccount_number, kind, columns=None):
+        return self.table(address, subaccount_number, kind).load(columns)
@@ -0,0 +1,313 @@
+import contextvars
+import functools
+import json
+import logging
+import time
+from bisect import bisect_left
+
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Public operation the current task is running (labels the stages recorded inside it)
+_operation = contextvars.ContextVar('dydx_operation', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics: each bucket counts observations <= its bound)"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        result = []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def quantile(self, q):
+        """Approximate quantile (upper bound of the bucket holding it)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in zip(self.bounds + (float('inf'),), self.cumulative()):
+            if total >= rank:
+                return bound
+        return float('inf')
+
+
+class _NullSpan:
+    """Span returned while instrumentation is disabled, does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'stage', 'started', '_token')
+
+    def __init__(self, metrics, name, stage):
+        self.metrics = metrics
+        self.name = name
+        self.stage = stage
+        self._token = None
+
+    def __enter__(self):
+        if self.stage is None:
+            self._token = _operation.set(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = time.perf_counter() - self.started
+        metrics = self.metrics
+        if self.stage is None:
+            _operation.reset(self._token)
+            metrics.observe('operation_duration_seconds', duration, operation=self.name)
+            if exc_type is not None:
+                metrics.count('operation_errors_total', operation=self.name, error=exc_type.__name__)
+        else:
+            metrics.observe('stage_duration_seconds', duration, operation=self.name, stage=self.stage)
+        return False
+
+
+class Metrics:
+    """
+    In-process metrics registry: counters and latency histograms keyed by name and labels.
+
+    `operation(name)` spans time a public method, `span(stage)` spans time its internal stages (labelled with the
+    enclosing operation), `record_call` counts REST / gRPC / websocket calls by result code. Everything can be
+    exported in the Prometheus text format or as an OTLP JSON metrics payload. When disabled, spans are a shared
+    no-op object and recording methods return immediately.
+    """
+
+    def __init__(self, enabled=True, namespace='dydx', buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.namespace = namespace
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def operation(self, name):
+        """Time a public operation; stages recorded inside it are labelled with its name"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, None)
+
+    def span(self, stage):
+        """Time an internal stage of the current operation"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, _operation.get() or 'internal', stage)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def record_call(self, transport, method, duration, code='ok'):
+        """
+        Record one network call.
+
+        Args:
+            transport (str): 'rest', 'grpc' or 'websocket'
+            method (str): Endpoint or RPC name
+            duration (float): Seconds from request to response
+            code: Result code (HTTP status, tx code, gRPC status or error type), 'ok' on success
+        """
+        if not self.enabled:
+            return
+        self.count('calls_total', transport=transport, method=method, code=str(code))
+        self.observe('call_duration_seconds', duration, transport=transport, method=method)
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+    def summary(self):
+        """Return counters and per histogram count / mean / approximate p50 and p99"""
+        return {
+            'counters': {self._format_name(name, labels): value for (name, labels), value in self.counters.items()},
+            'histograms': {
+                self._format_name(name, labels): {
+                    'count': histogram.count,
+                    'mean': histogram.sum / histogram.count if histogram.count else None,
+                    'p50': histogram.quantile(0.5),
+                    'p99': histogram.quantile(0.99),
+                }
+                for (name, labels), histogram in self.histograms.items()
+            },
+        }
+
+    # Export
+
+    def _format_name(self, name, labels):
+        label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+        full_name = f'{self.namespace}_{name}'
+        return f'{full_name}{{{label_text}}}' if label_text else full_name
+
+    def prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f'# TYPE {self.namespace}_{name} counter')
+            for (metric, labels), value in self.counters.items():
+                if metric == name:
+                    lines.append(f'{self._format_name(name, labels)} {value}')
+
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append(f'# TYPE {self.namespace}_{name} histogram')
+            for (metric, labels), histogram in self.histograms.items():
+                if metric != name:
+                    continue
+                for bound, total in zip(histogram.bounds + (float('inf'),), histogram.cumulative()):
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{self._format_name(name + "_bucket", labels + (("le", le),))} {total}')
+                lines.append(f'{self._format_name(name + "_sum", labels)} {histogram.sum}')
+                lines.append(f'{self._format_name(name + "_count", labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def otlp(self, service_name='dydx-client'):
+        """
+        Render every metric as an OTLP/JSON `ExportMetricsServiceRequest` (cumulative temporality), ready to be
+        posted to an OpenTelemetry collector's /v1/metrics endpoint.
+        """
+        start = str(int(self.started_at * 1e9))
+        now = str(int(time.time() * 1e9))
+
+        def attributes(labels):
+            return [{'key': key, 'value': {'stringValue': str(value)}} for key, value in labels]
+
+        metrics = {}
+        for (name, labels), value in self.counters.items():
+            metric = metrics.setdefault(name, {
+                'name': f'{self.namespace}.{name}',
+                'sum': {'dataPoints': [], 'aggregationTemporality': 2, 'isMonotonic': True},
+            })
+            metric['sum']['dataPoints'].append({
+                'attributes': attributes(labels), 'startTimeUnixNano': start, 'timeUnixNano': now, 'asInt': str(value),
+            })
+        for (name, labels), histogram in self.histograms.items():
+            metric = metrics.setdefault(name, {
+                'name': f'{self.namespace}.{name}',
+                'unit': 's',
+                'histogram': {'dataPoints': [], 'aggregationTemporality': 2},
+            })
+            metric['histogram']['dataPoints'].append({
+                'attributes': attributes(labels),
+                'startTimeUnixNano': start,
+                'timeUnixNano': now,
+                'count': str(histogram.count),
+                'sum': histogram.sum,
+                'bucketCounts': [str(count) for count in histogram.counts],
+                'explicitBounds': list(histogram.bounds),
+            })
+
+        return {'resourceMetrics': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+            'scopeMetrics': [{'scope': {'name': 'dydx_client'}, 'metrics': list(metrics.values())}],
+        }]}
+
+
+def error_code(error):
+    """Result code of a failed call: the HTTP status, the gRPC status name / ABCI code or else the exception type"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status
+
+    code = getattr(error, 'code', None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+        if code is not None:
+            return getattr(code, 'name', code)
+    elif isinstance(code, (int, str)) and code:
+        # a mapped DydxError's ABCI code / gRPC status name
+        return code
+    return type(error).__name__
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Shared disabled registry for components created without one
+NULL_METRICS = Metrics(enabled=False)
+
+
+def instrumented(method):
+    """Record a coroutine method of an object with a `metrics` registry as an operation named after it"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if not metrics.enabled:
+            return await method(self, *args, **kwargs)
+        with metrics.operation(name):
+            return await method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Log formatter writing one JSON object per record, including the structured fields passed through `extra`.
+
+    Example:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        logging.getLogger('dydx_client').addHandler(handler)
+    """
+
+    _RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in self._RESERVED})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
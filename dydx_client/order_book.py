@@ -0,0 +1,261 @@
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+
+
+class OrderBook:
+    """
+    Incrementally maintained L2 order book of a single market.
+
+    Price levels are kept as integer ticks (price / tickSize) and sizes as integer base quantums
+    (size * 10^-atomicResolution) in sorted `array('q')` columns. Both sides are sorted so that the best level
+    is the last element: bids by ascending tick, asks by descending tick (stored negated). Level lookups are
+    binary searches, best bid/ask are O(1) and updates near the top of the book only shift a few elements.
+
+    Updates are applied from `v4_orderbook` websocket messages. Out-of-order messages, disconnects and lost
+    messages (a skipped connection `message_id`, detected by the `IndexerStream`, which sees every channel's
+    ids) mark the book as needing a resync from a fresh snapshot; crossed books are counted and optionally
+    trigger a resync.
+    """
+
+    def __init__(self, market_id, tick_size, atomic_resolution, resync_on_crossed=False):
+        self.market_id = market_id
+        self.tick_size = Decimal(str(tick_size))
+        self.atomic_resolution = int(atomic_resolution)
+        self.resync_on_crossed = resync_on_crossed
+
+        self._inv_tick = 1.0 / float(self.tick_size)
+        self._tick = float(self.tick_size)
+        self._quantums_per_unit = 10.0 ** -self.atomic_resolution
+
+        self._bid_keys = array('q')
+        self._bid_sizes = array('q')
+        self._ask_keys = array('q')
+        self._ask_sizes = array('q')
+
+        self.synced = False
+        self.needs_resync = True
+        self.last_message_id = None
+        self.updates = 0
+        self.gaps = 0
+        self.crossings = 0
+        self.resyncs = 0
+
+    def __len__(self):
+        return len(self._bid_keys) + len(self._ask_keys)
+
+    # Conversions
+
+    def to_ticks(self, price):
+        return int(round(float(price) * self._inv_tick))
+
+    def to_quantums(self, size):
+        return int(round(float(size) * self._quantums_per_unit))
+
+    def price(self, ticks):
+        """Convert integer ticks back to an exact Decimal price"""
+        return self.tick_size * ticks
+
+    def size(self, quantums):
+        return quantums / self._quantums_per_unit
+
+    # Updates
+
+    @staticmethod
+    def _set_level(keys, sizes, key, size):
+        index = bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            if size:
+                sizes[index] = size
+            else:
+                del keys[index]
+                del sizes[index]
+        elif size:
+            keys.insert(index, key)
+            sizes.insert(index, size)
+
+    def set_bid(self, price, size):
+        self._set_level(self._bid_keys, self._bid_sizes, self.to_ticks(price), self.to_quantums(size))
+
+    def set_ask(self, price, size):
+        self._set_level(self._ask_keys, self._ask_sizes, -self.to_ticks(price), self.to_quantums(size))
+
+    def clear(self):
+        del self._bid_keys[:]
+        del self._bid_sizes[:]
+        del self._ask_keys[:]
+        del self._ask_sizes[:]
+
+    def load_snapshot(self, snapshot: dict):
+        """
+        Replace the book with a full snapshot, e.g. the contents of a 'subscribed' message or the response of
+        `get_perpetual_market_orderbook`. Levels may be dicts ({'price', 'size'}) or [price, size] pairs.
+        """
+        self.clear()
+        for level in snapshot.get('bids') or ():
+            price, size = (level['price'], level['size']) if isinstance(level, dict) else level
+            self.set_bid(price, size)
+        for level in snapshot.get('asks') or ():
+            price, size = (level['price'], level['size']) if isinstance(level, dict) else level
+            self.set_ask(price, size)
+
+        self.synced = True
+        self.needs_resync = False
+        self._check_crossed()
+
+    def apply_update(self, contents: dict):
+        """Apply an incremental update ([price, size] pairs, size '0' removes the level)"""
+        for price, size in contents.get('bids') or ():
+            self.set_bid(price, size)
+        for price, size in contents.get('asks') or ():
+            self.set_ask(price, size)
+        self.updates += 1
+
+    def apply_message(self, message: dict):
+        """Apply a `v4_orderbook` websocket message of this market"""
+        if message.get('channel') != 'v4_orderbook' or message.get('id') != self.market_id:
+            return
+
+        msg_type = message.get('type')
+        if msg_type == 'subscribed':
+            self.last_message_id = message.get('message_id')
+            self.load_snapshot(message.get('contents') or {})
+            return
+
+        if msg_type not in ('channel_data', 'channel_batch_data'):
+            return
+
+        # message ids increase monotonically on a connection, anything else means updates were lost or reordered
+        message_id = message.get('message_id')
+        if message_id is not None and self.last_message_id is not None and message_id <= self.last_message_id:
+            self.mark_gap()
+        self.last_message_id = message_id
+
+        if not self.synced:
+            return
+
+        contents = message.get('contents')
+        if msg_type == 'channel_batch_data':
+            for update in contents:
+                self.apply_update(update)
+        else:
+            self.apply_update(contents)
+        self._check_crossed()
+
+    def mark_gap(self):
+        """Flag the book as out of sync (lost updates, disconnect); it must be reloaded from a snapshot"""
+        self.gaps += 1
+        self.synced = False
+        self.needs_resync = True
+
+    def _check_crossed(self):
+        if self.crossed:
+            self.crossings += 1
+            if self.resync_on_crossed:
+                self.synced = False
+                self.needs_resync = True
+
+    # Queries
+
+    @property
+    def crossed(self):
+        return bool(self._bid_keys) and bool(self._ask_keys) and self._bid_keys[-1] >= -self._ask_keys[-1]
+
+    def best_bid_ticks(self):
+        """(ticks, quantums) of the best bid or None"""
+        if not self._bid_keys:
+            return None
+        return self._bid_keys[-1], self._bid_sizes[-1]
+
+    def best_ask_ticks(self):
+        """(ticks, quantums) of the best ask or None"""
+        if not self._ask_keys:
+            return None
+        return -self._ask_keys[-1], self._ask_sizes[-1]
+
+    def best_bid(self):
+        """(price, size) of the best bid or None"""
+        level = self.best_bid_ticks()
+        return None if level is None else (self.price(level[0]), self.size(level[1]))
+
+    def best_ask(self):
+        """(price, size) of the best ask or None"""
+        level = self.best_ask_ticks()
+        return None if level is None else (self.price(level[0]), self.size(level[1]))
+
+    def mid(self):
+        bid, ask = self.best_bid_ticks(), self.best_ask_ticks()
+        if bid is None or ask is None:
+            return None
+        return self.price(bid[0] + ask[0]) / 2
+
+    def spread(self):
+        bid, ask = self.best_bid_ticks(), self.best_ask_ticks()
+        if bid is None or ask is None:
+            return None
+        return self.price(ask[0] - bid[0])
+
+    def _levels(self, side):
+        # side is the book side walked from the best level outwards: 'BUY' orders consume asks
+        if side.upper() in ('BUY', 'ASK', 'ASKS'):
+            return self._ask_keys, self._ask_sizes, -1
+        return self._bid_keys, self._bid_sizes, 1
+
+    def depth(self, side, levels=None, price=None):
+        """
+        Cumulative size available on one side of the book.
+
+        Args:
+            side (str): 'BUY' (walks the asks) or 'SELL' (walks the bids)
+            levels (int): Only count the best `levels` price levels
+            price (float | Decimal): Only count levels at or better than this price
+
+        Returns:
+            float: Cumulative size in base units
+        """
+        keys, sizes, sign = self._levels(side)
+        limit = None if price is None else sign * self.to_ticks(price)
+        total = 0
+        count = 0
+        for index in range(len(keys) - 1, -1, -1):
+            if levels is not None and count >= levels:
+                break
+            if limit is not None and keys[index] < limit:
+                break
+            total += sizes[index]
+            count += 1
+        return self.size(total)
+
+    def vwap(self, side, size):
+        """
+        Volume weighted average price (and worst level price) of a taker order of `size`.
+
+        Args:
+            side (str): Side of the taker order, 'BUY' (consumes asks) or 'SELL' (consumes bids)
+            size (float | Decimal): Order size in base units
+
+        Returns:
+            tuple: (vwap, worst_price) as Decimals, or None if the book is not deep enough
+        """
+        keys, sizes, sign = self._levels(side)
+        remaining = self.to_quantums(size)
+        if remaining <= 0:
+            return None
+
+        notional = 0
+        filled = 0
+        for index in range(len(keys) - 1, -1, -1):
+            take = min(remaining, sizes[index])
+            ticks = sign * keys[index]
+            notional += take * ticks
+            filled += take
+            remaining -= take
+            if remaining == 0:
+                return self.price(Decimal(notional) / filled), self.price(ticks)
+        return None
+
+    def levels(self, side, count=10):
+        """Best `count` levels of a side ('BIDS' or 'ASKS') as (price, size) tuples"""
+        keys, sizes, sign = self._levels('ASKS' if side.upper() in ('ASK', 'ASKS', 'BUY') else 'BIDS')
+        return [(self.price(sign * keys[index]), self.size(sizes[index]))
+                for index in range(len(keys) - 1, max(len(keys) - 1 - count, -1), -1)]
@@ -0,0 +1,194 @@
+import uuid
+
+
+# Namespace the dYdX indexer uses to derive its subaccount and order uuids
+INDEXER_UUID_NAMESPACE = uuid.UUID('0f9da948-a6fb-4c45-9edc-4685c3f3317d')
+
+# Order statuses after which an order can no longer change
+FINAL_STATUSES = ('FILLED', 'CANCELED', 'BEST_EFFORT_CANCELED')
+
+
+def subaccount_uuid(address, subaccount_number):
+    """Indexer id of a subaccount"""
+    return str(uuid.uuid5(INDEXER_UUID_NAMESPACE, f"{address}-{int(subaccount_number)}"))
+
+
+def order_uuid(address, subaccount_number, client_id, clob_pair_id, order_flags):
+    """Indexer id of an order, derived from its on-chain order id components"""
+    subaccount_id = subaccount_uuid(address, subaccount_number)
+    return str(uuid.uuid5(INDEXER_UUID_NAMESPACE,
+                          f"{subaccount_id}-{int(client_id)}-{int(clob_pair_id)}-{int(order_flags)}"))
+
+
+class OrderStore:
+    """
+    In-memory store of this wallet's own orders.
+
+    Orders are kept in indexer format (camelCase dicts) and indexed by
+    (subaccount_number, client_id, order_flags, clob_pair_id) and by indexer `id`, with secondary indexes by
+    clob pair and by status. Records are created locally when an order is placed and kept current from
+    indexer REST results and `v4_subaccounts` websocket updates.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self._orders = {}
+        self._ids = {}
+        self._by_market = {}
+        self._by_status = {}
+        # subaccounts whose records are kept current by a v4_subaccounts subscription
+        self.live_subaccounts = set()
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, key):
+        return key in self._orders or key in self._ids
+
+    @staticmethod
+    def key(client_id, order_flags, clob_pair_id, subaccount_number=0):
+        return int(subaccount_number), int(client_id), int(order_flags), int(clob_pair_id)
+
+    def get(self, client_id, order_flags, clob_pair_id, subaccount_number=0):
+        """Return the order with the given on-chain id components (None if unknown)"""
+        return self._orders.get(self.key(client_id, order_flags, clob_pair_id, subaccount_number))
+
+    def get_by_id(self, order_id):
+        """Return the order with the given indexer id (None if unknown)"""
+        key = self._ids.get(order_id)
+        return self._orders.get(key) if key is not None else None
+
+    def by_market(self, clob_pair_id):
+        """Return every stored order of a clob pair"""
+        return [self._orders[key] for key in self._by_market.get(int(clob_pair_id), ())]
+
+    def by_status(self, status):
+        """Return every stored order with the given indexer status"""
+        return [self._orders[key] for key in self._by_status.get(status, ())]
+
+    def open_orders(self, clob_pair_id=None):
+        """Return every stored order that is not in a final state, optionally for a single clob pair"""
+        keys = self._orders if clob_pair_id is None else self._by_market.get(int(clob_pair_id), ())
+        return [self._orders[key] for key in keys if self._orders[key].get('status') not in FINAL_STATUSES]
+
+    def is_live(self, subaccount_number=0):
+        """Whether the records of a subaccount are kept current by the websocket feed"""
+        return int(subaccount_number) in self.live_subaccounts
+
+    def add_placed(self, order_id, order, ticker=None):
+        """
+        Record an order right after it was broadcast.
+
+        Args:
+            order_id (OrderId): The protobuf order id
+            order (Order): The protobuf order
+            ticker (str): The market ticker
+
+        Returns:
+            dict: The stored record
+        """
+        subaccount_number = order_id.subaccount_id.number
+        record = {
+            'id': order_uuid(self.address, subaccount_number, order_id.client_id, order_id.clob_pair_id,
+                             order_id.order_flags),
+            'clientId': str(order_id.client_id),
+            'clobPairId': str(order_id.clob_pair_id),
+            'orderFlags': str(order_id.order_flags),
+            'subaccountNumber': subaccount_number,
+            'side': 'BUY' if order.side == order.Side.SIDE_BUY else 'SELL',
+            'quantums': order.quantums,
+            'subticks': order.subticks,
+            'reduceOnly': order.reduce_only,
+            'status': 'BEST_EFFORT_OPENED',
+        }
+        if order.good_til_block:
+            record['goodTilBlock'] = str(order.good_til_block)
+        if order.good_til_block_time:
+            record['goodTilBlockTime'] = order.good_til_block_time
+        if ticker:
+            record['ticker'] = ticker
+
+        # The feed may have reported the order before the broadcast returned, keep its (newer) fields
+        existing = self.get_by_id(record['id'])
+        if existing is not None:
+            return self.upsert({key: value for key, value in record.items() if key not in existing or key == 'id'})
+        return self.upsert(record)
+
+    def upsert(self, order: dict, subaccount_number=None):
+        """
+        Insert or merge an order in indexer format.
+
+        Updates without the id components (e.g. partial websocket updates) are merged into the record with the
+        same indexer `id` and ignored if that id is unknown.
+
+        Returns:
+            dict: The stored record (None if the update could not be matched)
+        """
+        key = self._ids.get(order.get('id'))
+        if key is None:
+            if order.get('clientId') is None or order.get('orderFlags') is None or order.get('clobPairId') is None:
+                return None
+            if subaccount_number is None:
+                subaccount_number = order.get('subaccountNumber', 0)
+            key = self.key(order['clientId'], order['orderFlags'], order['clobPairId'], subaccount_number)
+
+        record = self._orders.get(key)
+        if record is None:
+            record = self._orders[key] = {'subaccountNumber': key[0]}
+            self._by_market.setdefault(key[3], set()).add(key)
+        else:
+            self._by_status.get(record.get('status'), set()).discard(key)
+
+        record.update(order)
+        if record.get('id') is None:
+            record['id'] = order_uuid(self.address, key[0], key[1], key[3], key[2])
+        self._ids[record['id']] = key
+        self._by_status.setdefault(record.get('status'), set()).add(key)
+        return record
+
+    def upsert_many(self, orders, subaccount_number=None):
+        """Insert or merge a list of indexer orders (e.g. a `get_subaccount_orders` response)"""
+        for order in orders:
+            self.upsert(order, subaccount_number)
+
+    def remove(self, client_id, order_flags, clob_pair_id, subaccount_number=0):
+        """Drop an order from the store"""
+        key = self.key(client_id, order_flags, clob_pair_id, subaccount_number)
+        record = self._orders.pop(key, None)
+        if record is None:
+            return None
+        self._ids.pop(record.get('id'), None)
+        self._by_market.get(key[3], set()).discard(key)
+        self._by_status.get(record.get('status'), set()).discard(key)
+        return record
+
+    def prune(self):
+        """Drop every order in a final state, returning how many were removed"""
+        final = [key for status in FINAL_STATUSES for key in self._by_status.get(status, ())]
+        for key in final:
+            self.remove(key[1], key[2], key[3], key[0])
+        return len(final)
+
+    def apply_subaccounts_message(self, message: dict):
+        """
+        Apply a message from the indexer `v4_subaccounts` websocket channel.
+
+        The 'subscribed' message carries the subaccount's open orders, 'channel_data' and 'channel_batch_data'
+        messages carry order updates under contents['orders'].
+        """
+        if message.get('channel') != 'v4_subaccounts':
+            return
+
+        subaccount_number = int(message.get('id', '/0').rsplit('/', 1)[-1])
+        msg_type = message.get('type')
+        contents = message.get('contents')
+        if msg_type == 'subscribed':
+            self.live_subaccounts.add(subaccount_number)
+            self.upsert_many(contents.get('orders') or [], subaccount_number)
+        elif msg_type == 'channel_data':
+            self.upsert_many(contents.get('orders') or [], subaccount_number)
+        elif msg_type == 'channel_batch_data':
+            for update in contents:
+                self.upsert_many(update.get('orders') or [], subaccount_number)
+        elif msg_type == 'unsubscribed':
+            self.live_subaccounts.discard(subaccount_number)
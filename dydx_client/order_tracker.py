@@ -0,0 +1,259 @@
+import asyncio
+import datetime
+import time
+
+from .errors import OrderNotFilled
+from .order_store import FINAL_STATUSES, OrderStore, order_uuid
+
+
+# Local final statuses: the good-til block / time passed without a final indexer status, or the broadcast
+# was rejected
+EXPIRED = 'EXPIRED'
+REJECTED = 'REJECTED'
+
+
+def _timestamp(value):
+    """Seconds since the epoch of an indexer ISO time or a protobuf good-til-block-time"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class OrderHandle:
+    """
+    Live view of one placed order, resolved from the `v4_subaccounts` feed and block heights instead of polling.
+
+    `await handle.done()` waits for a final status (FILLED, CANCELED, BEST_EFFORT_CANCELED, or EXPIRED / REJECTED
+    locally), `await handle.filled()` for a complete fill and `async for fill in handle.partial_fills()` yields
+    the order's fills (indexer fill dicts) as they arrive.
+    """
+
+    def __init__(self, order_store: OrderStore, order_id, market_id=None):
+        self.order_store = order_store
+        self.order_id = order_id
+        self.market_id = market_id
+        self.subaccount_number = order_id.subaccount_id.number
+        self.id = order_uuid(order_store.address, self.subaccount_number, order_id.client_id,
+                             order_id.clob_pair_id, order_id.order_flags)
+        self.transaction = None
+        self.status = None
+        self.fills = []
+        self._fill_ids = set()
+        self._done = asyncio.get_running_loop().create_future()
+        self._changed = asyncio.Event()
+
+    def __repr__(self):
+        return f'OrderHandle({self.id}, {self.market_id}, status={self.status}, filled={self.filled_size})'
+
+    @property
+    def record(self):
+        """The order's record in the order store (None until it was placed or seen on the feed)"""
+        return self.order_store.get_by_id(self.id)
+
+    @property
+    def is_done(self):
+        return self._done.done()
+
+    @property
+    def filled_size(self):
+        """Filled size in base units, from the order's total filled or else the fills received"""
+        record = self.record
+        if record is not None and record.get('totalFilled') is not None:
+            return float(record['totalFilled'])
+        return sum(float(fill['size']) for fill in self.fills)
+
+    def _notify(self):
+        # wake every waiting iterator, later waits use a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _add_fill(self, fill):
+        fill_id = fill.get('id')
+        if fill_id is not None:
+            if fill_id in self._fill_ids:
+                return
+            self._fill_ids.add(fill_id)
+        self.fills.append(fill)
+        self._notify()
+
+    def _refresh(self):
+        """Take the status of the stored record, resolving the handle once it is final"""
+        record = self.record
+        if record is None or self.is_done:
+            return
+        self.status = record.get('status')
+        if self.status in FINAL_STATUSES:
+            self._resolve(self.status)
+        else:
+            self._notify()
+
+    def _resolve(self, status):
+        if self.is_done:
+            return
+        self.status = status
+        self._done.set_result(self.record)
+        self._notify()
+
+    async def done(self, timeout=None):
+        """
+        Wait for the order to reach a final status.
+
+        Args:
+            timeout (float): Maximum seconds to wait (None: no limit), raises asyncio.TimeoutError when exceeded
+
+        Returns:
+            dict: The order record (None if the order never reached the order store, e.g. REJECTED)
+        """
+        return await asyncio.wait_for(asyncio.shield(self._done), timeout)
+
+    async def filled(self, timeout=None):
+        """
+        Wait for the order to be completely filled.
+
+        Returns:
+            dict: The order record
+
+        Raises:
+            OrderNotFilled: The order reached another final status (e.g. canceled or expired, possibly partially
+                            filled)
+        """
+        record = await self.done(timeout)
+        if self.status != 'FILLED':
+            raise OrderNotFilled(order_id=self.id, status=self.status, filled_size=self.filled_size)
+        return record
+
+    async def partial_fills(self):
+        """Yield every fill of the order as it arrives, ending once the order reached a final status"""
+        index = 0
+        while True:
+            while index < len(self.fills):
+                yield self.fills[index]
+                index += 1
+            if self.is_done:
+                return
+            await self._changed.wait()
+
+    def _cancel(self):
+        if not self._done.done():
+            self._done.cancel()
+        self._notify()
+
+
+class OrderTracker:
+    """
+    Resolves the `OrderHandle`s of one wallet.
+
+    Order updates and fills from `v4_subaccounts` messages (applied to the order store first) resolve handles by
+    indexer order id; every new block height expires handles whose good-til block (short-term orders) or
+    good-til time (stateful orders) passed more than a grace period ago without a final status, since the
+    indexer may never report an unmatched short-term order.
+    """
+
+    def __init__(self, order_store: OrderStore, expiry_grace_blocks=2, expiry_grace_seconds=5.0):
+        self.order_store = order_store
+        self.expiry_grace_blocks = expiry_grace_blocks
+        self.expiry_grace_seconds = expiry_grace_seconds
+        self._handles = {}
+
+    def __len__(self):
+        return len(self._handles)
+
+    def get(self, order_id: str):
+        """Return the pending handle of an indexer order id (None if not tracked)"""
+        return self._handles.get(order_id)
+
+    def pending(self, subaccount_number=None):
+        """Return every handle that has not reached a final status, optionally of a single subaccount"""
+        return [handle for handle in self._handles.values()
+                if subaccount_number is None or handle.subaccount_number == subaccount_number]
+
+    def track(self, order_id, market_id=None) -> OrderHandle:
+        """
+        Register a handle for an order (before it is broadcast, so updates that beat the broadcast response
+        are not missed).
+
+        Args:
+            order_id (OrderId): The protobuf order id
+            market_id (str): The market ticker
+
+        Returns:
+            OrderHandle: The order's handle (the existing one if the order is already tracked)
+        """
+        id = order_uuid(self.order_store.address, order_id.subaccount_id.number, order_id.client_id,
+                        order_id.clob_pair_id, order_id.order_flags)
+        handle = self._handles.get(id)
+        if handle is None:
+            handle = self._handles[id] = OrderHandle(self.order_store, order_id, market_id)
+            # an order that already reached a final status resolves right away
+            self.refresh(handle)
+        return handle
+
+    def resolve(self, handle, status):
+        """Resolve a handle with a local final status (e.g. REJECTED when the broadcast failed)"""
+        self._handles.pop(handle.id, None)
+        handle._resolve(status)
+
+    def refresh(self, handle):
+        """Re-read a handle's status from the order store (e.g. after the order was fetched from the indexer)"""
+        handle._refresh()
+        if handle.is_done:
+            self._handles.pop(handle.id, None)
+
+    def apply_subaccounts_message(self, message: dict):
+        """
+        Apply a `v4_subaccounts` message (after the order store applied it).
+
+        Returns:
+            list: Pending handles of the subaccount missing from a 'subscribed' snapshot, whose orders may have
+                  changed while the feed was down and should be fetched (empty for other messages)
+        """
+        if message.get('channel') != 'v4_subaccounts' or not self._handles:
+            return []
+
+        msg_type = message.get('type')
+        contents = message.get('contents')
+        if msg_type == 'channel_batch_data':
+            updates = contents
+        elif msg_type in ('subscribed', 'channel_data'):
+            updates = [contents]
+        else:
+            return []
+
+        for update in updates:
+            # fills first, so a handle resolved by its order update already holds its last fills
+            for fill in update.get('fills') or ():
+                handle = self._handles.get(fill.get('orderId'))
+                if handle is not None:
+                    handle._add_fill(fill)
+            for order in update.get('orders') or ():
+                handle = self._handles.get(order.get('id'))
+                if handle is not None:
+                    self.refresh(handle)
+
+        if msg_type != 'subscribed':
+            return []
+        subaccount_number = int(message.get('id', '/0').rsplit('/', 1)[-1])
+        listed = {order.get('id') for order in contents.get('orders') or ()}
+        return [handle for handle in self.pending(subaccount_number) if handle.id not in listed]
+
+    def apply_block_height(self, height):
+        """Expire pending handles whose good-til block / time passed (a `BlockHeightTracker` listener)"""
+        if not self._handles:
+            return
+        now = time.time()
+        for handle in list(self._handles.values()):
+            record = handle.record
+            if record is None:
+                continue
+            good_til_block = record.get('goodTilBlock')
+            good_til_block_time = record.get('goodTilBlockTime')
+            if good_til_block and height > int(good_til_block) + self.expiry_grace_blocks:
+                self.resolve(handle, EXPIRED)
+            elif good_til_block_time and now > _timestamp(good_til_block_time) + self.expiry_grace_seconds:
+                self.resolve(handle, EXPIRED)
+
+    def close(self):
+        """Stop tracking, cancelling every pending handle's waiters"""
+        handles, self._handles = self._handles, {}
+        for handle in handles.values():
+            handle._cancel()
@@ -0,0 +1,83 @@
+import asyncio
+
+from .dydx import DYDX, ClientTransport
+
+
+class DYDXPool:
+    """
+    Many wallets (and their subaccounts) trading over one shared set of connections.
+
+    Every client created by the pool uses the same `ClientTransport`: one node gRPC channel, one indexer
+    client, one pooled HTTP session and one indexer websocket, plus a shared market cache, block height
+    tracker and indexer rate limit. Each wallet keeps its own sequencer, order store and order rate limits.
+    Subaccounts of a wallet are addressed with the `subaccount_number` arguments of its client.
+    """
+
+    def __init__(self, transport: ClientTransport = None, **client_options):
+        """
+        Args:
+            transport (ClientTransport): The shared transport, a default mainnet transport if not given
+            client_options: Per wallet `DYDX` options applied to every client (e.g. max_in_flight, rate_limit_wait)
+        """
+        self.transport = transport or ClientTransport()
+        self.client_options = client_options
+        self.clients = {}
+
+    def client(self, wallet_address, mnemonic, **options) -> DYDX:
+        """
+        Return the pool's client of a wallet, creating it on first use.
+
+        Args:
+            wallet_address (str): The wallet address
+            mnemonic (str): The wallet mnemonic
+            options: Per wallet `DYDX` options overriding the pool's client options
+
+        Returns:
+            DYDX: The wallet's client
+        """
+        client = self.clients.get(wallet_address)
+        if client is None:
+            client = DYDX(wallet_address, mnemonic, transport=self.transport, **{**self.client_options, **options})
+            self.clients[wallet_address] = client
+        return client
+
+    def __getitem__(self, wallet_address) -> DYDX:
+        return self.clients[wallet_address]
+
+    def __len__(self):
+        return len(self.clients)
+
+    async def initialize(self):
+        """Connect the shared transport once, then load every wallet concurrently"""
+        await self.transport.connect()
+        await asyncio.gather(*(client.ensure_initialized_clients() for client in self.clients.values()))
+
+    async def aclose(self):
+        """Stop every wallet's feeds and close the shared connections"""
+        for client in self.clients.values():
+            await client.aclose()
+        await self.transport.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    def stats(self):
+        """Return the shared connection metrics and per wallet sequencer / rate limit metrics"""
+        return {
+            'stream': self.transport.stream.stats(),
+            'market_cache': self.transport.market_cache.stats(),
+            'indexer_rate_limit': self.transport.indexer_limiter.stats(),
+            'endpoints': self.transport.endpoint_stats(),
+            'wallets': {
+                address: {
+                    'sequencer': client.sequencer.stats() if client.sequencer is not None else None,
+                    'rate_limit': client.rate_limiter.stats(),
+                    'orders': len(client.order_store),
+                    'tracked_orders': len(client.order_tracker),
+                }
+                for address, client in self.clients.items()
+            },
+        }
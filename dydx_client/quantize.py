@@ -0,0 +1,163 @@
+import math
+from decimal import ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_EVEN, Decimal
+
+
+# Quote quantums (USDC) have 6 decimals
+QUOTE_QUANTUMS_ATOMIC_RESOLUTION = -6
+
+# Tolerance for float products landing just below a step boundary (e.g. 0.3 * 1e10 = 2999999999.9999995)
+_ROUNDING_EPSILON = 1e-9
+
+
+def price_rounding(side):
+    """
+    Rounding of a price to its tick that never makes it worse for the side: down for buys, up for sells.
+
+    Args:
+        side: 'BUY' / 'SELL' (any case) or the protobuf `Order.Side` value (1 = buy, 2 = sell)
+    """
+    return ROUND_CEILING if side == 2 or str(side).upper() == 'SELL' else ROUND_FLOOR
+
+
+def _round(steps, rounding):
+    """Round a float number of steps in the given direction, tolerating float error at step boundaries"""
+    if rounding == ROUND_FLOOR:
+        return math.floor(steps + _ROUNDING_EPSILON)
+    if rounding == ROUND_CEILING:
+        return math.ceil(steps - _ROUNDING_EPSILON)
+    return round(steps)
+
+
+class Quantizer:
+    """
+    Price -> subticks and size -> quantums conversion of a single market.
+
+    Built from the market's atomicResolution, quantumConversionExponent, stepBaseQuantums and subticksPerTick.
+    Sizes round down to a multiple of stepBaseQuantums, so an order never exceeds the requested size; prices
+    round to a multiple of subticksPerTick in the direction given, by default the one that never makes the price
+    worse for the side (`price_rounding`). A size or price that rounds to zero raises a ValueError rather than
+    becoming one step or tick, which would be an order nobody asked for. Floats use float arithmetic, Decimals and
+    strings are converted exactly. `quantums_array` / `subticks_array` convert a whole ladder with NumPy.
+    """
+
+    __slots__ = ('market_id', 'clob_pair_id', 'quantums_per_unit', 'step_base_quantums', 'subticks_per_unit',
+                 'subticks_per_tick', 'step_size', 'tick_size')
+
+    def __init__(self, market_id, clob_pair_id, atomic_resolution, quantum_conversion_exponent, step_base_quantums,
+                 subticks_per_tick):
+        self.market_id = market_id
+        self.clob_pair_id = int(clob_pair_id)
+        self.quantums_per_unit = 10.0 ** -int(atomic_resolution)
+        self.step_base_quantums = int(step_base_quantums)
+        self.subticks_per_unit = 10.0 ** (int(atomic_resolution) - int(quantum_conversion_exponent)
+                                          - QUOTE_QUANTUMS_ATOMIC_RESOLUTION)
+        self.subticks_per_tick = int(subticks_per_tick)
+        # exact step (base units) and tick (USD) sizes, matching the indexer's stepSize / tickSize
+        self.step_size = Decimal(self.step_base_quantums).scaleb(int(atomic_resolution))
+        self.tick_size = Decimal(self.subticks_per_tick).scaleb(-(int(atomic_resolution)
+                                                                   - int(quantum_conversion_exponent)
+                                                                   - QUOTE_QUANTUMS_ATOMIC_RESOLUTION))
+
+    @classmethod
+    def from_market(cls, market: dict):
+        """Build from an indexer perpetual market dict"""
+        return cls(
+            market['ticker'],
+            market['clobPairId'],
+            market['atomicResolution'],
+            market['quantumConversionExponent'],
+            market['stepBaseQuantums'],
+            market['subticksPerTick'],
+        )
+
+    def quantums(self, size, rounding=ROUND_FLOOR):
+        """Size in base units -> quantums, a multiple of stepBaseQuantums (ValueError when it rounds to zero)"""
+        if isinstance(size, (Decimal, str)):
+            steps = int((Decimal(size) / self.step_size).to_integral_value(rounding))
+        else:
+            steps = _round(float(size) * self.quantums_per_unit / self.step_base_quantums, rounding)
+        if steps < 1:
+            raise ValueError(f"Size {size} is below the {self.market_id} step size {self.step_size}")
+        return steps * self.step_base_quantums
+
+    def subticks(self, price, rounding=ROUND_FLOOR):
+        """Price in USD -> subticks, a multiple of subticksPerTick (ValueError when it rounds to zero)"""
+        if isinstance(price, (Decimal, str)):
+            ticks = int((Decimal(price) / self.tick_size).to_integral_value(rounding))
+        else:
+            ticks = _round(float(price) * self.subticks_per_unit / self.subticks_per_tick, rounding)
+        if ticks < 1:
+            raise ValueError(f"Price {price} is below the {self.market_id} tick size {self.tick_size}")
+        return ticks * self.subticks_per_tick
+
+    def size(self, quantums):
+        """Quantums -> size in base units, as an exact Decimal"""
+        return Decimal(int(quantums)) * self.step_size / self.step_base_quantums
+
+    def price(self, subticks):
+        """Subticks -> price in USD, as an exact Decimal"""
+        return Decimal(int(subticks)) * self.tick_size / self.subticks_per_tick
+
+    def round_size(self, size, rounding=ROUND_FLOOR):
+        """Size rounded to a valid order size, as an exact Decimal"""
+        return self.quantums(size, rounding) // self.step_base_quantums * self.step_size
+
+    def round_price(self, price, side=None, rounding=None):
+        """Price rounded to a valid order price for the side (to the nearest tick without one), as a Decimal"""
+        if rounding is None:
+            rounding = price_rounding(side) if side is not None else ROUND_HALF_EVEN
+        return self.subticks(price, rounding) // self.subticks_per_tick * self.tick_size
+
+    def quantums_array(self, sizes, rounding=ROUND_FLOOR):
+        """
+        Sizes in base units -> int64 array of quantums in one vectorized pass.
+
+        Args:
+            sizes: Array-like of sizes (floats; Decimals are converted to floats)
+            rounding: ROUND_FLOOR (default), ROUND_CEILING or ROUND_HALF_EVEN
+
+        Returns:
+            numpy.ndarray: Quantums, each a multiple of stepBaseQuantums
+
+        Raises:
+            ValueError: A size rounds to zero
+        """
+        return self._array(sizes, self.quantums_per_unit / self.step_base_quantums, self.step_base_quantums,
+                           rounding, 'Size', 'step size', self.step_size)
+
+    def subticks_array(self, prices, side=None, rounding=None):
+        """
+        Prices in USD -> int64 array of subticks in one vectorized pass.
+
+        Args:
+            prices: Array-like of prices (floats; Decimals are converted to floats)
+            side: Side of every order, selecting `price_rounding` (nearest tick when neither is given)
+            rounding: ROUND_FLOOR, ROUND_CEILING or ROUND_HALF_EVEN (overrides the side's rounding)
+
+        Returns:
+            numpy.ndarray: Subticks, each a multiple of subticksPerTick
+
+        Raises:
+            ValueError: A price rounds to zero
+        """
+        if rounding is None:
+            rounding = price_rounding(side) if side is not None else ROUND_HALF_EVEN
+        return self._array(prices, self.subticks_per_unit / self.subticks_per_tick, self.subticks_per_tick,
+                           rounding, 'Price', 'tick size', self.tick_size)
+
+    def _array(self, values, steps_per_unit, units_per_step, rounding, kind, step_name, step):
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        steps = values * steps_per_unit
+        if rounding == ROUND_FLOOR:
+            steps = np.floor(steps + _ROUNDING_EPSILON)
+        elif rounding == ROUND_CEILING:
+            steps = np.ceil(steps - _ROUNDING_EPSILON)
+        else:
+            steps = np.rint(steps)
+        steps = steps.astype(np.int64)
+        below = steps < 1
+        if below.any():
+            raise ValueError(f"{kind} {values[below][0]} is below the {self.market_id} {step_name} {step}")
+        return steps * units_per_step
@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from .errors import RateLimitExceeded
+
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Buckets each operation has to take a token from
+OPERATIONS = {
+    'short_term_order': ('short_term_orders', 'short_term_orders_and_cancels'),
+    'short_term_cancel': ('short_term_cancels', 'short_term_orders_and_cancels'),
+    'stateful_order': ('stateful_orders',),
+    'stateful_cancel': (),
+    'indexer': ('indexer',),
+}
+
+# `/dydxprotocol/clob/block_rate` config keys -> bucket names
+BLOCK_RATE_BUCKETS = {
+    'max_short_term_orders_per_n_blocks': 'short_term_orders',
+    'max_stateful_orders_per_n_blocks': 'stateful_orders',
+    'max_short_term_order_cancellations_per_n_blocks': 'short_term_cancels',
+    'max_short_term_orders_and_cancels_per_n_blocks': 'short_term_orders_and_cancels',
+}
+
+
+class TokenBucket:
+    """Token bucket holding up to `capacity` tokens, refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def available(self, count=1, now=None):
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= count
+
+    def consume(self, count=1):
+        self.tokens -= count
+
+    def delay(self, count=1):
+        """Seconds until `count` tokens are available"""
+        self._refill(time.monotonic())
+        missing = count - self.tokens
+        return max(missing / self.rate, 0.0) if self.rate else float('inf')
+
+
+class RateLimiter:
+    """
+    Client-side rate limiting scheduler.
+
+    Limits are named buckets, each made of one token bucket per window (e.g. 2 stateful orders per block and
+    20 per 100 blocks). An operation ('short_term_order', 'short_term_cancel', 'stateful_order', 'indexer')
+    must take a token from every bucket it maps to. Operations either wait in a priority queue until tokens
+    are available (higher priority first, so cancels overtake queued placements that share a bucket) or fail
+    fast with `RateLimitExceeded`. Buckets that were never configured do not limit anything.
+    """
+
+    def __init__(self, block_time=1.0, headroom=0.9, indexer_limit=None):
+        self.block_time = block_time
+        self.headroom = headroom
+        self._buckets = {}
+        self._waiters = []
+        self._counter = itertools.count()
+        self._timer = None
+
+        # Metrics
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+
+        if indexer_limit is not None:
+            self.configure('indexer', [indexer_limit])
+
+    def configure(self, name, windows):
+        """
+        Configure a bucket.
+
+        Args:
+            name (str): Bucket name (e.g. 'indexer')
+            windows (list): (limit, seconds) pairs, every window must have a token for an operation to proceed
+        """
+        self._buckets[name] = [TokenBucket(limit, limit / seconds) for limit, seconds in windows]
+
+    def configure_from_block_rate(self, response: dict):
+        """
+        Configure the order buckets from a `/dydxprotocol/clob/block_rate` response. Limits are scaled by
+        `headroom` (keeping at least 1 per window) and block windows converted to seconds with `block_time`.
+        """
+        config = response.get('block_rate_limit_config', response)
+        for key, name in BLOCK_RATE_BUCKETS.items():
+            windows = []
+            for window in config.get(key) or ():
+                limit = int(window['limit'])
+                if limit > 0:
+                    windows.append((max(1, int(limit * self.headroom)), int(window['num_blocks']) * self.block_time))
+            if windows:
+                self.configure(name, windows)
+
+    @property
+    def configured(self):
+        return list(self._buckets)
+
+    def _windows(self, operation):
+        return [bucket for name in OPERATIONS.get(operation, (operation,)) for bucket in self._buckets.get(name, ())]
+
+    def _names(self, operation):
+        return {name for name in OPERATIONS.get(operation, (operation,)) if name in self._buckets}
+
+    def _try_take(self, windows, count):
+        now = time.monotonic()
+        if all(bucket.available(count, now) for bucket in windows):
+            for bucket in windows:
+                bucket.consume(count)
+            return True
+        return False
+
+    def delay(self, operation, count=1):
+        """Seconds until `operation` could proceed (ignoring queued waiters)"""
+        return max((bucket.delay(count) for bucket in self._windows(operation)), default=0.0)
+
+    async def acquire(self, operation, count=1, priority=PRIORITY_NORMAL, wait=True):
+        """
+        Take `count` tokens for an operation.
+
+        Args:
+            operation (str): One of the OPERATIONS names
+            count (int): Number of tokens
+            priority (int): PRIORITY_HIGH / PRIORITY_NORMAL / PRIORITY_LOW (lower goes first)
+            wait (bool): Queue until tokens are available instead of raising `RateLimitExceeded`
+        """
+        windows = self._windows(operation)
+        if not windows:
+            return
+
+        if not self._waiters and self._try_take(windows, count):
+            self.granted += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), operation, count, future))
+        self._dispatch()
+        if future.done():
+            return
+
+        if not wait:
+            future.cancel()
+            self.rejected += 1
+            raise RateLimitExceeded(operation=operation, retry_after=self.delay(operation, count))
+
+        self.queued += 1
+        await future
+
+    def _dispatch(self):
+        # runs from the timer or from `acquire`: either way the scheduled run is replaced, so one timer is pending
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        blocked = set()
+        pending = []
+        while self._waiters:
+            entry = heapq.heappop(self._waiters)
+            priority, _, operation, count, future = entry
+            if future.done():
+                continue
+
+            names = self._names(operation)
+            # never let a lower priority waiter take tokens a blocked higher priority waiter is waiting for
+            if names & blocked or not self._try_take(self._windows(operation), count):
+                blocked |= names
+                pending.append(entry)
+                continue
+
+            self.granted += 1
+            future.set_result(None)
+
+        for entry in pending:
+            heapq.heappush(self._waiters, entry)
+
+        if pending:
+            delay = min(self.delay(operation, count) for _, _, operation, count, _ in pending)
+            self._timer = asyncio.get_running_loop().call_later(max(delay, 0.001), self._dispatch)
+
+    def stats(self):
+        """Return the scheduler metrics and current token levels"""
+        return {
+            'granted': self.granted,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'waiting': sum(1 for entry in self._waiters if not entry[-1].done()),
+            'tokens': {name: [bucket.tokens for bucket in buckets] for name, buckets in self._buckets.items()},
+        }
@@ -0,0 +1,367 @@
+import numpy as np
+
+from .order_store import FINAL_STATUSES
+from .quantize import QUOTE_QUANTUMS_ATOMIC_RESOLUTION
+
+
+# Categorical order fields, stored as their index in these tables (-1 for unknown values)
+SIDES = ('BUY', 'SELL')
+STATUSES = ('OPEN', 'FILLED', 'CANCELED', 'BEST_EFFORT_CANCELED', 'BEST_EFFORT_OPENED', 'UNTRIGGERED')
+ORDER_TYPES = ('LIMIT', 'MARKET', 'STOP_LIMIT', 'STOP_MARKET', 'TAKE_PROFIT', 'TAKE_PROFIT_MARKET')
+TIME_IN_FORCE = ('GTT', 'IOC', 'FOK', 'POST_ONLY')
+
+_CODES = {table: {value: code for code, value in enumerate(table)}
+          for table in (SIDES, STATUSES, ORDER_TYPES, TIME_IN_FORCE)}
+_FINAL_CODES = [_CODES[STATUSES][status] for status in FINAL_STATUSES]
+
+
+def _code(table, value):
+    return _CODES[table].get(value, -1)
+
+
+def _value(table, code):
+    return table[code] if code >= 0 else None
+
+
+def scaled_int(value, exponent):
+    """
+    Exact integer of a decimal string (or number) times 10**exponent, rounded half up, e.g. a size to quantums.
+
+    The digits are shifted as text, so '0.0003' at exponent 10 is exactly 3000000 (no float or Decimal
+    arithmetic).
+    """
+    text = str(value)
+    sign = 1
+    if text.startswith('-'):
+        sign, text = -1, text[1:]
+    if 'e' in text or 'E' in text:
+        # exponent notation only comes from floats, which are not exact anyway
+        return sign * round(float(text) * 10.0 ** exponent)
+
+    whole, _, fraction = text.partition('.')
+    digits = int(whole + fraction or '0')
+    shift = exponent - len(fraction)
+    if shift >= 0:
+        return sign * digits * 10 ** shift
+    divisor = 10 ** -shift
+    quotient, remainder = divmod(digits, divisor)
+    return sign * (quotient + (2 * remainder >= divisor))
+
+
+class MarketScale:
+    """
+    Size <-> quantums and price <-> subticks scales of one market (from its atomicResolution and
+    quantumConversionExponent), as exact powers of ten.
+    """
+
+    __slots__ = ('ticker', 'clob_pair_id', 'size_exponent', 'price_exponent')
+
+    def __init__(self, ticker, clob_pair_id, atomic_resolution, quantum_conversion_exponent):
+        self.ticker = ticker
+        self.clob_pair_id = int(clob_pair_id)
+        self.size_exponent = -int(atomic_resolution)
+        self.price_exponent = (int(atomic_resolution) - int(quantum_conversion_exponent)
+                               - QUOTE_QUANTUMS_ATOMIC_RESOLUTION)
+
+    @classmethod
+    def from_market(cls, market: dict):
+        """Build the scale of an indexer perpetual market dict"""
+        return cls(market['ticker'], market['clobPairId'], market['atomicResolution'],
+                   market['quantumConversionExponent'])
+
+    def quantums(self, size):
+        return scaled_int(size, self.size_exponent)
+
+    def subticks(self, price):
+        return scaled_int(price, self.price_exponent)
+
+    def size(self, quantums):
+        return quantums / 10.0 ** self.size_exponent
+
+    def price(self, subticks):
+        return subticks / 10.0 ** self.price_exponent
+
+
+class OrderRecord:
+    """
+    Typed order with its size, filled size and price as integer quantums / subticks.
+
+    Built from an indexer order dict (or an order store record, which already holds quantums and subticks);
+    `size`, `filled_size` and `price` convert back to base units / USD on access.
+    """
+
+    __slots__ = ('id', 'client_id', 'clob_pair_id', 'order_flags', 'subaccount_number', 'ticker', 'side', 'status',
+                 'type', 'time_in_force', 'reduce_only', 'post_only', 'quantums', 'filled_quantums', 'subticks',
+                 'good_til_block', 'good_til_block_time', 'updated_at_height', 'scale')
+
+    def __init__(self, id, client_id, clob_pair_id, order_flags, subaccount_number, ticker, side, status, type,
+                 time_in_force, reduce_only, post_only, quantums, filled_quantums, subticks, good_til_block=None,
+                 good_til_block_time=None, updated_at_height=None, scale: MarketScale = None):
+        self.id = id
+        self.client_id = client_id
+        self.clob_pair_id = clob_pair_id
+        self.order_flags = order_flags
+        self.subaccount_number = subaccount_number
+        self.ticker = ticker
+        self.side = side
+        self.status = status
+        self.type = type
+        self.time_in_force = time_in_force
+        self.reduce_only = reduce_only
+        self.post_only = post_only
+        self.quantums = quantums
+        self.filled_quantums = filled_quantums
+        self.subticks = subticks
+        self.good_til_block = good_til_block
+        self.good_til_block_time = good_til_block_time
+        self.updated_at_height = updated_at_height
+        self.scale = scale
+
+    @classmethod
+    def from_indexer(cls, order: dict, scale: MarketScale):
+        """Parse an indexer order dict with the scale of its market"""
+        quantums = order.get('quantums')
+        subticks = order.get('subticks')
+        filled = order.get('totalFilled')
+        good_til_block = order.get('goodTilBlock')
+        updated_at_height = order.get('updatedAtHeight')
+        return cls(
+            order.get('id'),
+            int(order['clientId']),
+            int(order['clobPairId']),
+            int(order['orderFlags']),
+            int(order.get('subaccountNumber') or 0),
+            scale.ticker,
+            order.get('side'),
+            order.get('status'),
+            order.get('type'),
+            order.get('timeInForce'),
+            bool(order.get('reduceOnly')),
+            bool(order.get('postOnly')),
+            int(quantums) if quantums is not None else scale.quantums(order['size']),
+            scale.quantums(filled) if filled is not None else 0,
+            int(subticks) if subticks is not None else scale.subticks(order['price']),
+            int(good_til_block) if good_til_block is not None else None,
+            order.get('goodTilBlockTime'),
+            int(updated_at_height) if updated_at_height is not None else None,
+            scale,
+        )
+
+    def __repr__(self):
+        return (f'OrderRecord({self.id}, {self.ticker}, {self.side} {self.size}@{self.price}, status={self.status}, '
+                f'filled={self.filled_size})')
+
+    @property
+    def size(self):
+        return self.scale.size(self.quantums)
+
+    @property
+    def filled_size(self):
+        return self.scale.size(self.filled_quantums)
+
+    @property
+    def remaining_quantums(self):
+        return self.quantums - self.filled_quantums
+
+    @property
+    def price(self):
+        return self.scale.price(self.subticks)
+
+    @property
+    def is_final(self):
+        return self.status in FINAL_STATUSES
+
+
+class PositionRecord:
+    """
+    Typed perpetual position with its signed size as integer quantums.
+
+    Entry / exit prices are volume weighted averages rather than order book prices, so they are kept as floats
+    like the PnL figures.
+    """
+
+    __slots__ = ('market', 'subaccount_number', 'status', 'quantums', 'max_quantums', 'entry_price', 'exit_price',
+                 'realized_pnl', 'unrealized_pnl', 'net_funding', 'created_at_height', 'scale')
+
+    def __init__(self, market, subaccount_number, status, quantums, max_quantums, entry_price, exit_price=None,
+                 realized_pnl=0.0, unrealized_pnl=0.0, net_funding=0.0, created_at_height=None,
+                 scale: MarketScale = None):
+        self.market = market
+        self.subaccount_number = subaccount_number
+        self.status = status
+        self.quantums = quantums
+        self.max_quantums = max_quantums
+        self.entry_price = entry_price
+        self.exit_price = exit_price
+        self.realized_pnl = realized_pnl
+        self.unrealized_pnl = unrealized_pnl
+        self.net_funding = net_funding
+        self.created_at_height = created_at_height
+        self.scale = scale
+
+    @classmethod
+    def from_indexer(cls, position: dict, scale: MarketScale):
+        """Parse an indexer perpetual position dict with the scale of its market"""
+        quantums = scale.quantums(position['size'])
+        # indexer sizes are unsigned for some responses and signed for others
+        if position.get('side') == 'SHORT' and quantums > 0:
+            quantums = -quantums
+        exit_price = position.get('exitPrice')
+        created_at_height = position.get('createdAtHeight')
+        return cls(
+            position['market'],
+            int(position.get('subaccountNumber') or 0),
+            position.get('status'),
+            quantums,
+            abs(scale.quantums(position.get('maxSize') or position['size'])),
+            float(position['entryPrice']),
+            float(exit_price) if exit_price is not None else None,
+            float(position.get('realizedPnl') or 0),
+            float(position.get('unrealizedPnl') or 0),
+            float(position.get('netFunding') or 0),
+            int(created_at_height) if created_at_height is not None else None,
+            scale,
+        )
+
+    def __repr__(self):
+        return f'PositionRecord({self.market}, size={self.size}, entry={self.entry_price}, status={self.status})'
+
+    @property
+    def size(self):
+        """Signed size in base units (negative for shorts)"""
+        return self.scale.size(self.quantums)
+
+    @property
+    def side(self):
+        return 'LONG' if self.quantums >= 0 else 'SHORT'
+
+
+class OrderRecordBatch:
+    """
+    Struct-of-arrays batch of orders: one NumPy column per numeric or categorical field, parsed in one pass.
+
+    Categorical fields (side, status, type, time in force) are small integer codes indexing `SIDES`, `STATUSES`,
+    `ORDER_TYPES` and `TIME_IN_FORCE`. Rows are materialized as `OrderRecord`s only when indexed or iterated.
+    """
+
+    COLUMNS = (
+        ('client_id', np.int64), ('clob_pair_id', np.int32), ('order_flags', np.int32),
+        ('subaccount_number', np.int32), ('side', np.int8), ('status', np.int8), ('type', np.int8),
+        ('time_in_force', np.int8), ('reduce_only', np.bool_), ('post_only', np.bool_), ('quantums', np.int64),
+        ('filled_quantums', np.int64), ('subticks', np.int64), ('good_til_block', np.int64),
+        ('updated_at_height', np.int64),
+    )
+
+    def __init__(self, ids, good_til_block_times, columns: dict, scales: dict):
+        self.ids = ids
+        self.good_til_block_times = good_til_block_times
+        self.columns = columns
+        # clob pair id -> MarketScale
+        self.scales = scales
+        for name, _ in self.COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def from_indexer(cls, orders, scales: dict):
+        """
+        Parse a list of indexer order dicts.
+
+        Args:
+            orders (list): Indexer order dicts (e.g. a `get_subaccount_orders` response)
+            scales (dict): Clob pair id (int) -> `MarketScale` of every market in the list
+
+        Returns:
+            OrderRecordBatch: The batch
+        """
+        count = len(orders)
+        row_scales = [scales[int(order['clobPairId'])] for order in orders]
+
+        def column(dtype, values):
+            return np.fromiter(values, dtype=dtype, count=count)
+
+        def codes(table, field):
+            table_codes = _CODES[table]
+            return column(np.int8, (table_codes.get(order.get(field), -1) for order in orders))
+
+        def optional_int(field):
+            return column(np.int64, (int(order.get(field) or 0) for order in orders))
+
+        # every column is filled by one pass over the dicts, no per order objects are built
+        columns = {
+            'client_id': column(np.int64, (int(order['clientId']) for order in orders)),
+            'clob_pair_id': column(np.int32, (scale.clob_pair_id for scale in row_scales)),
+            'order_flags': column(np.int32, (int(order['orderFlags']) for order in orders)),
+            'subaccount_number': column(np.int32, (int(order.get('subaccountNumber') or 0) for order in orders)),
+            'side': codes(SIDES, 'side'),
+            'status': codes(STATUSES, 'status'),
+            'type': codes(ORDER_TYPES, 'type'),
+            'time_in_force': codes(TIME_IN_FORCE, 'timeInForce'),
+            'reduce_only': column(np.bool_, (bool(order.get('reduceOnly')) for order in orders)),
+            'post_only': column(np.bool_, (bool(order.get('postOnly')) for order in orders)),
+            'quantums': column(np.int64, (
+                int(order['quantums']) if order.get('quantums') is not None else scale.quantums(order['size'])
+                for order, scale in zip(orders, row_scales)
+            )),
+            'filled_quantums': column(np.int64, (
+                scale.quantums(order['totalFilled']) if order.get('totalFilled') is not None else 0
+                for order, scale in zip(orders, row_scales)
+            )),
+            'subticks': column(np.int64, (
+                int(order['subticks']) if order.get('subticks') is not None else scale.subticks(order['price'])
+                for order, scale in zip(orders, row_scales)
+            )),
+            'good_til_block': optional_int('goodTilBlock'),
+            'updated_at_height': optional_int('updatedAtHeight'),
+        }
+        ids = [order.get('id') for order in orders]
+        good_til_block_times = [order.get('goodTilBlockTime') for order in orders]
+        return cls(ids, good_til_block_times, columns, scales)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index) -> OrderRecord:
+        columns = self.columns
+        clob_pair_id = int(columns['clob_pair_id'][index])
+        scale = self.scales[clob_pair_id]
+        good_til_block = int(columns['good_til_block'][index])
+        return OrderRecord(
+            self.ids[index],
+            int(columns['client_id'][index]),
+            clob_pair_id,
+            int(columns['order_flags'][index]),
+            int(columns['subaccount_number'][index]),
+            scale.ticker,
+            _value(SIDES, columns['side'][index]),
+            _value(STATUSES, columns['status'][index]),
+            _value(ORDER_TYPES, columns['type'][index]),
+            _value(TIME_IN_FORCE, columns['time_in_force'][index]),
+            bool(columns['reduce_only'][index]),
+            bool(columns['post_only'][index]),
+            int(columns['quantums'][index]),
+            int(columns['filled_quantums'][index]),
+            int(columns['subticks'][index]),
+            good_til_block or None,
+            self.good_til_block_times[index],
+            int(columns['updated_at_height'][index]) or None,
+            scale,
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def status_mask(self, *statuses):
+        """Boolean mask of the orders with one of the given statuses"""
+        return np.isin(self.status, [_code(STATUSES, status) for status in statuses])
+
+    def open_mask(self):
+        """Boolean mask of the orders that are not in a final state"""
+        return ~np.isin(self.status, _FINAL_CODES)
+
+    def remaining_quantums(self):
+        return self.quantums - self.filled_quantums
+
+    def nbytes(self):
+        """Memory held by the numeric columns"""
+        return sum(column.nbytes for column in self.columns.values())
@@ -0,0 +1,246 @@
+import numpy as np
+
+
+class RiskEngine:
+    """
+    Vectorized position and margin risk over one or more subaccounts.
+
+    Every open perpetual position is one row of a set of NumPy columns (signed size, entry price, oracle
+    price, initial/maintenance margin fraction) and every subaccount keeps its quote (USDC) balance and running
+    totals of position value and margin requirements. Account-wide figures and per-position liquidation prices
+    are computed in single vectorized passes; price and position updates only touch the affected rows and
+    adjust the subaccount totals by their deltas.
+    """
+
+    def __init__(self):
+        self.subaccounts = []
+        self.markets = []
+        self.quote_balance = np.zeros(0)
+        self._subaccount_index = {}
+        self._rows = {}
+        self._market_rows = {}
+
+        self.row_subaccount = np.zeros(0, dtype=np.int64)
+        self.size = np.zeros(0)
+        self.entry_price = np.zeros(0)
+        self.oracle_price = np.zeros(0)
+        self.imf = np.zeros(0)
+        self.mmf = np.zeros(0)
+
+        self.total_value = np.zeros(0)
+        self.total_imr = np.zeros(0)
+        self.total_mmr = np.zeros(0)
+
+    @classmethod
+    def from_subaccounts(cls, subaccounts, markets):
+        """
+        Build an engine from indexer data.
+
+        Args:
+            subaccounts (list): Indexer subaccount dicts (`get_subaccount(...)['subaccount']`) with
+                                'subaccountNumber', 'assetPositions' and 'openPerpetualPositions'
+            markets (dict): Market ticker -> indexer market dict (oraclePrice, initial/maintenanceMarginFraction)
+
+        Returns:
+            RiskEngine: The loaded engine
+        """
+        engine = cls()
+        rows = []
+        for subaccount in subaccounts:
+            number = int(subaccount['subaccountNumber'])
+            usdc = (subaccount.get('assetPositions') or {}).get('USDC')
+            quote = 0.0
+            if usdc:
+                quote = float(usdc['size']) if usdc.get('side', 'LONG') == 'LONG' else -float(usdc['size'])
+            engine._add_subaccount(number, quote)
+
+            for market_id, position in (subaccount.get('openPerpetualPositions') or {}).items():
+                market = markets[market_id]
+                size = float(position['size'])
+                # indexer sizes are unsigned for some responses and signed for others
+                if position.get('side') == 'SHORT' and size > 0:
+                    size = -size
+                rows.append((number, market_id, size, float(position['entryPrice']), float(market['oraclePrice']),
+                             float(market['initialMarginFraction']), float(market['maintenanceMarginFraction'])))
+
+        engine._load_rows(rows)
+        return engine
+
+    def _add_subaccount(self, number, quote_balance=0.0):
+        if number in self._subaccount_index:
+            return self._subaccount_index[number]
+        index = len(self.subaccounts)
+        self._subaccount_index[number] = index
+        self.subaccounts.append(number)
+        self.quote_balance = np.append(self.quote_balance, quote_balance)
+        self.total_value = np.append(self.total_value, 0.0)
+        self.total_imr = np.append(self.total_imr, 0.0)
+        self.total_mmr = np.append(self.total_mmr, 0.0)
+        return index
+
+    def _load_rows(self, rows):
+        self.markets = [row[1] for row in rows]
+        self._rows = {(row[0], row[1]): index for index, row in enumerate(rows)}
+        self._market_rows = {}
+        for index, row in enumerate(rows):
+            self._market_rows.setdefault(row[1], []).append(index)
+        self._market_rows = {market_id: np.array(indexes) for market_id, indexes in self._market_rows.items()}
+
+        self.row_subaccount = np.array([self._subaccount_index[row[0]] for row in rows], dtype=np.int64)
+        self.size = np.array([row[2] for row in rows], dtype=np.float64)
+        self.entry_price = np.array([row[3] for row in rows], dtype=np.float64)
+        self.oracle_price = np.array([row[4] for row in rows], dtype=np.float64)
+        self.imf = np.array([row[5] for row in rows], dtype=np.float64)
+        self.mmf = np.array([row[6] for row in rows], dtype=np.float64)
+        self._recompute_totals()
+
+    def _recompute_totals(self):
+        count = len(self.subaccounts)
+        notional = np.abs(self.size) * self.oracle_price
+        self.total_value = np.bincount(self.row_subaccount, self.size * self.oracle_price, minlength=count)
+        self.total_imr = np.bincount(self.row_subaccount, notional * self.imf, minlength=count)
+        self.total_mmr = np.bincount(self.row_subaccount, notional * self.mmf, minlength=count)
+
+    # Incremental updates
+
+    def update_price(self, market_id, price):
+        """Update the oracle price of a market, adjusting only its rows and their subaccount totals"""
+        rows = self._market_rows.get(market_id)
+        if rows is None:
+            return
+        delta = float(price) - self.oracle_price[rows]
+        self.oracle_price[rows] = float(price)
+        subaccounts = self.row_subaccount[rows]
+        np.add.at(self.total_value, subaccounts, self.size[rows] * delta)
+        np.add.at(self.total_imr, subaccounts, np.abs(self.size[rows]) * delta * self.imf[rows])
+        np.add.at(self.total_mmr, subaccounts, np.abs(self.size[rows]) * delta * self.mmf[rows])
+
+    def update_prices(self, prices: dict):
+        """Update the oracle prices of several markets ({ticker: price})"""
+        for market_id, price in prices.items():
+            self.update_price(market_id, price)
+
+    def update_quote_balance(self, subaccount_number, quote_balance):
+        self.quote_balance[self._add_subaccount(int(subaccount_number))] = float(quote_balance)
+
+    def update_position(self, subaccount_number, market_id, size, entry_price, market=None, fill_price=None,
+                        fee=0.0):
+        """
+        Set the signed size and entry price of a position (size 0 closes it).
+
+        When the change comes from a fill, pass its price and fee: the subaccount's quote balance is charged the
+        notional of the size change (credited when selling) plus the fee, as the chain settles it.
+
+        Args:
+            market (dict): Indexer market dict, required when the position is new to the engine
+            fill_price (float): Price the size change was filled at (None leaves the quote balance as is, e.g.
+                                when setting a position from a reload)
+            fee (float): Quote fee paid for the fill (negative for a rebate)
+        """
+        key = (int(subaccount_number), market_id)
+        index = self._rows.get(key)
+        previous_size = self.size[index] if index is not None else 0.0
+        if fill_price is not None:
+            subaccount = self._add_subaccount(key[0])
+            self.quote_balance[subaccount] -= (float(size) - previous_size) * float(fill_price) + float(fee)
+        if index is None:
+            if not size:
+                return
+            if market is None:
+                raise KeyError(f"Market data required for new position {market_id}")
+            self._add_subaccount(key[0])
+            rows = self._rows_list()
+            rows.append((key[0], market_id, float(size), float(entry_price), float(market['oraclePrice']),
+                         float(market['initialMarginFraction']), float(market['maintenanceMarginFraction'])))
+            self._load_rows(rows)
+            return
+
+        subaccount = self.row_subaccount[index]
+        price = self.oracle_price[index]
+        delta_abs = abs(float(size)) - abs(self.size[index])
+        self.total_value[subaccount] += (float(size) - self.size[index]) * price
+        self.total_imr[subaccount] += delta_abs * price * self.imf[index]
+        self.total_mmr[subaccount] += delta_abs * price * self.mmf[index]
+        self.size[index] = float(size)
+        self.entry_price[index] = float(entry_price)
+
+    def _rows_list(self):
+        return [(self.subaccounts[self.row_subaccount[index]], self.markets[index], self.size[index],
+                 self.entry_price[index], self.oracle_price[index], self.imf[index], self.mmf[index])
+                for index in range(len(self.markets))]
+
+    # Vectorized figures
+
+    @property
+    def equity(self):
+        """Per subaccount equity (quote balance + signed position value)"""
+        return self.quote_balance + self.total_value
+
+    @property
+    def free_collateral(self):
+        """Per subaccount free collateral (equity - initial margin requirement)"""
+        return self.equity - self.total_imr
+
+    @property
+    def margin_usage(self):
+        """Per subaccount initial margin requirement / equity"""
+        equity = self.equity
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(equity > 0, self.total_imr / equity, np.inf)
+
+    def notional(self):
+        return np.abs(self.size) * self.oracle_price
+
+    def unrealized_pnl(self):
+        return self.size * (self.oracle_price - self.entry_price)
+
+    def liquidation_prices(self):
+        """
+        Per position oracle price at which its subaccount would reach its maintenance margin requirement,
+        holding every other market's price constant (nan when unreachable or for flat positions).
+        """
+        subaccount = self.row_subaccount
+        buffer = (self.equity - self.total_mmr)[subaccount]
+        sensitivity = self.size - np.abs(self.size) * self.mmf
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prices = self.oracle_price - buffer / sensitivity
+        return np.where((sensitivity != 0) & (prices > 0), prices, np.nan)
+
+    def liquidation_distance(self):
+        """Relative distance from the oracle price to the liquidation price per position"""
+        return np.abs(self.liquidation_prices() - self.oracle_price) / self.oracle_price
+
+    def summary(self):
+        """Return the account-wide figures per subaccount"""
+        equity = self.equity
+        free_collateral = self.free_collateral
+        margin_usage = self.margin_usage
+        return {
+            number: {
+                'equity': float(equity[index]),
+                'freeCollateral': float(free_collateral[index]),
+                'initialMarginRequirement': float(self.total_imr[index]),
+                'maintenanceMarginRequirement': float(self.total_mmr[index]),
+                'marginUsage': float(margin_usage[index]),
+            }
+            for number, index in self._subaccount_index.items()
+        }
+
+    def positions(self):
+        """Return per-position figures as a list of dicts"""
+        notional = self.notional()
+        pnl = self.unrealized_pnl()
+        liquidation = self.liquidation_prices()
+        return [
+            {
+                'subaccountNumber': self.subaccounts[self.row_subaccount[index]],
+                'market': market_id,
+                'size': float(self.size[index]),
+                'entryPrice': float(self.entry_price[index]),
+                'oraclePrice': float(self.oracle_price[index]),
+                'notional': float(notional[index]),
+                'unrealizedPnl': float(pnl[index]),
+                'liquidationPrice': float(liquidation[index]),
+            }
+            for index, market_id in enumerate(self.markets)
+        ]
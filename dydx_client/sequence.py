@@ -0,0 +1,191 @@
+import asyncio
+import re
+import time
+from typing import TYPE_CHECKING
+
+from .errors import SequenceMismatch, tx_error
+from .instrumentation import NULL_METRICS, error_code
+from .signing import Broadcaster, OrderSigner, SignedTx
+
+if TYPE_CHECKING:
+    from dydx_v4_client.wallet import Wallet
+
+
+_EXPECTED_SEQUENCE = re.compile(r'expected (\d+)')
+
+
+class WalletSequencer:
+    """
+    Local account sequence manager for a single wallet.
+
+    Sequence numbers are reserved synchronously (there is no await between reading and incrementing the
+    counter), so concurrent coroutines never sign two stateful transactions with the same sequence and up to
+    `max_in_flight` signed transactions can be awaiting their broadcast at once.
+
+    Short-term order messages (place/cancel with good_til_block) are not sequence checked or incremented by
+    the dYdX chain, so they are signed with the current sequence without reserving a new one.
+
+    When the node answers with an account sequence mismatch the counter is resynced (from the expected value
+    in the raw log, or from the node) and the transaction is re-signed and re-broadcast. Other rejections whose
+    mapped error is `retryable` (a full mempool, the block rate limit) are re-broadcast after the error's
+    `backoff_hint`, up to `max_retries` times.
+
+    Signing (`presign`) and broadcasting (`broadcast_signed`) are separate steps, so transactions can be signed
+    ahead of a trigger and only sent when needed.
+    """
+
+    def __init__(self, node_client, wallet: 'Wallet', max_in_flight=32, max_resyncs=2, max_retries=2, signer=None,
+                 broadcaster=None, metrics=NULL_METRICS):
+        self.node_client = node_client
+        self.metrics = metrics
+        self.wallet = wallet
+        self.signer = signer or OrderSigner.from_wallet(wallet, node_client.builder)
+        # Fails over between nodes when the node client is a FailoverClient
+        self.broadcaster = broadcaster or Broadcaster(node_client.channel,
+                                                      endpoints=getattr(node_client, 'endpoints', None))
+        self.max_resyncs = max_resyncs
+        self.max_retries = max_retries
+        self._next_sequence = wallet.sequence
+        self._epoch = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._resync_lock = asyncio.Lock()
+
+        # Metrics
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.broadcasts = 0
+        self.mismatches = 0
+        self.resyncs = 0
+        self.retries = 0
+
+    @property
+    def next_sequence(self):
+        return self._next_sequence
+
+    def reserve(self, stateful=True):
+        """
+        Reserve the sequence number to sign the next transaction with.
+
+        Returns:
+            tuple: (sequence, epoch) where epoch identifies the resync generation the sequence belongs to
+        """
+        sequence = self._next_sequence
+        if stateful:
+            self._next_sequence += 1
+            self.wallet.sequence = self._next_sequence
+        return sequence, self._epoch
+
+    def presign(self, *messages, stateful=True):
+        """
+        Reserve a sequence and sign the messages into a single transaction without broadcasting it.
+
+        Returns:
+            SignedTx: The signed transaction, to be passed to `broadcast_signed`
+        """
+        with self.metrics.span('sign'):
+            sequence, epoch = self.reserve(stateful)
+            return SignedTx(messages, stateful, sequence, epoch, self.signer.sign(messages, sequence))
+
+    async def resync(self, epoch=None, raw_log=None):
+        """
+        Resync the local sequence counter with the chain.
+
+        Args:
+            epoch (int): Resync generation observed by the caller. If another coroutine already resynced since
+                         then, this call is a no-op.
+            raw_log (str): Raw log of the rejected transaction, used to read the expected sequence directly
+        """
+        async with self._resync_lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+
+            expected = _EXPECTED_SEQUENCE.search(raw_log) if raw_log else None
+            if expected:
+                sequence = int(expected.group(1))
+            else:
+                account = await self.node_client.get_account(self.wallet.address)
+                sequence = account.sequence
+
+            self._next_sequence = sequence
+            self.wallet.sequence = sequence
+            self._epoch += 1
+            self.resyncs += 1
+
+    async def broadcast(self, *messages, stateful=True):
+        """
+        Sign the messages with a locally reserved sequence and broadcast them in a single transaction.
+
+        Args:
+            messages: Protobuf messages to include in the transaction (e.g. MsgPlaceOrder)
+            stateful (bool): Whether the transaction consumes an account sequence (long-term orders, transfers)
+
+        Returns:
+            The response from the transaction broadcast.
+        """
+        return await self.broadcast_signed(self.presign(*messages, stateful=stateful))
+
+    async def broadcast_signed(self, signed: SignedTx, resign=True):
+        """
+        Broadcast a transaction signed by `presign`, re-signing it with a resynced sequence on a mismatch.
+
+        Args:
+            signed (SignedTx): The signed transaction
+            resign (bool): Re-sign and re-send on a sequence mismatch (False: only resync and return the rejection,
+                           for a transaction that must not land unless the one signed before it did)
+
+        Returns:
+            The response from the transaction broadcast (rejections are returned, map them with `tx_error`).
+        """
+        metrics = self.metrics
+        async with self._slots:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                attempt = retries = 0
+                while True:
+                    started = time.perf_counter()
+                    with metrics.span('broadcast'):
+                        try:
+                            response = await self.broadcaster.broadcast(signed.tx_bytes)
+                        except Exception as e:
+                            metrics.record_call('grpc', 'BroadcastTx', time.perf_counter() - started, error_code(e))
+                            raise
+                    self.broadcasts += 1
+
+                    tx_response = response.tx_response
+                    metrics.record_call('grpc', 'BroadcastTx', time.perf_counter() - started, tx_response.code)
+                    error = tx_error(tx_response)
+                    if error is None or not error.retryable:
+                        return response
+
+                    if isinstance(error, SequenceMismatch):
+                        self.mismatches += 1
+                        if attempt >= self.max_resyncs:
+                            return response
+                        attempt += 1
+                        await self.resync(signed.epoch, tx_response.raw_log)
+                        if not resign:
+                            return response
+                        signed = self.presign(*signed.messages, stateful=signed.stateful)
+                        continue
+
+                    # e.g. a full mempool or the block rate limit: the same transaction can be sent again later
+                    if retries >= self.max_retries:
+                        return response
+                    retries += 1
+                    self.retries += 1
+                    await asyncio.sleep(error.backoff_hint or 0)
+            finally:
+                self.in_flight -= 1
+
+    def stats(self):
+        """Return the sequencer metrics"""
+        return {
+            'next_sequence': self._next_sequence,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'broadcasts': self.broadcasts,
+            'mismatches': self.mismatches,
+            'resyncs': self.resyncs,
+            'retries': self.retries,
+        }
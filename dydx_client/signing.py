@@ -0,0 +1,273 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Tuple
+
+from google.protobuf.any_pb2 import Any as AnyMessage
+from v4_proto.cosmos.crypto.secp256k1.keys_pb2 import PubKey
+from v4_proto.cosmos.tx.signing.v1beta1.signing_pb2 import SignMode
+from v4_proto.cosmos.tx.v1beta1.service_pb2 import BroadcastMode, BroadcastTxRequest
+from v4_proto.cosmos.tx.v1beta1.tx_pb2 import AuthInfo, Fee, ModeInfo, SignDoc, SignerInfo, TxBody, TxRaw
+from v4_proto.dydxprotocol.clob.order_pb2 import Order, OrderId
+from v4_proto.dydxprotocol.subaccounts.subaccount_pb2 import SubaccountId
+
+from dydx_v4_client.node.message import PY_V2_CLIENT_ID
+
+from .endpoints import EndpointSet, retry_delay
+from .errors import map_exception
+from .quantize import Quantizer, price_rounding
+
+
+# Same fee as dydx_v4_client.node.builder.DEFAULT_FEE (the builder module pulls in the whole wallet stack)
+DEFAULT_FEE = Fee(amount=[], gas_limit=1000000)
+
+
+def pack_any(message):
+    packed = AnyMessage()
+    packed.Pack(message, type_url_prefix="/")
+    return packed
+
+
+class OrderTemplate(Quantizer):
+    """
+    Precompiled order construction parameters of a single market.
+
+    A `Quantizer` (the size -> quantums and price -> subticks conversion factors of the market) with the clob
+    pair id and cached subaccount ids, so protobuf orders can be built with plain float/int arithmetic (no
+    `Market` wrapper or Decimal conversions).
+    """
+
+    __slots__ = ('_subaccounts',)
+
+    def __init__(self, market_id, clob_pair_id, atomic_resolution, quantum_conversion_exponent, step_base_quantums,
+                 subticks_per_tick):
+        super().__init__(market_id, clob_pair_id, atomic_resolution, quantum_conversion_exponent,
+                         step_base_quantums, subticks_per_tick)
+        self._subaccounts = {}
+
+    def subaccount(self, owner, number):
+        key = (owner, number)
+        subaccount = self._subaccounts.get(key)
+        if subaccount is None:
+            subaccount = self._subaccounts[key] = SubaccountId(owner=owner, number=number)
+        return subaccount
+
+    def order_id(self, owner, subaccount_number, client_id, order_flags):
+        return OrderId(
+            subaccount_id=self.subaccount(owner, subaccount_number),
+            client_id=client_id,
+            order_flags=order_flags,
+            clob_pair_id=self.clob_pair_id,
+        )
+
+    def order(self, order_id, side, size, price, time_in_force, reduce_only=False, good_til_block=None,
+              good_til_block_time=None):
+        """
+        Build a protobuf Order (size/price in human units, converted with the precompiled factors; the price
+        rounds to a tick that is not worse for the side)
+        """
+        return Order(
+            order_id=order_id,
+            side=side,
+            quantums=self.quantums(size),
+            subticks=self.subticks(price, price_rounding(side)),
+            good_til_block=good_til_block,
+            good_til_block_time=good_til_block_time,
+            time_in_force=time_in_force,
+            reduce_only=reduce_only,
+            client_metadata=PY_V2_CLIENT_ID,
+        )
+
+    def orders(self, order_ids, side, sizes, prices, time_in_force, reduce_only=False, good_til_block=None,
+               good_til_block_time=None):
+        """
+        Build one protobuf Order per level of a ladder (e.g. a grid), converting every size and price in one
+        vectorized pass.
+
+        Args:
+            order_ids (list): One OrderId per level
+            side: The protobuf `Order.Side` of every level
+            sizes: Sizes in base units (array-like, one per level)
+            prices: Prices in USD (array-like, one per level)
+
+        Returns:
+            list: The protobuf Orders
+        """
+        quantums = self.quantums_array(sizes).tolist()
+        subticks = self.subticks_array(prices, side).tolist()
+        return [
+            Order(
+                order_id=order_id,
+                side=side,
+                quantums=level_quantums,
+                subticks=level_subticks,
+                good_til_block=good_til_block,
+                good_til_block_time=good_til_block_time,
+                time_in_force=time_in_force,
+                reduce_only=reduce_only,
+                client_metadata=PY_V2_CLIENT_ID,
+            )
+            for order_id, level_quantums, level_subticks in zip(order_ids, quantums, subticks)
+        ]
+
+
+@dataclass
+class SignedTx:
+    """A signed transaction ready to be broadcast, with what is needed to re-sign it after a sequence resync"""
+
+    messages: Tuple[Any, ...]
+    stateful: bool
+    sequence: int
+    epoch: int
+    tx_bytes: bytes = field(repr=False)
+
+
+class OrderSigner:
+    """
+    Local transaction signer for a single account.
+
+    The public key `Any`, sign mode and fee are built once; signing a transaction only serializes the body and
+    auth info for the given sequence and signs the SignDoc with the cached `KeyPair`. The result is the raw
+    TxRaw bytes expected by the node's broadcast endpoint.
+    """
+
+    def __init__(self, key_pair, account_number, chain_id, memo="", fee=DEFAULT_FEE):
+        self.key_pair = key_pair
+        self.account_number = account_number
+        self.chain_id = chain_id
+        self.memo = memo
+        self.fee = fee
+        self._public_key = pack_any(PubKey(key=key_pair.public_key_bytes))
+        self._mode_info = ModeInfo(single=ModeInfo.Single(mode=SignMode.SIGN_MODE_DIRECT))
+
+    @classmethod
+    def from_wallet(cls, wallet, builder):
+        """Build a signer from a dydx_v4_client Wallet and the node client's Builder"""
+        return cls(wallet.key, wallet.account_number, builder.chain_id, memo=builder.memo)
+
+    def sign(self, messages, sequence):
+        """
+        Sign the messages with an explicit sequence number.
+
+        Returns:
+            bytes: The serialized TxRaw
+        """
+        body_bytes = TxBody(messages=[pack_any(message) for message in messages], memo=self.memo).SerializeToString()
+        auth_info_bytes = AuthInfo(
+            signer_infos=[SignerInfo(public_key=self._public_key, mode_info=self._mode_info, sequence=sequence)],
+            fee=self.fee,
+        ).SerializeToString()
+        sign_doc = SignDoc(
+            body_bytes=body_bytes,
+            auth_info_bytes=auth_info_bytes,
+            account_number=self.account_number,
+            chain_id=self.chain_id,
+        )
+        signature = self.key_pair.sign(sign_doc.SerializeToString())
+        return TxRaw(body_bytes=body_bytes, auth_info_bytes=auth_info_bytes, signatures=[signature]).SerializeToString()
+
+
+class Broadcaster:
+    """
+    Broadcasts already signed transaction bytes to a node.
+
+    The node client's gRPC channel is synchronous, so calls are started with the stub's non-blocking `future`
+    API and awaited through an asyncio future. Starting a call does not block, so transactions leave in the
+    order they were signed (which the node's sequence check requires) while several are in flight.
+
+    A broadcast failing at the transport level (node unavailable, deadline exceeded) is retried by sending the
+    identical signed bytes again, on the next best node when an `EndpointSet` of nodes is given. Re-sending the
+    same bytes cannot execute a transaction twice: its sequence (for short-term orders, its order id) makes a
+    duplicate fail, and a duplicate answered with `errors.TX_IN_MEMPOOL_CODE` means an earlier attempt got through.
+    Failures are raised as their mapped `DydxError` (e.g. `NetworkError`).
+    Transactions are never re-signed here (the sequencer does that on a sequence mismatch), and every
+    broadcast goes to the same node until it fails, so consecutive sequences reach one mempool in order.
+    Broadcasts are never hedged.
+    """
+
+    def __init__(self, channel, mode=BroadcastMode.BROADCAST_MODE_SYNC, endpoints: EndpointSet = None, retries=2,
+                 timeout=10.0):
+        """
+        Args:
+            channel: gRPC channel of the node (unused when `endpoints` are given)
+            mode: Broadcast mode
+            endpoints (EndpointSet): Nodes to fail over between (their clients must have a `channel`)
+            retries (int): Re-sends of a transaction after a transport failure
+            timeout (float): Deadline of a single broadcast in seconds
+        """
+        # grpc is only needed once connected
+        from v4_proto.cosmos.tx.v1beta1 import service_pb2_grpc
+
+        self.mode = mode
+        self.endpoints = endpoints
+        self.retries = retries
+        self.timeout = timeout
+        self._stub_class = service_pb2_grpc.ServiceStub
+        self._stubs = {}
+        self._stub = self._stub_class(channel) if endpoints is None else None
+        self._endpoint = endpoints.best() if endpoints is not None else None
+
+        # Metrics
+        self.resends = 0
+        self.failovers = 0
+
+    def _stub_for(self, endpoint):
+        if endpoint is None:
+            return self._stub
+        stub = self._stubs.get(endpoint.url)
+        if stub is None:
+            stub = self._stubs[endpoint.url] = self._stub_class(endpoint.client.channel)
+        return stub
+
+    async def _send(self, stub, request):
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        call = stub.BroadcastTx.future(request, timeout=self.timeout)
+        call.add_done_callback(lambda done: loop.call_soon_threadsafe(_resolve, result, done))
+        try:
+            return await result
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+
+    async def broadcast(self, tx_bytes: bytes):
+        request = BroadcastTxRequest(tx_bytes=tx_bytes, mode=self.mode)
+        delay = 0.05
+        for attempt in range(self.retries + 1):
+            endpoint = self._endpoint
+            started = time.perf_counter()
+            try:
+                response = await self._send(self._stub_for(endpoint), request)
+            except Exception as e:
+                wait = retry_delay(e, delay)
+                if endpoint is not None:
+                    self.endpoints.record(endpoint, time.perf_counter() - started, ok=wait is None)
+                if attempt >= self.retries or wait is None:
+                    error = map_exception(e)
+                    if error is None:
+                        raise
+                    raise error from e
+
+                self.resends += 1
+                if endpoint is not None and len(self.endpoints) > 1:
+                    # Move every later broadcast to the next best node as well
+                    self.failovers += 1
+                    self._endpoint = self.endpoints.best(exclude=[endpoint])
+                else:
+                    await asyncio.sleep(wait)
+                    delay *= 2
+                continue
+
+            if endpoint is not None:
+                self.endpoints.record(endpoint, time.perf_counter() - started)
+            return response
+
+
+def _resolve(result, call):
+    if result.done():
+        return
+    exception = call.exception()
+    if exception is not None:
+        result.set_exception(exception)
+    else:
+        result.set_result(call.result())
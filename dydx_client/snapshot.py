@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import time
+
+from .fastjson import dumps, loads
+
+
+# Bumped when the layout of stored values changes; a file written with another schema is discarded
+SCHEMA_VERSION = 1
+
+
+class SnapshotEntry:
+    """A stored value with its version (incremented by every save) and wall clock save time"""
+
+    __slots__ = ('value', 'version', 'saved_at')
+
+    def __init__(self, value, version, saved_at):
+        self.value = value
+        self.version = version
+        self.saved_at = saved_at
+
+    @property
+    def age(self):
+        """Seconds since the entry was saved"""
+        return time.time() - self.saved_at
+
+    def __repr__(self):
+        return f'SnapshotEntry(version={self.version}, age={self.age:.1f})'
+
+
+class SnapshotStore:
+    """
+    Key -> JSON value store in a SQLite file, for restoring client state (markets, protocol parameters, open
+    orders, positions) on a restart before anything has been fetched.
+
+    Every entry is read into memory once, on first access, so reads never touch the file. Saves update the
+    in-memory entry right away and are only written out by `flush`, one transaction for everything saved since
+    the last flush (`DYDX` flushes shortly after a refresh and on close), so frequent refreshes of the same key
+    cost one write. Each entry carries a version that increments on every save and its save time, from which
+    readers judge staleness.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self._connection = None
+        self._entries = None
+        self._pending = set()
+        self.flushes = 0
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            if connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                connection.execute('DROP TABLE IF EXISTS snapshot')
+                connection.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS snapshot '
+                '(key TEXT PRIMARY KEY, version INTEGER NOT NULL, saved_at REAL NOT NULL, value TEXT NOT NULL)'
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _load(self):
+        if self._entries is None:
+            rows = self._connect().execute('SELECT key, version, saved_at, value FROM snapshot').fetchall()
+            self._entries = {key: SnapshotEntry(loads(value), version, saved_at)
+                             for key, version, saved_at, value in rows}
+        return self._entries
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __len__(self):
+        return len(self._load())
+
+    def get(self, key, max_age: float = None):
+        """
+        Return a stored entry.
+
+        Args:
+            key (str): The entry key
+            max_age (float): Treat entries saved longer than this many seconds ago as missing
+
+        Returns:
+            SnapshotEntry: The entry, None if it is missing or too old
+        """
+        entry = self._load().get(key)
+        if entry is None or (max_age is not None and entry.age > max_age):
+            return None
+        return entry
+
+    def items(self, prefix=''):
+        """Return (key, entry) pairs of every entry whose key starts with `prefix`"""
+        return [(key, entry) for key, entry in self._load().items() if key.startswith(prefix)]
+
+    def put(self, key, value):
+        """
+        Save a JSON serializable value under a key, written out on the next `flush`.
+
+        The value is encoded when flushed, so it should not be mutated in the meantime unless the latest state
+        is what should be written.
+
+        Returns:
+            SnapshotEntry: The new entry
+        """
+        entries = self._load()
+        previous = entries.get(key)
+        entry = entries[key] = SnapshotEntry(value, previous.version + 1 if previous is not None else 1, time.time())
+        self._pending.add(key)
+        return entry
+
+    def delete(self, key):
+        """Drop an entry (written out on the next `flush`)"""
+        if self._load().pop(key, None) is not None:
+            self._pending.add(key)
+
+    def flush(self):
+        """
+        Write every entry saved or deleted since the last flush in one transaction (on failure nothing is
+        written and the entries are written by the next flush).
+
+        Returns:
+            int: Number of entries written
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, set()
+        entries = self._load()
+        try:
+            saved = [(key, entries[key].version, entries[key].saved_at, dumps(entries[key].value))
+                     for key in pending if key in entries]
+            deleted = [(key,) for key in pending if key not in entries]
+            connection = self._connect()
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO snapshot (key, version, saved_at, value) '
+                                       'VALUES (?, ?, ?, ?)', saved)
+                connection.executemany('DELETE FROM snapshot WHERE key = ?', deleted)
+        except Exception:
+            # the keys stay dirty, so the next flush writes them
+            self._pending |= pending
+            raise
+        self.flushes += 1
+        return len(pending)
+
+    def close(self):
+        """Flush pending saves and close the file"""
+        if self._connection is None:
+            return
+        self.flush()
+        self._connection.close()
+        self._connection = None
+
+    def stats(self):
+        """Return the version and age in seconds of every entry, by key"""
+        return {key: {'version': entry.version, 'age': entry.age} for key, entry in self._load().items()}
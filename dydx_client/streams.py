@@ -0,0 +1,406 @@
+import asyncio
+import inspect
+import logging
+import time
+
+from .fastjson import loads
+from .instrumentation import NULL_METRICS
+
+
+logger = logging.getLogger(__name__)
+
+
+_CLOSED = object()
+
+
+class Subscription:
+    """
+    A single indexer channel subscription (e.g. v4_orderbook for BTC-USD) on a shared `IndexerStream`.
+
+    Messages are delivered to `callback` when one is given (an exception it raises is logged and counted, the
+    connection keeps reading), otherwise they are buffered in a bounded queue consumed with
+    `async for message in subscription` or `await subscription.get()`. When the queue is full
+    the `overflow` policy applies: 'drop' discards the oldest buffered message, 'block' applies backpressure
+    to the connection reader (and therefore to every other subscription on it).
+    """
+
+    def __init__(self, stream, channel, id=None, batched=False, callback=None, maxsize=1000, overflow='drop',
+                 on_disconnect=None, on_gap=None):
+        if overflow not in ('drop', 'block'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self.stream = stream
+        self.channel = channel
+        self.id = id
+        self.batched = batched
+        self.callback = callback
+        self.overflow = overflow
+        self.on_disconnect = on_disconnect
+        self.on_gap = on_gap
+        self.subscribed = False
+        self._subscribed_event = None
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+        # Metrics
+        self.messages = 0
+        self.dropped = 0
+        self.callback_errors = 0
+        self.rate = 0.0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.last_message_at = None
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    @property
+    def key(self):
+        return self.channel, self.id
+
+    @property
+    def _subscribed(self):
+        # created lazily so the event binds to the running loop
+        if self._subscribed_event is None:
+            self._subscribed_event = asyncio.Event()
+        return self._subscribed_event
+
+    async def wait_subscribed(self, timeout=None):
+        """Wait until the indexer confirmed the subscription (its 'subscribed' message was delivered)"""
+        await asyncio.wait_for(self._subscribed.wait(), timeout)
+
+    def subscribe_message(self):
+        message = {'type': 'subscribe', 'channel': self.channel}
+        if self.id is not None:
+            message['id'] = self.id
+        if self.batched:
+            message['batched'] = True
+        return message
+
+    def unsubscribe_message(self):
+        message = {'type': 'unsubscribe', 'channel': self.channel}
+        if self.id is not None:
+            message['id'] = self.id
+        return message
+
+    def _record(self, now):
+        self.messages += 1
+        self.last_message_at = now
+        self._window_count += 1
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.rate = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+
+    async def _deliver(self, message):
+        now = time.monotonic()
+        self._record(now)
+
+        if message.get('type') == 'subscribed':
+            self.subscribed = True
+            self._subscribed.set()
+
+        if self.callback is not None:
+            # a failing callback only loses its message, the shared connection keeps reading
+            try:
+                result = self.callback(message)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self.callback_errors += 1
+                self.stream.metrics.count('websocket_callback_errors_total', channel=self.channel,
+                                          error=type(e).__name__)
+                logger.exception("Error in indexer websocket callback",
+                                 extra={'channel': self.channel, 'id': self.id, 'message_type': message.get('type')})
+            return
+
+        if self.overflow == 'block':
+            await self._queue.put((now, message))
+            return
+
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait((now, message))
+
+    def _disconnected(self):
+        self.subscribed = False
+        self._subscribed.clear()
+        if self.on_disconnect is not None:
+            self.on_disconnect()
+
+    def _gap(self):
+        if self.on_gap is not None:
+            self.on_gap()
+
+    def _close(self):
+        self.subscribed = False
+        self._subscribed.clear()
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait((None, _CLOSED))
+
+    async def get(self):
+        """Wait for the next buffered message (None once the subscription is closed)"""
+        received_at, message = await self._queue.get()
+        if message is _CLOSED:
+            # keep the sentinel for other waiting consumers
+            self._queue.put_nowait((None, _CLOSED))
+            return None
+
+        self.lag = time.monotonic() - received_at
+        self.max_lag = max(self.max_lag, self.lag)
+        return message
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def unsubscribe(self):
+        """Unsubscribe from the channel and end iteration"""
+        await self.stream.unsubscribe(self)
+
+    def stats(self):
+        """Return the subscription metrics"""
+        return {
+            'channel': self.channel,
+            'id': self.id,
+            'subscribed': self.subscribed,
+            'messages': self.messages,
+            'dropped': self.dropped,
+            'callback_errors': self.callback_errors,
+            'queued': self._queue.qsize(),
+            'rate': self.rate,
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+        }
+
+
+class IndexerStream:
+    """
+    Multiplexed connection to the indexer websocket.
+
+    Every subscription shares one connection, which is opened on the first subscription, re-established (with
+    every active subscription re-sent) after a disconnect, backing off exponentially between attempts, and
+    closed when the last subscription is removed.
+    Given several indexer URLs, the next one is tried after a connection error.
+
+    The indexer numbers every message of a connection (`message_id`, consecutive across all channels), so a
+    skipped id means messages were lost: every subscription's `on_gap` is called, as the lost messages may have
+    belonged to any of them.
+    """
+
+    def __init__(self, url, session_factory=None, heartbeat=30.0, reconnect_delay=0.5, max_reconnect_delay=30.0,
+                 metrics=NULL_METRICS):
+        self.urls = [url] if isinstance(url, str) else list(url)
+        self.url = self.urls[0]
+        self.metrics = metrics
+        self.heartbeat = heartbeat
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._session_factory = session_factory
+        self._own_session = None
+        self._subscriptions = {}
+        self._ws = None
+        self._task = None
+        self._connected_event = None
+        self._last_message_id = None
+
+        # Metrics
+        self.connects = 0
+        self.messages = 0
+        self.errors = 0
+        self.gaps = 0
+
+    @property
+    def connected(self):
+        return self._ws is not None and not self._ws.closed
+
+    @property
+    def _connected(self):
+        # created lazily so the event binds to the running loop
+        if self._connected_event is None:
+            self._connected_event = asyncio.Event()
+        return self._connected_event
+
+    @property
+    def subscriptions(self):
+        return list(self._subscriptions.values())
+
+    def _session(self):
+        if self._session_factory is not None:
+            return self._session_factory()
+        if self._own_session is None or self._own_session.closed:
+            import aiohttp
+
+            self._own_session = aiohttp.ClientSession()
+        return self._own_session
+
+    def start(self):
+        """Start the connection task (done automatically by the first subscription)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def wait_connected(self, timeout=None):
+        """Wait until the websocket connection is established"""
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def subscribe(self, channel, id=None, batched=False, callback=None, maxsize=1000, overflow='drop',
+                        on_disconnect=None, on_gap=None):
+        """
+        Subscribe to an indexer channel.
+
+        Args:
+            channel (str): The channel name, e.g. 'v4_orderbook'
+            id (str): The channel id, e.g. the market ticker (None for channels without ids such as v4_markets)
+            batched (bool): Ask the indexer to batch updates ('channel_batch_data' messages)
+            callback (callable): Optional (async) function receiving every message instead of the queue
+            maxsize (int): Maximum number of buffered messages when no callback is given
+            overflow (str): 'drop' (discard the oldest message) or 'block' (backpressure) when the queue is full
+            on_disconnect (callable): Optional function called whenever the connection drops
+            on_gap (callable): Optional function called when messages of the connection were lost
+
+        Returns:
+            Subscription: The subscription (existing one if the channel/id pair is already subscribed)
+        """
+        subscription = self._subscriptions.get((channel, id))
+        if subscription is not None:
+            return subscription
+
+        subscription = Subscription(self, channel, id, batched, callback, maxsize, overflow, on_disconnect, on_gap)
+        self._subscriptions[subscription.key] = subscription
+
+        if self.connected:
+            await self._ws.send_json(subscription.subscribe_message())
+        else:
+            self.start()
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        """Remove a subscription (closing the connection when it was the last one)"""
+        if self._subscriptions.pop(subscription.key, None) is None:
+            return
+        if self.connected and subscription.subscribed:
+            await self._ws.send_json(subscription.unsubscribe_message())
+        subscription._close()
+
+        # `_run` ends once the closed connection finds no subscriptions left
+        if not self._subscriptions and self.connected:
+            await self._ws.close()
+
+    async def orderbook(self, market_id, **kwargs):
+        """Subscribe to `v4_orderbook` updates of a market"""
+        return await self.subscribe('v4_orderbook', market_id, batched=kwargs.pop('batched', True), **kwargs)
+
+    async def trades(self, market_id, **kwargs):
+        """Subscribe to `v4_trades` updates of a market"""
+        return await self.subscribe('v4_trades', market_id, batched=kwargs.pop('batched', True), **kwargs)
+
+    async def markets(self, **kwargs):
+        """Subscribe to `v4_markets` updates"""
+        return await self.subscribe('v4_markets', batched=kwargs.pop('batched', True), **kwargs)
+
+    async def subaccount(self, address, subaccount_number=0, **kwargs):
+        """Subscribe to `v4_subaccounts` updates (orders, fills, positions, transfers) of a subaccount"""
+        return await self.subscribe('v4_subaccounts', f'{address}/{subaccount_number}', **kwargs)
+
+    async def block_height(self, **kwargs):
+        """Subscribe to `v4_block_height` updates"""
+        return await self.subscribe('v4_block_height', **kwargs)
+
+    async def _run(self):
+        import aiohttp
+
+        delay = self.reconnect_delay
+        while self._subscriptions:
+            try:
+                async with self._session().ws_connect(self.url, heartbeat=self.heartbeat) as ws:
+                    self._ws = ws
+                    self._last_message_id = None
+                    self.connects += 1
+                    self.metrics.count('websocket_connects_total')
+                    delay = self.reconnect_delay
+                    for subscription in list(self._subscriptions.values()):
+                        await ws.send_json(subscription.subscribe_message())
+                    self._connected.set()
+
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            await self._dispatch(loads(msg.data))
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.metrics.count('websocket_errors_total', error=type(e).__name__)
+                logger.exception("Error in indexer websocket", extra={'url': self.url, 'retry_in': delay})
+                self.url = self.urls[(self.urls.index(self.url) + 1) % len(self.urls)]
+            finally:
+                self._ws = None
+                self._connected.clear()
+                for subscription in list(self._subscriptions.values()):
+                    subscription._disconnected()
+
+            if not self._subscriptions:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _dispatch(self, message):
+        self.messages += 1
+        self.metrics.count('websocket_messages_total', channel=message.get('channel'), type=message.get('type'))
+
+        message_id = message.get('message_id')
+        if message_id is not None:
+            last, self._last_message_id = self._last_message_id, message_id
+            if last is not None and message_id != last + 1:
+                self.gaps += 1
+                self.metrics.count('websocket_gaps_total')
+                logger.warning("Indexer websocket messages lost", extra={'expected': last + 1, 'received': message_id})
+                for subscription in list(self._subscriptions.values()):
+                    subscription._gap()
+        if message.get('type') == 'error':
+            self.errors += 1
+            self.metrics.count('websocket_errors_total', error='error_message')
+            logger.error("Indexer websocket error: %s", message.get('message'), extra={'ws_message': message})
+            return
+
+        subscription = self._subscriptions.get((message.get('channel'), message.get('id')))
+        if subscription is not None:
+            await subscription._deliver(message)
+
+    async def aclose(self):
+        """Close the connection and end every subscription"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        for subscription in list(self._subscriptions.values()):
+            subscription._close()
+        self._subscriptions.clear()
+
+        if self._own_session is not None:
+            await self._own_session.close()
+            self._own_session = None
+
+    def stats(self):
+        """Return connection and per-subscription metrics"""
+        return {
+            'connected': self.connected,
+            'connects': self.connects,
+            'messages': self.messages,
+            'errors': self.errors,
+            'gaps': self.gaps,
+            'subscriptions': [subscription.stats() for subscription in self._subscriptions.values()],
+        }
@@ -0,0 +1,59 @@
+import json
+import os
+
+
+class WalletCache:
+    """
+    Account numbers and sequences of wallets persisted in a JSON file, so a restarting client can sign its
+    first orders without querying the node for its account.
+
+    The account number of an address never changes. A stored sequence can be behind the chain (transactions
+    sent after the last save, or from another process), in which case the first stateful broadcast is rejected
+    with a sequence mismatch and the sequencer resyncs and re-signs it. Short-term orders are not sequence
+    checked, so they are unaffected.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self._entries = None
+
+    @staticmethod
+    def _key(chain_id, address):
+        return f'{chain_id}/{address}'
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get(self, chain_id, address):
+        """
+        Return the cached account of a wallet.
+
+        Returns:
+            tuple: (account_number, sequence), None if the wallet is not cached
+        """
+        if self._entries is None:
+            self._entries = self._load()
+        entry = self._entries.get(self._key(chain_id, address))
+        if entry is None:
+            return None
+        return entry['account_number'], entry['sequence']
+
+    def put(self, chain_id, address, account_number, sequence):
+        """Store the account of a wallet (merged into the file's current content, written atomically)"""
+        self._entries = self._load()
+        self._entries[self._key(chain_id, address)] = {
+            'account_number': int(account_number),
+            'sequence': int(sequence),
+        }
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(temp, self.path)
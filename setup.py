@@ -8,6 +8,7 @@ setup(
     author_email='null',
     packages=find_packages(),  # Automatically finds your_wrapper/
     install_requires=[
+        'aiohttp==3.10.11',
         'anyio==4.9.0',
         'asn1crypto==1.5.1',
         'bech32==1.2.0',
@@ -27,6 +28,7 @@ setup(
         'httpcore==1.0.9',
         'httpx==0.27.2',
         'idna==3.10',
+        'numpy==1.26.4',
         'protobuf==5.29.4',
         'py-sr25519-bindings==0.2.2',
         'pycparser==2.22',
@@ -38,5 +40,8 @@ setup(
         'v4-proto==5.2.1',
         'websocket-client==1.8.0',
     ],       # Add dependencies here, if any
+    extras_require={
+        'fast': ['orjson>=3.8'],  # faster JSON decoding of indexer responses and websocket messages
+    },
     python_requires='>=3.9',   # Or whatever you support
 )
@@ -0,0 +1,194 @@
+"""
+    Latency / throughput benchmark of the wrapper against the in-process fake exchange.
+
+    Every operation is run `--requests` times at each concurrency level and reported as p50 / p99 latency and
+    throughput. Results can be saved with `--save` and compared with `--compare` to catch regressions (exit
+    code 1 when a p50 or p99 got slower by more than `--threshold`).
+
+    Usage (from the repository root):
+        python -m tests.benchmark --latency 0.002 --concurrency 1 8 32 --save baseline.json
+        python -m tests.benchmark --latency 0.002 --concurrency 1 8 32 --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from dydx_client.instrumentation import Metrics
+from tests.fake_exchange import FakeExchange
+
+
+# Generous order limits so the benchmark measures the wrapper, not the client-side rate limiter
+BENCHMARK_BLOCK_RATE_LIMIT = {
+    'block_rate_limit_config': {
+        'max_short_term_orders_per_n_blocks': [{'num_blocks': 1, 'limit': 1000000}],
+        'max_stateful_orders_per_n_blocks': [{'num_blocks': 1, 'limit': 1000000}],
+        'max_short_term_order_cancellations_per_n_blocks': [{'num_blocks': 1, 'limit': 1000000}],
+        'max_short_term_orders_and_cancels_per_n_blocks': [{'num_blocks': 1, 'limit': 1000000}],
+    }
+}
+
+OPERATIONS = ('create_order', 'create_limit_order', 'cancel_order', 'replace_order', 'get_positions', 'fetch_order',
+              'get_fee_tiers', 'get_equity_tier', 'get_block_rate_limit')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return float('nan')
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+async def run_concurrently(calls, concurrency):
+    """
+    Await every call (zero-argument coroutine functions) with at most `concurrency` in flight.
+
+    Returns:
+        tuple: (latencies, errors, wall time)
+    """
+    latencies = []
+    errors = 0
+    pending = iter(calls)
+
+    async def worker():
+        nonlocal errors
+        for call in pending:
+            started = time.perf_counter()
+            try:
+                result = await call()
+                if result is None:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def prepare_calls(dydx_client, operation, count):
+    """Build `count` calls of an operation (placing the orders cancel/fetch benchmarks need first)"""
+    if operation == 'create_order':
+        return [lambda: dydx_client.create_order('BTC-USD', 'BUY', 0.001) for _ in range(count)]
+    if operation == 'create_limit_order':
+        return [lambda: dydx_client.create_order('BTC-USD', 'BUY', 0.001, price=50000) for _ in range(count)]
+
+    if operation in ('cancel_order', 'replace_order', 'fetch_order'):
+        results = await dydx_client.create_orders(
+            [{'market_id': 'ETH-USD', 'side': 'SELL', 'size': 0.01, 'price': 4000} for _ in range(count)]
+        )
+        order_ids = [result[0] for result in results if not isinstance(result, Exception)]
+        orders = [await dydx_client.get_order_by_components(order_id.client_id, order_id.order_flags,
+                                                            order_id.clob_pair_id) for order_id in order_ids]
+        orders = [order for order in orders if order is not None]
+        if operation == 'cancel_order':
+            return [lambda order=order: dydx_client.cancel_order(order) for order in orders]
+        if operation == 'replace_order':
+            return [lambda order=order: dydx_client.replace_order(order['id'], new_price=4100) for order in orders]
+        return [lambda order=order: dydx_client.fetch_order(order['id']) for order in orders]
+
+    if operation == 'get_positions':
+        return [dydx_client.get_positions for _ in range(count)]
+    return [getattr(dydx_client, operation) for _ in range(count)]
+
+
+async def benchmark(operations, concurrency_levels, requests, latency, jitter, error_rate, stages=False,
+                    metrics=True):
+    results = {}
+    async with FakeExchange(latency=latency, jitter=jitter, error_rate=error_rate, seed=1,
+                            block_rate_limit=BENCHMARK_BLOCK_RATE_LIMIT) as exchange:
+        dydx_client = await exchange.connect_client(indexer_rate_limit=None, metrics=Metrics(enabled=metrics))
+        await dydx_client.warm_market_cache()
+        try:
+            for operation in operations:
+                for concurrency in concurrency_levels:
+                    calls = await prepare_calls(dydx_client, operation, requests)
+                    dydx_client.metrics.reset()
+                    latencies, errors, wall = await run_concurrently(calls, concurrency)
+
+                    key = f'{operation}@{concurrency}'
+                    results[key] = {
+                        'operation': operation,
+                        'concurrency': concurrency,
+                        'requests': len(latencies),
+                        'errors': errors,
+                        'p50_ms': percentile(latencies, 0.50) * 1000,
+                        'p99_ms': percentile(latencies, 0.99) * 1000,
+                        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else float('nan'),
+                        'throughput': len(latencies) / wall if wall else float('inf'),
+                    }
+                    print_result(results[key])
+                    if stages:
+                        print_stages(dydx_client.metrics, operation)
+        finally:
+            await dydx_client.aclose()
+            await dydx_client.transport.aclose()
+    return results
+
+
+def print_result(result):
+    print(f"{result['operation']:<22} c={result['concurrency']:<4} n={result['requests']:<6} "
+          f"err={result['errors']:<4} p50={result['p50_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms "
+          f"{result['throughput']:9.1f}/s")
+
+
+def print_stages(metrics, operation):
+    """Print the mean time spent in each recorded stage of an operation"""
+    for (name, labels), histogram in sorted(metrics.histograms.items()):
+        labels = dict(labels)
+        if name == 'stage_duration_seconds' and labels['operation'] == operation:
+            print(f"    {labels['stage']:<20} n={histogram.count:<6} mean={histogram.sum / histogram.count * 1000:8.3f}ms")
+
+
+def compare(results, baseline, threshold):
+    """Print the change against a saved baseline, return the regressed benchmark keys"""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            change = result[metric] / previous[metric] - 1 if previous[metric] else 0.0
+            if change > threshold:
+                regressions.append(key)
+                print(f"REGRESSION {key} {metric}: {previous[metric]:.2f}ms -> {result[metric]:.2f}ms "
+                      f"({change:+.0%})")
+    return sorted(set(regressions))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--operations', nargs='+', default=list(OPERATIONS), choices=OPERATIONS)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=200, help='Calls per operation and concurrency level')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--stages', action='store_true', help='Print the per-stage breakdown of every operation')
+    parser.add_argument('--no-metrics', action='store_true', help='Disable instrumentation')
+    parser.add_argument('--save', help='Write the results to a JSON file')
+    parser.add_argument('--compare', help='Compare with results saved by --save')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative slowdown for --compare')
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(benchmark(args.operations, args.concurrency, args.requests, args.latency, args.jitter,
+                                    args.error_rate, args.stages, not args.no_metrics))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
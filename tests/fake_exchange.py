@@ -0,0 +1,785 @@
+"""
+    In-process stand-in for the dYdX indexer (REST + websocket), the protocol REST endpoints and the node's
+    gRPC services, so the wrapper can be exercised and benchmarked offline.
+
+    Usage:
+        async with FakeExchange(latency=0.005, error_rate=0.01) as exchange:
+            dydx_client = await exchange.connect_client()
+            order_id, transaction = await dydx_client.create_order('BTC-USD', 'BUY', 0.001)
+"""
+import asyncio
+import collections
+import datetime
+import random
+import threading
+import uuid
+
+import grpc
+from aiohttp import web
+from google.protobuf.any_pb2 import Any as AnyMessage
+from v4_proto.cosmos.auth.v1beta1 import query_pb2 as auth_query, query_pb2_grpc as auth_query_grpc
+from v4_proto.cosmos.auth.v1beta1.auth_pb2 import BaseAccount
+from v4_proto.cosmos.base.abci.v1beta1.abci_pb2 import TxResponse
+from v4_proto.cosmos.base.tendermint.v1beta1 import query_pb2 as tendermint_query
+from v4_proto.cosmos.base.tendermint.v1beta1 import query_pb2_grpc as tendermint_query_grpc
+from v4_proto.cosmos.tx.v1beta1 import service_pb2 as tx_service, service_pb2_grpc as tx_service_grpc
+from v4_proto.cosmos.tx.v1beta1.tx_pb2 import AuthInfo, TxBody, TxRaw
+from v4_proto.dydxprotocol.clob.order_pb2 import Order
+from v4_proto.dydxprotocol.clob.tx_pb2 import MsgBatchCancel, MsgCancelOrder, MsgPlaceOrder
+
+from dydx_client.block_height import BlockHeightTracker
+from dydx_client.dydx import DYDX, ClientTransport
+from dydx_client.order_store import order_uuid, subaccount_uuid
+from dydx_v4_client.node.builder import Builder
+from dydx_v4_client.node.client import NodeClient
+from dydx_v4_client.wallet import KeyPair, Wallet
+
+
+# Well-known BIP39 test mnemonic, never holds funds
+TEST_MNEMONIC = ('abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon '
+                 'about')
+
+MARKETS = {
+    'BTC-USD': {
+        'clobPairId': '0', 'ticker': 'BTC-USD', 'status': 'ACTIVE', 'oraclePrice': '60000',
+        'atomicResolution': -10, 'quantumConversionExponent': -9, 'tickSize': '1', 'stepSize': '0.0001',
+        'stepBaseQuantums': 1000000, 'subticksPerTick': 100000,
+        'initialMarginFraction': '0.05', 'maintenanceMarginFraction': '0.03',
+    },
+    'ETH-USD': {
+        'clobPairId': '1', 'ticker': 'ETH-USD', 'status': 'ACTIVE', 'oraclePrice': '3000',
+        'atomicResolution': -9, 'quantumConversionExponent': -9, 'tickSize': '0.1', 'stepSize': '0.001',
+        'stepBaseQuantums': 1000000, 'subticksPerTick': 100000,
+        'initialMarginFraction': '0.05', 'maintenanceMarginFraction': '0.03',
+    },
+}
+
+BLOCK_RATE_LIMIT = {
+    'block_rate_limit_config': {
+        'max_short_term_orders_per_n_blocks': [{'num_blocks': 1, 'limit': 200}],
+        'max_stateful_orders_per_n_blocks': [{'num_blocks': 1, 'limit': 20}, {'num_blocks': 100, 'limit': 2000}],
+        'max_short_term_order_cancellations_per_n_blocks': [{'num_blocks': 1, 'limit': 200}],
+        'max_short_term_orders_and_cancels_per_n_blocks': [{'num_blocks': 1, 'limit': 400}],
+    }
+}
+
+EQUITY_TIER = {'equity_tier_limit_config': {
+    'short_term_order_equity_tiers': [],
+    'stateful_order_equity_tiers': [
+        {'usd_tnc_required': '0', 'limit': 0},
+        {'usd_tnc_required': '20000000', 'limit': 4},
+        {'usd_tnc_required': '100000000', 'limit': 8},
+        {'usd_tnc_required': '1000000000', 'limit': 10},
+        {'usd_tnc_required': '10000000000', 'limit': 100},
+        {'usd_tnc_required': '100000000000', 'limit': 200},
+    ],
+}}
+
+FEE_TIERS = {'params': {'tiers': [
+    {'name': '1', 'absolute_volume_requirement': '0', 'total_volume_share_requirement_ppm': 0,
+     'maker_volume_share_requirement_ppm': 0, 'maker_fee_ppm': 100, 'taker_fee_ppm': 500},
+    {'name': '2', 'absolute_volume_requirement': '1000000000000', 'total_volume_share_requirement_ppm': 0,
+     'maker_volume_share_requirement_ppm': 0, 'maker_fee_ppm': 100, 'taker_fee_ppm': 450},
+    {'name': '3', 'absolute_volume_requirement': '5000000000000', 'total_volume_share_requirement_ppm': 0,
+     'maker_volume_share_requirement_ppm': 0, 'maker_fee_ppm': 50, 'taker_fee_ppm': 400},
+    {'name': '4', 'absolute_volume_requirement': '25000000000000', 'total_volume_share_requirement_ppm': 0,
+     'maker_volume_share_requirement_ppm': 0, 'maker_fee_ppm': 0, 'taker_fee_ppm': 350},
+    {'name': '5', 'absolute_volume_requirement': '125000000000000', 'total_volume_share_requirement_ppm': 0,
+     'maker_volume_share_requirement_ppm': 0, 'maker_fee_ppm': 0, 'taker_fee_ppm': 300},
+    {'name': '6', 'absolute_volume_requirement': '125000000000000', 'total_volume_share_requirement_ppm': 5000,
+     'maker_volume_share_requirement_ppm': 0, 'maker_fee_ppm': -50, 'taker_fee_ppm': 250},
+]}}
+
+USER_STATS = {'stats': {'taker_notional': '0', 'maker_notional': '0'}}
+
+SEQUENCE_MISMATCH_CODE = 32
+INVALID_REQUEST_CODE = 18
+INJECTED_ERROR_CODE = 1
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+class FakeExchange:
+    """
+    Fake indexer, protocol REST and node gRPC endpoints backed by a shared in-memory exchange state.
+
+    Every request is delayed by `latency` (+ up to `jitter`) seconds and fails with probability `error_rate`
+    (HTTP 500 for REST, a non-zero tx code for broadcasts). Placed orders are stored (market orders fill
+    immediately at their price and update positions, resting orders are filled with `fill_order`), cancels
+    update their status, stateful transactions check and advance the account sequence, and order updates,
+    fills and new blocks are pushed to websocket subscribers.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, block_time=1.0, chain_id='dydx-fake-1', seed=None,
+                 block_rate_limit=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.block_time = block_time
+        self.chain_id = chain_id
+        self.random = random.Random(seed)
+        self.block_rate_limit = block_rate_limit or BLOCK_RATE_LIMIT
+
+        self.markets = {market_id: dict(market) for market_id, market in MARKETS.items()}
+        self.clob_pairs = {int(market['clobPairId']): market for market in self.markets.values()}
+        self.height = 1000
+        self.accounts = {}
+        self.orders = {}
+        self.fills = []
+        self.positions = {}
+        self.subaccount_owners = {}
+
+        # Metrics
+        self.requests = 0
+        self.broadcasts = 0
+        self.injected_errors = 0
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._runner = None
+        self._grpc_server = None
+        self._node_loop = None
+        self._node_thread = None
+        self._ticker = None
+        self._sockets = {}
+        # websocket -> iterator of its connection's message ids (consecutive across channels, like the indexer)
+        self._message_ids = {}
+        self._rejections = collections.deque()
+        self.port = None
+        self.grpc_port = None
+
+    # Lifecycle
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+        app = web.Application()
+        app.add_routes([
+            web.get('/v4/perpetualMarkets', self._perpetual_markets),
+            web.get('/v4/orderbooks/perpetualMarket/{market}', self._orderbook),
+            web.get('/v4/orders', self._orders),
+            web.get('/v4/orders/{id}', self._order),
+            web.get('/v4/perpetualPositions', self._perpetual_positions),
+            web.get('/v4/addresses/{address}/subaccountNumber/{number}', self._subaccount),
+            web.get('/v4/fills', self._fills),
+            web.get('/v4/transfers', self._transfers),
+            web.get('/v4/historical-pnl', self._historical_pnl),
+            web.get('/v4/ws', self._websocket),
+            web.get('/dydxprotocol/clob/block_rate', self._static(self.block_rate_limit)),
+            web.get('/dydxprotocol/clob/equity_tier', self._static(EQUITY_TIER)),
+            web.get('/dydxprotocol/v4/feetiers/perpetual_fee_params', self._static(FEE_TIERS)),
+            web.get('/dydxprotocol/v4/stats/user_stats', self._static(USER_STATS)),
+        ])
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+        # The wrapper calls the node with blocking gRPC stubs from the event loop, so the fake node runs its
+        # own loop on a separate thread
+        ready = threading.Event()
+        self._node_thread = threading.Thread(target=self._serve_node, args=(ready,), daemon=True)
+        self._node_thread.start()
+        ready.wait()
+
+        self._ticker = asyncio.create_task(self._produce_blocks())
+        return self
+
+    async def stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+        for ws in list(self._sockets):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+        if self._grpc_server is not None:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._grpc_server.stop(None), self._node_loop))
+            self._node_loop.call_soon_threadsafe(self._node_loop.stop)
+            await asyncio.get_running_loop().run_in_executor(None, self._node_thread.join)
+
+    def _serve_node(self, ready):
+        self._node_loop = asyncio.new_event_loop()
+
+        async def serve():
+            # a single loop handles calls in arrival order, like a node's CheckTx
+            server = grpc.aio.server()
+            tx_service_grpc.add_ServiceServicer_to_server(_TxService(self), server)
+            auth_query_grpc.add_QueryServicer_to_server(_AuthQuery(self), server)
+            tendermint_query_grpc.add_ServiceServicer_to_server(_TendermintService(self), server)
+            self.grpc_port = server.add_insecure_port('127.0.0.1:0')
+            await server.start()
+            self._grpc_server = server
+            ready.set()
+
+        self._node_loop.run_until_complete(serve())
+        self._node_loop.run_forever()
+        self._node_loop.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    @property
+    def rest_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    @property
+    def websocket_url(self):
+        return f'ws://127.0.0.1:{self.port}/v4/ws'
+
+    @property
+    def node_url(self):
+        return f'127.0.0.1:{self.grpc_port}'
+
+    def transport(self, **options):
+        """
+        A `ClientTransport` whose node and indexer clients point at this exchange (endpoint options replace
+        this exchange's URLs, e.g. to put other endpoints in front of it)
+        """
+        endpoints = {
+            'rest_indexer': self.rest_url,
+            'websocket_indexer': self.websocket_url,
+            'node_url': self.node_url,
+            'grpc_url': self.rest_url,
+        }
+        transport = ClientTransport(**{**endpoints, **options})
+        transport.node_client = transport.failover_node_client(
+            [NodeClient(grpc.insecure_channel(url), Builder(self.chain_id, 'ibc/usdc')) for url in transport.node_urls]
+        )
+        transport.indexer_client = transport.pooled_indexer_client()
+        return transport
+
+    async def connect_client(self, mnemonic=TEST_MNEMONIC, transport=None, **options):
+        """
+        Create and initialize a `DYDX` client trading against this exchange.
+
+        Args:
+            mnemonic (str): Wallet mnemonic (the address is derived from it)
+            transport (ClientTransport): Shared transport from `transport()`, a new one if not given
+            options: `DYDX` options (transport options apply when no transport is given)
+
+        Returns:
+            DYDX: The initialized client
+        """
+        address = Wallet(KeyPair.from_mnemonic(mnemonic), 0, 0).address
+        self.account(address)
+        if transport is None:
+            transport_options = {key: options.pop(key) for key in list(options)
+                                 if key in ('oracle_price_ttl', 'http_limit_per_host', 'track_block_height',
+                                            'block_poll_interval', 'block_height_max_staleness',
+                                            'indexer_rate_limit', 'metrics', 'read_retries', 'hedge_after',
+                                            'rest_indexer', 'websocket_indexer', 'node_url', 'grpc_url')}
+            transport = self.transport(**transport_options)
+
+        # the block tracker and rate limits are normally set up by `ClientTransport.connect`
+        if transport.block_height is None:
+            transport.block_rate_limit = await transport.protocol.query_protocol('/dydxprotocol/clob/block_rate')
+            transport.block_height = BlockHeightTracker(
+                transport.node_client,
+                poll_interval=transport.block_poll_interval,
+                max_staleness=transport.block_height_max_staleness,
+                metrics=transport.metrics
+            )
+            if transport.track_block_height:
+                transport.block_height.start()
+
+        client = DYDX(address, mnemonic, transport=transport, **options)
+        await client.initialize_clients()
+        return client
+
+    # State
+
+    def account(self, address):
+        with self._lock:
+            account = self.accounts.get(address)
+            if account is None:
+                account = self.accounts[address] = {'account_number': len(self.accounts) + 1, 'sequence': 0}
+            return account
+
+    def _market_of(self, clob_pair_id):
+        return self.clob_pairs[int(clob_pair_id)]
+
+    def _order_record(self, order: Order):
+        order_id = order.order_id
+        subaccount = order_id.subaccount_id
+        market = self._market_of(order_id.clob_pair_id)
+        atomic_resolution = int(market['atomicResolution'])
+        subticks_per_unit = 10.0 ** (atomic_resolution - int(market['quantumConversionExponent']) + 6)
+        is_market = order.time_in_force == Order.TimeInForce.TIME_IN_FORCE_IOC
+        self.subaccount_owners[subaccount_uuid(subaccount.owner, subaccount.number)] = subaccount.owner
+        record = {
+            'id': order_uuid(subaccount.owner, subaccount.number, order_id.client_id, order_id.clob_pair_id,
+                             order_id.order_flags),
+            'subaccountId': subaccount_uuid(subaccount.owner, subaccount.number),
+            'subaccountNumber': subaccount.number,
+            'clientId': str(order_id.client_id),
+            'clobPairId': str(order_id.clob_pair_id),
+            'orderFlags': str(order_id.order_flags),
+            'ticker': market['ticker'],
+            'side': 'BUY' if order.side == Order.Side.SIDE_BUY else 'SELL',
+            'size': repr(order.quantums * 10.0 ** atomic_resolution),
+            'totalFilled': '0',
+            'price': repr(order.subticks / subticks_per_unit),
+            'type': 'MARKET' if is_market else 'LIMIT',
+            'status': 'OPEN',
+            'timeInForce': 'IOC' if is_market else 'GTT',
+            'reduceOnly': order.reduce_only,
+            'postOnly': order.time_in_force == Order.TimeInForce.TIME_IN_FORCE_POST_ONLY,
+            'clientMetadata': str(order.client_metadata),
+            'createdAtHeight': str(self.height),
+            'updatedAtHeight': str(self.height),
+            'updatedAt': _now(),
+        }
+        if order.good_til_block:
+            record['goodTilBlock'] = str(order.good_til_block)
+        if order.good_til_block_time:
+            record['goodTilBlockTime'] = datetime.datetime.fromtimestamp(
+                order.good_til_block_time, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        if is_market:
+            record['status'] = 'FILLED'
+            record['totalFilled'] = record['size']
+            self._fill(record, float(record['size']))
+        return record
+
+    def _fill(self, record, size, liquidity='TAKER'):
+        """Record a fill of an order and apply it to the position, returns the indexer fill"""
+        fill = {
+            'id': str(uuid.UUID(int=self.random.getrandbits(128))),
+            'subaccountId': record['subaccountId'],
+            'subaccountNumber': record['subaccountNumber'],
+            'orderId': record['id'],
+            'clobPairId': record['clobPairId'],
+            'market': record['ticker'],
+            'ticker': record['ticker'],
+            'side': record['side'],
+            'liquidity': liquidity,
+            'type': 'LIMIT',
+            'size': repr(size),
+            'price': record['price'],
+            'quoteAmount': repr(size * float(record['price'])),
+            'createdAt': _now(),
+            'createdAtHeight': str(self.height),
+        }
+        self.fills.append(fill)
+
+        key = (record['subaccountId'], record['ticker'])
+        size = size * (1 if record['side'] == 'BUY' else -1)
+        price = float(record['price'])
+        position = self.positions.get(key)
+        if position is None:
+            position = self.positions[key] = {'size': 0.0, 'entryPrice': price, 'createdAt': _now(),
+                                              'createdAtHeight': str(self.height)}
+        if position['size'] * size >= 0:
+            total = position['size'] + size
+            position['entryPrice'] = (position['entryPrice'] * abs(position['size']) + price * abs(size)) / abs(total)
+        else:
+            total = position['size'] + size
+        position['size'] = total
+        if total == 0:
+            del self.positions[key]
+        return fill
+
+    def fill_order(self, order_id, size=None):
+        """
+        Fill (part of) a resting order as the maker side of a trade and push the update and the fill.
+
+        Args:
+            order_id (str): The indexer order id
+            size (float): Size to fill (default: the remaining size)
+
+        Returns:
+            dict: The fill
+        """
+        with self._lock:
+            record = self.orders[order_id]
+            remaining = float(record['size']) - float(record['totalFilled'])
+            size = remaining if size is None else min(size, remaining)
+            fill = self._fill(record, size, liquidity='MAKER')
+            if size >= remaining - 1e-12:
+                record['status'] = 'FILLED'
+                record['totalFilled'] = record['size']
+            else:
+                record['totalFilled'] = repr(float(record['totalFilled']) + size)
+            record['updatedAtHeight'] = str(self.height)
+            record['updatedAt'] = _now()
+        self._publish_order(record, [fill])
+        return fill
+
+    async def publish_orderbook(self, market_id, bids=(), asks=()):
+        """Send a `v4_orderbook` update of [price, size] pairs (size '0' removes a level) to the market's subscribers"""
+        await self._send('v4_orderbook', market_id, {'bids': [list(level) for level in bids],
+                                                     'asks': [list(level) for level in asks]})
+
+    def lose_messages(self, count=1):
+        """Skip the next `count` message ids of every websocket connection, as if those messages were lost"""
+        for message_ids in self._message_ids.values():
+            for _ in range(count):
+                next(message_ids)
+
+    def _apply_messages(self, messages):
+        """Apply the messages of an accepted transaction, returns the order records that changed"""
+        updated = []
+        for message in messages:
+            if isinstance(message, MsgPlaceOrder):
+                record = self._order_record(message.order)
+                self.orders[record['id']] = record
+                updated.append(record)
+            elif isinstance(message, MsgCancelOrder):
+                order_id = message.order_id
+                record = self.orders.get(order_uuid(order_id.subaccount_id.owner, order_id.subaccount_id.number,
+                                                    order_id.client_id, order_id.clob_pair_id,
+                                                    order_id.order_flags))
+                if record is not None and record['status'] == 'OPEN':
+                    record['status'] = 'CANCELED'
+                    record['updatedAtHeight'] = str(self.height)
+                    updated.append(record)
+            elif isinstance(message, MsgBatchCancel):
+                subaccount = message.subaccount_id
+                for batch in message.short_term_cancels:
+                    for client_id in batch.client_ids:
+                        record = self.orders.get(order_uuid(subaccount.owner, subaccount.number, client_id,
+                                                            batch.clob_pair_id, 0))
+                        if record is not None and record['status'] == 'OPEN':
+                            record['status'] = 'CANCELED'
+                            updated.append(record)
+        return updated
+
+    @staticmethod
+    def _is_clob(message):
+        return isinstance(message, (MsgPlaceOrder, MsgCancelOrder, MsgBatchCancel))
+
+    @staticmethod
+    def _is_stateful(message):
+        if isinstance(message, MsgPlaceOrder):
+            return message.order.order_id.order_flags != 0
+        if isinstance(message, MsgCancelOrder):
+            return message.order_id.order_flags != 0
+        return False
+
+    def broadcast(self, tx_bytes):
+        """
+        Check and apply a signed transaction (runs on the node thread).
+
+        Like a node's CheckTx, transactions are checked in the order they arrive; the simulated latency is
+        spent before responding so it does not reorder them.
+        """
+        tx = TxRaw.FromString(tx_bytes)
+        body = TxBody.FromString(tx.body_bytes)
+        auth_info = AuthInfo.FromString(tx.auth_info_bytes)
+        messages = [_unpack(message) for message in body.messages]
+        txhash = f'{self.random.getrandbits(128):032X}'
+
+        with self._lock:
+            self.broadcasts += 1
+            if self._inject_error():
+                return TxResponse(code=INJECTED_ERROR_CODE, raw_log='injected error', txhash=txhash)
+            if self._rejections:
+                code, codespace, raw_log = self._rejections.popleft()
+                return TxResponse(code=code, codespace=codespace, raw_log=raw_log, txhash=txhash)
+
+            # like the chain's ante handler (IsSingleClobMsgTx), a clob message must be alone in its transaction
+            if len(messages) > 1 and any(self._is_clob(message) for message in messages):
+                return TxResponse(
+                    code=INVALID_REQUEST_CODE, codespace='sdk', txhash=txhash,
+                    raw_log='a transaction containing a clob message may not contain more than one message: '
+                            'invalid request'
+                )
+
+            owner = _owner(messages[0])
+            account = self.accounts.setdefault(owner, {'account_number': len(self.accounts) + 1, 'sequence': 0})
+            if any(self._is_stateful(message) for message in messages):
+                sequence = auth_info.signer_infos[0].sequence
+                if sequence != account['sequence']:
+                    return TxResponse(
+                        code=SEQUENCE_MISMATCH_CODE,
+                        raw_log=f"account sequence mismatch, expected {account['sequence']}, got {sequence}: "
+                                f"incorrect account sequence",
+                        txhash=txhash
+                    )
+                account['sequence'] += 1
+
+            first_fill = len(self.fills)
+            updated = self._apply_messages(messages)
+            fills = self.fills[first_fill:]
+
+        for record in updated:
+            self._publish_order(record, [fill for fill in fills if fill['orderId'] == record['id']])
+        return TxResponse(code=0, raw_log='[]', txhash=txhash, height=self.height)
+
+    # Fault injection
+
+    def _inject_error(self):
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.injected_errors += 1
+            return True
+        return False
+
+    def reject_transactions(self, count=1, code=INJECTED_ERROR_CODE, codespace='', raw_log='injected error'):
+        """Reject the next `count` transactions with the given code before they are checked or applied"""
+        self._rejections.extend([(code, codespace, raw_log)] * count)
+
+    async def drop_websockets(self):
+        """Close every indexer websocket connection from the server side"""
+        for ws in list(self._sockets):
+            await ws.close()
+
+    def _delay_amount(self):
+        return self.latency + (self.random.random() * self.jitter if self.jitter else 0.0)
+
+    async def _node_delay(self):
+        delay = self._delay_amount()
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def _delay(self):
+        self.requests += 1
+        await self._node_delay()
+        if self._inject_error():
+            raise web.HTTPInternalServerError(text='injected error')
+
+    # Indexer REST
+
+    def _static(self, payload):
+        async def handler(request):
+            await self._delay()
+            return web.json_response(payload)
+        return handler
+
+    async def _perpetual_markets(self, request):
+        await self._delay()
+        ticker = request.query.get('ticker')
+        markets = self.markets if ticker is None else {ticker: self.markets[ticker]}
+        return web.json_response({'markets': markets})
+
+    async def _orderbook(self, request):
+        await self._delay()
+        return web.json_response(self.book(request.match_info['market']))
+
+    def book(self, market_id, levels=20):
+        oracle = float(self.markets[market_id]['oraclePrice'])
+        tick = float(self.markets[market_id]['tickSize'])
+        return {
+            'bids': [{'price': repr(oracle - tick * (index + 1)), 'size': '1.0'} for index in range(levels)],
+            'asks': [{'price': repr(oracle + tick * (index + 1)), 'size': '1.0'} for index in range(levels)],
+        }
+
+    def _subaccount_orders(self, address, number):
+        subaccount_id = subaccount_uuid(address, number)
+        with self._lock:
+            return [dict(order) for order in self.orders.values() if order['subaccountId'] == subaccount_id]
+
+    async def _orders(self, request):
+        await self._delay()
+        query = request.query
+        orders = self._subaccount_orders(query['address'], int(query.get('subaccountNumber', 0)))
+        if 'ticker' in query:
+            orders = [order for order in orders if order['ticker'] == query['ticker']]
+        if 'status' in query:
+            orders = [order for order in orders if order['status'] == query['status']]
+        if 'goodTilBlockBeforeOrAt' in query:
+            limit = int(query['goodTilBlockBeforeOrAt'])
+            orders = sorted((order for order in orders if 'goodTilBlock' in order
+                             and int(order['goodTilBlock']) <= limit), key=lambda order: -int(order['goodTilBlock']))
+        if 'goodTilBlockTimeBeforeOrAt' in query:
+            limit = query['goodTilBlockTimeBeforeOrAt']
+            orders = sorted((order for order in orders if order.get('goodTilBlockTime', '~') <= limit),
+                            key=lambda order: order['goodTilBlockTime'], reverse=True)
+        return web.json_response(orders[:int(query.get('limit', 100))])
+
+    async def _order(self, request):
+        await self._delay()
+        with self._lock:
+            order = self.orders.get(request.match_info['id'])
+            order = None if order is None else dict(order)
+        if order is None:
+            raise web.HTTPNotFound(text='order not found')
+        return web.json_response(order)
+
+    def _positions(self, address, number):
+        subaccount_id = subaccount_uuid(address, number)
+        with self._lock:
+            return [
+                {
+                    'market': ticker,
+                    'status': 'OPEN',
+                    'side': 'LONG' if position['size'] > 0 else 'SHORT',
+                    'size': repr(position['size']),
+                    'entryPrice': repr(position['entryPrice']),
+                    'createdAt': position['createdAt'],
+                    'createdAtHeight': position['createdAtHeight'],
+                    'subaccountNumber': number,
+                }
+                for (owner, ticker), position in self.positions.items() if owner == subaccount_id
+            ]
+
+    async def _perpetual_positions(self, request):
+        await self._delay()
+        query = request.query
+        positions = self._positions(query['address'], int(query.get('subaccountNumber', 0)))
+        if query.get('status'):
+            positions = [position for position in positions if position['status'] == query['status']]
+        return web.json_response({'positions': positions})
+
+    async def _subaccount(self, request):
+        await self._delay()
+        address = request.match_info['address']
+        number = int(request.match_info['number'])
+        positions = self._positions(address, number)
+        return web.json_response({'subaccount': {
+            'address': address,
+            'subaccountNumber': number,
+            'equity': '100000',
+            'freeCollateral': '100000',
+            'assetPositions': {'USDC': {'symbol': 'USDC', 'side': 'LONG', 'size': '100000'}},
+            'openPerpetualPositions': {position['market']: position for position in positions},
+        }})
+
+    async def _fills(self, request):
+        await self._delay()
+        return web.json_response({'fills': []})
+
+    async def _transfers(self, request):
+        await self._delay()
+        return web.json_response({'transfers': []})
+
+    async def _historical_pnl(self, request):
+        await self._delay()
+        return web.json_response({'historicalPnl': []})
+
+    # Indexer websocket
+
+    async def _websocket(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets[ws] = set()
+        message_ids = self._message_ids[ws] = iter(range(1, 1 << 62))
+        try:
+            async for msg in ws:
+                if msg.type != web.WSMsgType.TEXT:
+                    continue
+                message = msg.json()
+                key = (message.get('channel'), message.get('id'))
+                if message.get('type') == 'subscribe':
+                    self._sockets[ws].add(key)
+                    await ws.send_json({
+                        'type': 'subscribed',
+                        'connection_id': 'fake',
+                        'message_id': next(message_ids),
+                        'channel': key[0],
+                        'id': key[1],
+                        'contents': self._snapshot(*key),
+                    })
+                elif message.get('type') == 'unsubscribe':
+                    self._sockets[ws].discard(key)
+                    # a client dropping its last subscription closes the connection right after unsubscribing
+                    if not ws.closed:
+                        try:
+                            await ws.send_json({'type': 'unsubscribed', 'message_id': next(message_ids),
+                                        'channel': key[0], 'id': key[1]})
+                        except ConnectionResetError:
+                            break
+        finally:
+            self._sockets.pop(ws, None)
+            self._message_ids.pop(ws, None)
+        return ws
+
+    def _snapshot(self, channel, id):
+        if channel == 'v4_markets':
+            return {'markets': self.markets}
+        if channel == 'v4_orderbook':
+            return self.book(id)
+        if channel == 'v4_subaccounts':
+            address, number = id.rsplit('/', 1)
+            orders = [order for order in self._subaccount_orders(address, int(number)) if order['status'] == 'OPEN']
+            return {'subaccount': {'address': address, 'subaccountNumber': int(number)}, 'orders': orders}
+        if channel == 'v4_block_height':
+            return {'height': str(self.height), 'time': _now()}
+        return {}
+
+    async def _send(self, channel, id, contents):
+        for ws, keys in list(self._sockets.items()):
+            if (channel, id) in keys and not ws.closed:
+                await ws.send_json({'type': 'channel_data', 'message_id': next(self._message_ids[ws]),
+                                    'channel': channel, 'id': id, 'contents': contents})
+
+    def _publish_order(self, record, fills=()):
+        id = f"{self.subaccount_owners[record['subaccountId']]}/{record['subaccountNumber']}"
+        contents = {'orders': [dict(record)]}
+        if fills:
+            contents['fills'] = list(fills)
+        self._loop.call_soon_threadsafe(
+            lambda: asyncio.ensure_future(self._send('v4_subaccounts', id, contents))
+        )
+
+    async def _produce_blocks(self):
+        while True:
+            await asyncio.sleep(self.block_time)
+            with self._lock:
+                self.height += 1
+            await self._send('v4_block_height', None, {'blockHeight': str(self.height), 'time': _now()})
+
+
+def _unpack(message: AnyMessage):
+    for message_type in (MsgPlaceOrder, MsgCancelOrder, MsgBatchCancel):
+        if message.type_url.endswith(message_type.DESCRIPTOR.full_name):
+            unpacked = message_type()
+            message.Unpack(unpacked)
+            return unpacked
+    return message
+
+
+def _owner(message):
+    if isinstance(message, MsgPlaceOrder):
+        return message.order.order_id.subaccount_id.owner
+    if isinstance(message, MsgCancelOrder):
+        return message.order_id.subaccount_id.owner
+    if isinstance(message, MsgBatchCancel):
+        return message.subaccount_id.owner
+    return ''
+
+
+class _TxService(tx_service_grpc.ServiceServicer):
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    async def BroadcastTx(self, request, context):
+        response = tx_service.BroadcastTxResponse(tx_response=self.exchange.broadcast(request.tx_bytes))
+        await self.exchange._node_delay()
+        return response
+
+
+class _AuthQuery(auth_query_grpc.QueryServicer):
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    async def Account(self, request, context):
+        await self.exchange._node_delay()
+        account = self.exchange.account(request.address)
+        packed = AnyMessage()
+        packed.Pack(BaseAccount(address=request.address, account_number=account['account_number'],
+                                sequence=account['sequence']), type_url_prefix='/')
+        return auth_query.QueryAccountResponse(account=packed)
+
+
+class _TendermintService(tendermint_query_grpc.ServiceServicer):
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    async def GetLatestBlock(self, request, context):
+        await self.exchange._node_delay()
+        response = tendermint_query.GetLatestBlockResponse()
+        response.block.header.height = self.exchange.height
+        response.block.header.chain_id = self.exchange.chain_id
+        return response
@@ -0,0 +1,46 @@
+import asyncio
+
+from dydx_client.endpoints import EndpointSet
+from dydx_client.errors import ServerError
+
+
+def test_retryable_failures_move_to_the_next_endpoint():
+    async def run():
+        endpoints = EndpointSet(['a', 'b'], max_failures=2)
+        calls = []
+
+        async def fn(endpoint):
+            calls.append(endpoint.url)
+            if endpoint.url == 'a':
+                raise ServerError(status=503)
+            return endpoint.url
+
+        assert await endpoints.call(fn, backoff=0.001) == 'b'
+        assert await endpoints.call(fn, backoff=0.001) == 'b'
+        assert calls[0] == 'a'
+        a, b = endpoints.endpoints
+        assert a.failures == 1 and a.health < 1.0 and b.latency is not None
+
+    asyncio.run(run())
+
+
+def test_cancelled_hedge_loser_keeps_its_health():
+    async def run():
+        endpoints = EndpointSet(['slow', 'fast'])
+        slow, fast = endpoints.endpoints
+        slow.health = 0.5
+        slow.consecutive_failures = 2
+
+        async def fn(endpoint):
+            if endpoint is slow:
+                await asyncio.sleep(10)
+            return endpoint.url
+
+        assert await endpoints.call(fn, hedge_after=0.01) == 'fast'
+        await asyncio.sleep(0)
+        assert endpoints.hedge_wins == 1
+        # the loser's time counts towards its latency, not as a success
+        assert slow.latency is not None and slow.latency >= 0.01
+        assert slow.health == 0.5 and slow.consecutive_failures == 2 and slow.failures == 0
+
+    asyncio.run(run())
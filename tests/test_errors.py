@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import grpc
+
+from dydx_client.errors import (
+    Forbidden, InvalidOrder, MempoolFull, NetworkError, NotFound, ReduceOnlyOrderError, SequenceMismatch,
+    ServerError, TX_IN_MEMPOOL_CODE, TooManyRequests, TransactionError, Undercollateralized, http_error, map_exception,
+    tx_error
+)
+from tests.fake_exchange import INVALID_REQUEST_CODE, SEQUENCE_MISMATCH_CODE
+
+
+def tx_response(code, raw_log='', codespace=''):
+    return SimpleNamespace(code=code, raw_log=raw_log, codespace=codespace, txhash='ABC')
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, status):
+        self.status = status
+
+    def code(self):
+        return self.status
+
+
+def test_accepted_transactions_have_no_error():
+    assert tx_error(tx_response(0)) is None
+    # already in the mempool from an earlier attempt
+    assert tx_error(tx_response(TX_IN_MEMPOOL_CODE, 'tx already exists in cache', 'sdk')) is None
+    assert tx_error(tx_response(TX_IN_MEMPOOL_CODE, 'tx already exists in cache')) is None
+
+
+def test_mempool_code_of_a_module_is_a_rejection():
+    error = tx_error(tx_response(TX_IN_MEMPOOL_CODE, 'invalid order flags', 'clob'))
+    assert isinstance(error, InvalidOrder) and error.code == TX_IN_MEMPOOL_CODE
+    assert isinstance(tx_error(tx_response(TX_IN_MEMPOOL_CODE, 'asset not found', 'subaccounts')), TransactionError)
+
+
+def test_sdk_codes():
+    error = tx_error(tx_response(SEQUENCE_MISMATCH_CODE, 'account sequence mismatch, expected 4, got 3', 'sdk'))
+    assert isinstance(error, SequenceMismatch) and error.retryable
+    assert error.code == SEQUENCE_MISMATCH_CODE and error.tx_hash == 'ABC'
+    assert isinstance(tx_error(tx_response(20, 'mempool is full', 'sdk')), MempoolFull)
+
+    # e.g. a clob message sharing its transaction with another message
+    error = tx_error(tx_response(INVALID_REQUEST_CODE, 'invalid request', 'sdk'))
+    assert type(error) is TransactionError and not error.retryable
+
+
+def test_module_errors_by_raw_log():
+    error = tx_error(tx_response(3007, 'Subaccount updates failed collateralization check', 'clob'))
+    assert isinstance(error, Undercollateralized) and isinstance(error, InvalidOrder)
+    assert type(tx_error(tx_response(9999, 'something new', 'clob'))) is InvalidOrder
+    assert type(tx_error(tx_response(9999, 'something new', 'bank'))) is TransactionError
+    assert isinstance(tx_error(tx_response(2001, '', 'clob')), ReduceOnlyOrderError)
+
+
+def test_http_statuses():
+    assert isinstance(http_error(404), NotFound)
+    assert isinstance(http_error(403), Forbidden)
+    assert isinstance(http_error(503), ServerError) and http_error(503).retryable
+
+    error = http_error(429, url='/v4/orders', retry_after='2')
+    assert isinstance(error, TooManyRequests) and error.retryable
+    assert error.backoff_hint == 2.0
+    # a Retry-After date keeps the class default
+    assert http_error(429, retry_after='Wed, 21 Oct 2026 07:28:00 GMT').backoff_hint == TooManyRequests.backoff_hint
+
+
+def test_client_exceptions():
+    error = map_exception(FakeRpcError(grpc.StatusCode.UNAVAILABLE))
+    assert isinstance(error, NetworkError) and error.retryable
+    assert isinstance(map_exception(FakeRpcError(grpc.StatusCode.NOT_FOUND)), NotFound)
+    assert isinstance(map_exception(ConnectionResetError()), NetworkError)
+
+    response = SimpleNamespace(status_code=500, headers={})
+    assert isinstance(map_exception(SimpleNamespace(response=response)), ServerError)
+
+    # programming errors are not request failures
+    assert map_exception(KeyError('price')) is None
@@ -0,0 +1,92 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from dydx_client.errors import HistoryPageOverflow
+from dydx_client.history import SCHEMAS, ColumnTable, paginate
+
+
+def make_fills(heights):
+    """Newest-first fill records, one per height"""
+    return [{'id': f'fill-{index}', 'createdAtHeight': str(height), 'size': 1.0}
+            for index, height in enumerate(sorted(heights, reverse=True))]
+
+
+class FakeEndpoint:
+    """Newest-first endpoint with an inclusive `created_before_or_at_height` cursor"""
+
+    def __init__(self, records):
+        self.records = records
+        self.limits = []
+
+    async def fetch(self, limit, created_before_or_at_height=None):
+        self.limits.append(limit)
+        records = [record for record in self.records if created_before_or_at_height is None
+                   or int(record['createdAtHeight']) <= int(created_before_or_at_height)]
+        return {'fills': records[:limit]}
+
+
+def collect(endpoint, **kwargs):
+    async def run():
+        return [record async for record in paginate(endpoint.fetch, 'fills', 'createdAtHeight',
+                                                    'created_before_or_at_height', parse=int, **kwargs)]
+
+    return asyncio.run(run())
+
+
+def test_pages_end_on_a_short_page():
+    endpoint = FakeEndpoint(make_fills(range(100, 125)))
+    records = collect(endpoint, limit=10)
+    assert [record['id'] for record in records] == [record['id'] for record in endpoint.records]
+    # the last page is short
+    assert len(endpoint.limits) == 3
+
+
+def test_records_sharing_the_boundary_are_yielded_once():
+    endpoint = FakeEndpoint(make_fills([100, 101, 102, 102, 102, 103, 104]))
+    records = collect(endpoint, limit=3)
+    assert sorted(record['id'] for record in records) == sorted(record['id'] for record in endpoint.records)
+
+
+def test_full_page_of_one_height_grows_the_page():
+    # 7 fills share height 110, more than a page of 3 holds
+    endpoint = FakeEndpoint(make_fills(list(range(100, 110)) + [110] * 7 + list(range(111, 124))))
+    records = collect(endpoint, limit=3)
+    assert len({record['id'] for record in records}) == len(records) == 30
+    assert max(endpoint.limits) > 3
+    # back to the normal page size once past the crowded height
+    assert endpoint.limits[-1] == 3
+
+
+def test_overflow_past_the_largest_page_raises():
+    endpoint = FakeEndpoint(make_fills([100] * 3 + [110] * 7 + [120]))
+    with pytest.raises(HistoryPageOverflow) as raised:
+        collect(endpoint, limit=3, max_limit=6)
+    assert raised.value.limit == 6 and raised.value.cursor == '110'
+
+
+def test_stops_at_the_checkpoint():
+    endpoint = FakeEndpoint(make_fills(range(100, 120)))
+    newest = endpoint.records[:5]
+    since = {'cursor': newest[-1]['createdAtHeight'], 'ids': [newest[-1]['id']]}
+    assert collect(endpoint, limit=3, since=since) == newest[:-1]
+
+
+def test_rollback_drops_uncommitted_rows(tmp_path):
+    table = ColumnTable(str(tmp_path), SCHEMAS['fills'], chunk_size=2)
+    for record in make_fills(range(100, 103)):
+        table.append(record)
+    table.commit({'cursor': '102', 'ids': ['fill-0']})
+
+    # an interrupted sync: one chunk already flushed to the column files, one row buffered
+    for record in make_fills(range(103, 106)):
+        table.append(record)
+    assert table.rows == 5
+    table.rollback()
+    assert len(table) == 3
+    np.testing.assert_array_equal(table.load()['createdAtHeight'], [102, 101, 100])
+
+    reopened = ColumnTable(str(tmp_path), SCHEMAS['fills'])
+    assert len(reopened) == 3
+    assert reopened.checkpoint == {'cursor': '102', 'ids': ['fill-0']}
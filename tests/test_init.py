@@ -0,0 +1,41 @@
+import asyncio
+
+from dydx_client.dydx import DYDX
+from tests.fake_exchange import TEST_MNEMONIC, FakeExchange
+
+
+def test_concurrent_callers_share_one_initialization():
+    async def run():
+        async with FakeExchange(latency=0.01) as exchange:
+            client = await exchange.connect_client()
+            address = client.wallet_address
+            await client.aclose()
+
+            client = DYDX(address, TEST_MNEMONIC, transport=client.transport, init_retry_delay=0.01)
+            calls = []
+            initialize = client.initialize_clients
+
+            async def counted():
+                calls.append(None)
+                if len(calls) == 1:
+                    raise ConnectionResetError()
+                await initialize()
+
+            client.initialize_clients = counted
+            try:
+                # a cancelled caller does not cancel the initialization of the others
+                cancelled = asyncio.create_task(client.ensure_initialized_clients())
+                callers = [asyncio.create_task(client.ensure_initialized_clients()) for _ in range(20)]
+                await asyncio.sleep(0)
+                cancelled.cancel()
+                await asyncio.gather(*callers)
+
+                # one failed attempt and its retry
+                assert len(calls) == 2 and client.sequencer is not None
+                await client.ensure_initialized_clients()
+                assert len(calls) == 2
+            finally:
+                await client.aclose()
+                await client.transport.aclose()
+
+    asyncio.run(run())
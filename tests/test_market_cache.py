@@ -0,0 +1,58 @@
+import asyncio
+
+from tests.fake_exchange import FakeExchange
+
+
+def test_concurrent_misses_share_one_request():
+    async def run():
+        async with FakeExchange(latency=0.01) as exchange:
+            client = await exchange.connect_client()
+            try:
+                requests = exchange.requests
+                markets = await asyncio.gather(*(client.get_market_data('ETH-USD') for _ in range(20)))
+                assert exchange.requests == requests + 1
+                assert all(market is markets[0] for market in markets)
+
+                # served from the cache while the oracle price is fresh
+                await client.get_market_data('ETH-USD')
+                assert exchange.requests == requests + 1
+
+                await client.get_market_data('ETH-USD', max_oracle_age=0)
+                assert exchange.requests == requests + 2
+            finally:
+                await client.aclose()
+                await client.transport.aclose()
+
+    asyncio.run(run())
+
+
+def test_websocket_updates_keep_the_cache_fresh():
+    async def run():
+        async with FakeExchange() as exchange:
+            client = await exchange.connect_client(oracle_price_ttl=0.05)
+            try:
+                await client.warm_market_cache()
+                cache = client.market_cache
+                cache.apply_markets_message({'channel': 'v4_markets', 'type': 'channel_data', 'contents': {
+                    'trading': {'ETH-USD': {'tickSize': '0.01', 'priceChange24H': '12'}},
+                    'oraclePrices': {'ETH-USD': {'oraclePrice': '3100'}},
+                }})
+                market = cache.get_static('ETH-USD')
+                assert market['tickSize'] == '0.01' and market['oraclePrice'] == '3100'
+                # only fields needed to build orders are merged
+                assert market.get('priceChange24H') != '12'
+
+                # a stale oracle price is refetched
+                await asyncio.sleep(0.1)
+                assert cache.get('ETH-USD') is None
+                requests = exchange.requests
+                assert (await client.get_market_data('ETH-USD'))['oraclePrice'] == '3000'
+                assert exchange.requests == requests + 1
+
+                cache.invalidate('ETH-USD')
+                assert 'ETH-USD' not in cache and 'BTC-USD' in cache
+            finally:
+                await client.aclose()
+                await client.transport.aclose()
+
+    asyncio.run(run())
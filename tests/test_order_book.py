@@ -0,0 +1,77 @@
+import asyncio
+from decimal import Decimal
+
+from dydx_client.order_book import OrderBook
+from tests.fake_exchange import FakeExchange
+
+
+def orderbook_message(msg_type, message_id, contents, market_id='ETH-USD'):
+    return {'channel': 'v4_orderbook', 'id': market_id, 'type': msg_type, 'message_id': message_id,
+            'contents': contents}
+
+
+def make_book():
+    book = OrderBook('ETH-USD', '0.1', -9)
+    book.apply_message(orderbook_message('subscribed', 1, {
+        'bids': [{'price': '2999.9', 'size': '1'}, {'price': '2999.8', 'size': '2'}],
+        'asks': [{'price': '3000.1', 'size': '1.5'}],
+    }))
+    return book
+
+
+async def wait_for(condition, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_snapshot_and_updates():
+    book = make_book()
+    assert book.synced
+    assert book.best_bid() == (Decimal('2999.9'), 1.0) and book.best_ask() == (Decimal('3000.1'), 1.5)
+
+    book.apply_message(orderbook_message('channel_data', 2, {'bids': [['2999.9', '0'], ['3000.0', '3']]}))
+    book.apply_message(orderbook_message('channel_batch_data', 3, [{'asks': [['3000.1', '0']]},
+                                                                   {'asks': [['3000.2', '4']]}]))
+    assert book.best_bid() == (Decimal('3000.0'), 3.0) and book.best_ask() == (Decimal('3000.2'), 4.0)
+    assert book.updates == 3 and book.gaps == 0
+
+
+def test_reordered_message_marks_a_gap():
+    book = make_book()
+    book.apply_message(orderbook_message('channel_data', 3, {'bids': [['2999.9', '5']]}))
+    book.apply_message(orderbook_message('channel_data', 2, {'bids': [['2999.9', '6']]}))
+    assert book.gaps == 1 and book.needs_resync and not book.synced
+
+    # updates are ignored until a snapshot is loaded again
+    book.apply_message(orderbook_message('channel_data', 4, {'bids': [['2999.9', '7']]}))
+    assert book.best_bid() == (Decimal('2999.9'), 5.0)
+    book.load_snapshot({'bids': [['2999.9', '8']], 'asks': []})
+    assert book.synced and book.best_bid() == (Decimal('2999.9'), 8.0)
+
+
+def test_lost_messages_resync_the_tracked_book():
+    async def run():
+        async with FakeExchange() as exchange:
+            client = await exchange.connect_client()
+            try:
+                book = await client.track_orderbook('ETH-USD')
+                await wait_for(lambda: book.synced)
+
+                await exchange.publish_orderbook('ETH-USD', bids=[('2999.5', '10')])
+                await wait_for(lambda: book.updates == 1)
+                assert book.gaps == 0 and client.stream.gaps == 0
+
+                # the update after the lost message arrives with a skipped message id
+                exchange.lose_messages(1)
+                await exchange.publish_orderbook('ETH-USD', bids=[('2999.4', '10')])
+                await wait_for(lambda: book.resyncs == 1)
+                assert book.gaps == 1 and client.stream.gaps == 1
+                assert book.synced
+            finally:
+                await client.aclose()
+                await client.transport.aclose()
+
+    asyncio.run(run())
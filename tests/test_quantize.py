@@ -0,0 +1,73 @@
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+
+import numpy as np
+import pytest
+
+from dydx_client.quantize import Quantizer, price_rounding
+from tests.fake_exchange import MARKETS
+
+
+BTC = Quantizer.from_market(MARKETS['BTC-USD'])
+ETH = Quantizer.from_market(MARKETS['ETH-USD'])
+
+
+def test_steps_match_indexer_sizes():
+    assert BTC.tick_size == Decimal(MARKETS['BTC-USD']['tickSize'])
+    assert BTC.step_size == Decimal(MARKETS['BTC-USD']['stepSize'])
+    assert ETH.tick_size == Decimal(MARKETS['ETH-USD']['tickSize'])
+    assert ETH.step_size == Decimal(MARKETS['ETH-USD']['stepSize'])
+
+
+def test_price_rounding_per_side():
+    assert price_rounding('BUY') == ROUND_FLOOR
+    assert price_rounding('sell') == ROUND_CEILING
+    assert price_rounding(1) == ROUND_FLOOR
+    assert price_rounding(2) == ROUND_CEILING
+
+
+def test_buy_prices_round_down_sell_prices_round_up():
+    assert BTC.round_price(60000.4, side='BUY') == Decimal('60000')
+    assert BTC.round_price(60000.4, side='SELL') == Decimal('60001')
+    assert ETH.round_price('3000.05', side='BUY') == Decimal('3000.0')
+    assert ETH.round_price('3000.05', side='SELL') == Decimal('3000.1')
+    # without a side the price goes to the nearest tick
+    assert BTC.round_price(60000.6) == Decimal('60001')
+
+
+def test_prices_on_a_tick_are_unchanged_despite_float_error():
+    # 0.3 * 1e10 is 2999999999.9999995 in floats
+    assert ETH.subticks(3000.3, ROUND_FLOOR) == ETH.subticks('3000.3', ROUND_FLOOR)
+    assert ETH.subticks(3000.3, ROUND_CEILING) == ETH.subticks('3000.3', ROUND_CEILING)
+    assert BTC.quantums(0.0003) == BTC.quantums('0.0003') == 3 * BTC.step_base_quantums
+
+
+def test_sizes_round_down_to_the_step():
+    assert BTC.round_size(0.00019) == Decimal('0.0001')
+    assert BTC.round_size('0.00019', ROUND_CEILING) == Decimal('0.0002')
+    assert BTC.quantums(0.00000001, ROUND_CEILING) == BTC.step_base_quantums
+    assert BTC.size(BTC.quantums('1.2345')) == Decimal('1.2345')
+
+
+def test_arrays_match_scalar_conversion():
+    prices = [59999.5, 60000.0, 60000.3, 60123.99]
+    for side in ('BUY', 'SELL'):
+        expected = [BTC.subticks(price, price_rounding(side)) for price in prices]
+        np.testing.assert_array_equal(BTC.subticks_array(prices, side=side), expected)
+
+    sizes = [0.0001, 0.0003, 0.12345, 2.5]
+    np.testing.assert_array_equal(BTC.quantums_array(sizes), [BTC.quantums(size) for size in sizes])
+
+
+def test_sizes_and_prices_rounding_to_zero_raise():
+    with pytest.raises(ValueError):
+        BTC.quantums(0.00005)
+    with pytest.raises(ValueError):
+        BTC.quantums('0.00009')
+    with pytest.raises(ValueError):
+        BTC.round_size(0)
+    with pytest.raises(ValueError):
+        BTC.subticks(0.4, ROUND_FLOOR)
+    with pytest.raises(ValueError):
+        BTC.quantums_array([0.001, 0.00005])
+    with pytest.raises(ValueError):
+        ETH.subticks_array([3000.0, 0.01], side='BUY')
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+
+from dydx_client.errors import RateLimitExceeded
+from dydx_client.rate_limit import PRIORITY_HIGH, PRIORITY_LOW, RateLimiter
+from tests.fake_exchange import BLOCK_RATE_LIMIT
+
+
+def test_unconfigured_buckets_do_not_limit():
+    async def run():
+        limiter = RateLimiter()
+        for _ in range(1000):
+            await limiter.acquire('short_term_order', wait=False)
+
+    asyncio.run(run())
+
+
+def test_waiters_are_granted_at_the_refill_rate():
+    async def run():
+        limiter = RateLimiter()
+        # 5 tokens, refilled at 20 per second
+        limiter.configure('indexer', [(5, 0.25)])
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.acquire('indexer') for _ in range(15)))
+        elapsed = time.monotonic() - started
+
+        # the first 5 go through at once, the other 10 wait for 10 refilled tokens
+        assert 0.45 <= elapsed < 0.8
+        assert limiter.granted == 15 and limiter.queued == 10
+        assert limiter._timer is None
+
+    asyncio.run(run())
+
+
+def test_higher_priority_overtakes_queued_waiters():
+    async def run():
+        limiter = RateLimiter()
+        limiter.configure('indexer', [(1, 0.05)])
+        await limiter.acquire('indexer')
+
+        granted = []
+
+        async def acquire(name, priority):
+            await limiter.acquire('indexer', priority=priority)
+            granted.append(name)
+
+        low = [asyncio.create_task(acquire(f'low{index}', PRIORITY_LOW)) for index in range(3)]
+        await asyncio.sleep(0)
+        high = asyncio.create_task(acquire('high', PRIORITY_HIGH))
+        await asyncio.gather(high, *low)
+        assert granted == ['high', 'low0', 'low1', 'low2']
+
+    asyncio.run(run())
+
+
+def test_fail_fast_reports_the_wait():
+    async def run():
+        limiter = RateLimiter()
+        limiter.configure('indexer', [(2, 1.0)])
+        await limiter.acquire('indexer')
+        await limiter.acquire('indexer')
+        with pytest.raises(RateLimitExceeded) as raised:
+            await limiter.acquire('indexer', wait=False)
+        assert raised.value.operation == 'indexer'
+        assert 0.4 < raised.value.retry_after <= 0.5
+        assert limiter.rejected == 1
+
+    asyncio.run(run())
+
+
+def test_block_rate_windows_with_headroom():
+    async def run():
+        limiter = RateLimiter(block_time=0.5, headroom=0.5)
+        limiter.configure_from_block_rate(BLOCK_RATE_LIMIT)
+        # 20 stateful orders per block with half of them kept as headroom
+        for _ in range(10):
+            await limiter.acquire('stateful_order', wait=False)
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire('stateful_order', wait=False)
+        # cancels of stateful orders are not limited
+        await limiter.acquire('stateful_cancel', wait=False)
+
+    asyncio.run(run())
+
+
+def test_one_per_block_window_is_kept():
+    async def run():
+        limiter = RateLimiter(block_time=1.0, headroom=0.9)
+        limiter.configure_from_block_rate({'block_rate_limit_config': {
+            'max_stateful_orders_per_n_blocks': [{'num_blocks': 1, 'limit': 1}, {'num_blocks': 100, 'limit': 50}],
+        }})
+        # 0.9 of 1 rounds down to nothing, the window still allows one order per block
+        assert [bucket.capacity for bucket in limiter._buckets['stateful_orders']] == [1, 45]
+        await limiter.acquire('stateful_order', wait=False)
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire('stateful_order', wait=False)
+
+    asyncio.run(run())
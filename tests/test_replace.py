@@ -0,0 +1,94 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from dydx_v4_client import OrderFlags
+from dydx_v4_client.node.message import place_order as place_order_message
+from v4_proto.dydxprotocol.clob.order_pb2 import Order
+
+from dydx_client.errors import Undercollateralized
+from tests.fake_exchange import FakeExchange
+
+
+def run_with_client(test):
+    """Run `test(exchange, client)` against a fresh fake exchange"""
+    async def run():
+        async with FakeExchange() as exchange:
+            client = await exchange.connect_client()
+            try:
+                await test(exchange, client)
+            finally:
+                await client.aclose()
+                await client.transport.aclose()
+
+    asyncio.run(run())
+
+
+async def place_long_term(client, price=4000):
+    order_id, _ = await client.create_order('ETH-USD', 'SELL', 0.01, price=price)
+    return await client.get_order_by_components(order_id.client_id, order_id.order_flags, order_id.clob_pair_id)
+
+
+def replaced_id(exchange, replaced):
+    """Indexer id of the replacement order"""
+    client_id = str(replaced.order_id.client_id)
+    new, = [record['id'] for record in exchange.orders.values() if record['clientId'] == client_id]
+    return new
+
+
+def test_stateful_replace_places_then_cancels():
+    async def test(exchange, client):
+        old = await place_long_term(client)
+        sequence = exchange.account(client.wallet_address)['sequence']
+
+        replaced = await client.replace_order(old['id'], new_price=4100.04)
+        new = exchange.orders[replaced_id(exchange, replaced)]
+        assert exchange.orders[old['id']]['status'] == 'CANCELED'
+        assert new['status'] == 'OPEN' and Decimal(new['price']) == Decimal('4100.1')
+        assert new['size'] == exchange.orders[old['id']]['size']
+        # a place and a cancel, each alone in its transaction
+        assert exchange.account(client.wallet_address)['sequence'] == sequence + 2
+        assert replaced.transaction.tx_response.code == replaced.cancel_transaction.tx_response.code == 0
+        assert client.order_store.get_by_id(new['id']) is not None
+
+    run_with_client(test)
+
+
+def test_rejected_stateful_replacement_keeps_the_order():
+    async def test(exchange, client):
+        old = await place_long_term(client)
+        # the replacement is the next transaction to arrive
+        exchange.reject_transactions(1, code=3007, codespace='clob', raw_log='collateralization check failed')
+        with pytest.raises(Undercollateralized):
+            await client.replace_order(old['id'], new_price=4100)
+        assert exchange.orders[old['id']]['status'] == 'OPEN'
+
+        # the sequencer resynced past the rejected place, the next order goes through
+        new = await place_long_term(client, 4200)
+        assert exchange.orders[new['id']]['status'] == 'OPEN'
+
+    run_with_client(test)
+
+
+def test_short_term_replace_reuses_the_order_id():
+    async def test(exchange, client):
+        market_info = await client.get_market_data('ETH-USD')
+        template = client.order_template(market_info)
+        block = await client.block_height.current()
+        order_id = template.order_id(client.wallet_address, 0, 12345, OrderFlags.SHORT_TERM)
+        order = template.order(order_id, Order.Side.SIDE_SELL, 0.02, 4000,
+                               time_in_force=Order.TimeInForce.TIME_IN_FORCE_UNSPECIFIED, good_til_block=block + 5)
+        await client.sequencer.broadcast(place_order_message(order), stateful=False)
+        sequence = exchange.account(client.wallet_address)['sequence']
+        old, = exchange.orders.values()
+
+        replaced = await client.replace_order(dict(old), new_price=4050)
+        assert replaced.order_id.client_id == 12345 and replaced.cancel is None
+        assert list(exchange.orders) == [old['id']]
+        new = exchange.orders[old['id']]
+        assert new['status'] == 'OPEN' and Decimal(new['price']) == Decimal('4050')
+        assert int(new['goodTilBlock']) > int(old['goodTilBlock'])
+        # short-term orders do not use the account sequence
+        assert exchange.account(client.wallet_address)['sequence'] == sequence
+
+    run_with_client(test)
@@ -0,0 +1,32 @@
+import pytest
+
+from dydx_client.risk import RiskEngine
+from tests.fake_exchange import MARKETS
+
+
+ETH = MARKETS['ETH-USD']
+
+
+def make_engine(quote=1000.0):
+    subaccount = {'subaccountNumber': 0, 'assetPositions': {'USDC': {'size': str(quote), 'side': 'LONG'}},
+                  'openPerpetualPositions': {}}
+    return RiskEngine.from_subaccounts([subaccount], {'ETH-USD': ETH})
+
+
+def test_fills_settle_notional_and_fee_in_the_quote_balance():
+    engine = make_engine()
+    engine.update_position(0, 'ETH-USD', 0.1, 3000, market=ETH, fill_price=3000, fee=0.15)
+    assert engine.quote_balance[0] == pytest.approx(1000 - 300 - 0.15)
+    assert engine.summary()[0]['equity'] == pytest.approx(1000 - 0.15)
+
+    engine.update_price('ETH-USD', 3100)
+    engine.update_position(0, 'ETH-USD', 0, 3000, fill_price=3100, fee=0.15)
+    assert engine.quote_balance[0] == pytest.approx(1000 + 10 - 0.3)
+    assert engine.summary()[0]['equity'] == pytest.approx(engine.quote_balance[0])
+
+
+def test_position_set_without_a_fill_keeps_the_quote_balance():
+    engine = make_engine()
+    engine.update_position(0, 'ETH-USD', -0.2, 3000, market=ETH)
+    assert engine.quote_balance[0] == 1000
+    assert engine.summary()[0]['initialMarginRequirement'] == pytest.approx(0.2 * 3000 * 0.05)
@@ -0,0 +1,85 @@
+import asyncio
+
+from dydx_v4_client.node.message import place_order as place_order_message
+
+from dydx_client.errors import SequenceMismatch, tx_error
+from tests.fake_exchange import FakeExchange
+
+
+def run_with_client(test):
+    """Run `test(exchange, client)` against a fresh fake exchange"""
+    async def run():
+        async with FakeExchange() as exchange:
+            client = await exchange.connect_client()
+            try:
+                await test(exchange, client)
+            finally:
+                await client.aclose()
+                await client.transport.aclose()
+
+    asyncio.run(run())
+
+
+async def limit_order_message(client, price=4000):
+    market_info = await client.get_market_data('ETH-USD')
+    _, order = client._build_order(market_info, await client.block_height.current(), 'ETH-USD', 'SELL', 0.01,
+                                   price)
+    return place_order_message(order)
+
+
+def test_concurrent_orders_take_consecutive_sequences():
+    async def test(exchange, client):
+        results = await asyncio.gather(*(client.create_order('ETH-USD', 'SELL', 0.01, price=4000 + index)
+                                         for index in range(10)))
+        assert len({order_id.client_id for order_id, _ in results}) == 10
+        assert exchange.account(client.wallet_address)['sequence'] == client.sequencer.next_sequence == 10
+        assert client.sequencer.mismatches == 0
+
+    run_with_client(test)
+
+
+def test_mismatch_resyncs_and_resigns():
+    async def test(exchange, client):
+        # another process sent 3 transactions from the same wallet
+        exchange.account(client.wallet_address)['sequence'] += 3
+
+        await client.create_order('ETH-USD', 'SELL', 0.01, price=4000)
+        sequencer = client.sequencer
+        assert sequencer.mismatches == 1 and sequencer.resyncs == 1
+        assert exchange.account(client.wallet_address)['sequence'] == sequencer.next_sequence == 4
+
+    run_with_client(test)
+
+
+def test_mismatch_without_resign_returns_the_rejection():
+    async def test(exchange, client):
+        sequencer = client.sequencer
+        first = sequencer.presign(await limit_order_message(client, 4000))
+        second = sequencer.presign(await limit_order_message(client, 4001))
+
+        # the second transaction arrives first: it is rejected and not re-signed
+        response = await sequencer.broadcast_signed(second, resign=False)
+        assert isinstance(tx_error(response.tx_response), SequenceMismatch)
+        assert sequencer.resyncs == 1 and sequencer.next_sequence == 0
+        assert not exchange.orders
+
+        response = await sequencer.broadcast_signed(first)
+        assert tx_error(response.tx_response) is None
+        assert len(exchange.orders) == 1
+
+    run_with_client(test)
+
+
+def test_resync_of_an_old_epoch_is_skipped():
+    async def test(exchange, client):
+        sequencer = client.sequencer
+        _, epoch = sequencer.reserve()
+        await sequencer.resync(epoch)
+        assert sequencer.resyncs == 1 and sequencer.next_sequence == 0
+
+        # a second coroutine that saw the same rejection does not resync again
+        sequencer.reserve()
+        await sequencer.resync(epoch)
+        assert sequencer.resyncs == 1 and sequencer.next_sequence == 1
+
+    run_with_client(test)
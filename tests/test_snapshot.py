@@ -0,0 +1,69 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from dydx_client.snapshot import SnapshotStore
+from tests.fake_exchange import FakeExchange
+
+
+def test_saves_are_written_on_flush(tmp_path):
+    path = str(tmp_path / 'snapshot.db')
+    store = SnapshotStore(path)
+    store.put('a', {'value': 1})
+    store.put('a', {'value': 2})
+    store.put('b', [1, 2])
+    store.delete('b')
+    assert store.flush() == 2 and store.flush() == 0
+    store.close()
+
+    reopened = SnapshotStore(path)
+    assert reopened.get('a').value == {'value': 2} and reopened.get('a').version == 2
+    assert 'b' not in reopened
+    assert reopened.get('a', max_age=0) is None
+
+
+def test_failed_flush_keeps_the_pending_keys(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snapshot.db'))
+    store.put('a', {'value': 1})
+    store.put('b', {'unserializable': object()})
+    with pytest.raises(TypeError):
+        store.flush()
+
+    store.put('b', {'value': 2})
+    assert store.flush() == 2
+    store.close()
+    assert SnapshotStore(store.path).get('a').value == {'value': 1}
+
+
+def test_restart_restores_markets_and_close_writes_the_store(tmp_path):
+    path = str(tmp_path / 'snapshot.db')
+
+    async def run():
+        async with FakeExchange() as exchange:
+            store = SnapshotStore(path)
+            client = await exchange.connect_client(snapshot=store)
+            await client.warm_market_cache()
+            fee_tiers = await client.get_fee_tiers()
+            # closing flushes the saves still waiting for their delayed flush and closes the file
+            await client.aclose()
+            await client.transport.aclose()
+            assert store._connection is None
+
+            with sqlite3.connect(path) as connection:
+                keys = {key for key, in connection.execute('SELECT key FROM snapshot')}
+            assert client._markets_key in keys
+            assert client._protocol_key('/dydxprotocol/v4/feetiers/perpetual_fee_params') in keys
+
+            # a restarted client has the static market info before any market request
+            store = SnapshotStore(path)
+            client = await exchange.connect_client(snapshot=store)
+            try:
+                assert client.market_cache.get_static('ETH-USD')['tickSize'] == '0.1'
+                assert await client.get_fee_tiers() == fee_tiers
+            finally:
+                await client.aclose()
+                await client.transport.aclose()
+            assert store._connection is None
+
+    asyncio.run(run())
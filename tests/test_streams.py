@@ -0,0 +1,118 @@
+import asyncio
+
+from dydx_client.instrumentation import Metrics
+from dydx_client.streams import IndexerStream
+from tests.fake_exchange import FakeExchange
+
+
+async def wait_for(condition, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def run_with_stream(test):
+    """Run `test(exchange, stream)` with a stream connected to a fresh fake exchange"""
+    async def run():
+        async with FakeExchange() as exchange:
+            stream = IndexerStream(exchange.websocket_url, reconnect_delay=0.01, metrics=Metrics())
+            try:
+                await test(exchange, stream)
+            finally:
+                await stream.aclose()
+
+    asyncio.run(run())
+
+
+def test_subscriptions_share_one_connection():
+    async def test(exchange, stream):
+        eth = await stream.orderbook('ETH-USD', batched=False)
+        btc = await stream.orderbook('BTC-USD', batched=False)
+        await eth.wait_subscribed(5)
+        await btc.wait_subscribed(5)
+        assert stream.connects == 1 and len(exchange._sockets) == 1
+
+        await exchange.publish_orderbook('BTC-USD', bids=[('59999', '1')])
+        assert (await eth.get())['type'] == 'subscribed'
+        assert (await btc.get())['type'] == 'subscribed'
+        message = await btc.get()
+        assert message['type'] == 'channel_data' and message['contents']['bids'] == [['59999', '1']]
+        assert eth._queue.empty()
+
+    run_with_stream(test)
+
+
+def test_reconnect_resubscribes_every_channel():
+    async def test(exchange, stream):
+        disconnects = []
+        eth = await stream.orderbook('ETH-USD', on_disconnect=lambda: disconnects.append('ETH-USD'))
+        markets = await stream.markets(on_disconnect=lambda: disconnects.append('markets'))
+        await eth.wait_subscribed(5)
+        await markets.wait_subscribed(5)
+
+        await exchange.drop_websockets()
+        await wait_for(lambda: stream.connects == 2 and eth.subscribed and markets.subscribed)
+        assert sorted(disconnects) == ['ETH-USD', 'markets']
+        assert exchange._sockets and all(len(keys) == 2 for keys in exchange._sockets.values())
+
+    run_with_stream(test)
+
+
+def test_skipped_message_id_reports_a_gap_to_every_subscription():
+    async def test(exchange, stream):
+        gaps = []
+        eth = await stream.orderbook('ETH-USD', on_gap=lambda: gaps.append('ETH-USD'))
+        btc = await stream.orderbook('BTC-USD', on_gap=lambda: gaps.append('BTC-USD'))
+        await eth.wait_subscribed(5)
+        await btc.wait_subscribed(5)
+
+        exchange.lose_messages(1)
+        await exchange.publish_orderbook('ETH-USD', asks=[('3000.5', '1')])
+        await wait_for(lambda: stream.gaps == 1)
+        assert sorted(gaps) == ['BTC-USD', 'ETH-USD']
+
+    run_with_stream(test)
+
+
+def test_raising_callback_keeps_the_connection():
+    async def test(exchange, stream):
+        received = []
+
+        def broken(message):
+            if message['type'] == 'channel_data':
+                raise KeyError('price')
+
+        eth = await stream.orderbook('ETH-USD', batched=False, callback=broken)
+        btc = await stream.orderbook('BTC-USD', batched=False, callback=received.append)
+        await eth.wait_subscribed(5)
+        await btc.wait_subscribed(5)
+
+        await exchange.publish_orderbook('ETH-USD', bids=[('2999', '1')])
+        await exchange.publish_orderbook('BTC-USD', bids=[('59999', '1')])
+        await wait_for(lambda: len(received) == 2)
+        assert eth.callback_errors == 1 and eth.subscribed
+        assert stream.connects == 1 and stream.errors == 0
+        errors = [value for (name, labels), value in stream.metrics.counters.items()
+                  if name == 'websocket_callback_errors_total']
+        assert errors == [1]
+
+    run_with_stream(test)
+
+
+def test_last_unsubscribe_closes_the_connection():
+    async def test(exchange, stream):
+        eth = await stream.orderbook('ETH-USD')
+        await eth.wait_subscribed(5)
+        await eth.unsubscribe()
+        await wait_for(lambda: stream._task.done())
+        assert not stream.connected
+        # buffered messages are still delivered, then iteration ends
+        assert [message['type'] async for message in eth] == ['subscribed']
+
+        btc = await stream.orderbook('BTC-USD')
+        await btc.wait_subscribed(5)
+        assert stream.connects == 2
+
+    run_with_stream(test)